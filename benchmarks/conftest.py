@@ -0,0 +1,156 @@
+"""
+Shared fixtures for the benchmark suite.
+
+The benchmarks run against a temporary AiiDA profile filled with synthetic
+data. Each benchmark that uses the `synthetic_profile` fixture is repeated
+for every size given by the `--profile-sizes` option, so the way each
+operation scales with the number of nodes can be read off the report.
+"""
+
+from typing import NamedTuple
+
+import pytest
+from aiida.common.links import LinkType
+from aiida.manage import get_manager
+from aiida.orm import (
+    CalcJobNode,
+    Computer,
+    InstalledCode,
+    SinglefileData,
+    StructureData,
+)
+
+pytest_plugins = ["aiida.tools.pytest_fixtures"]
+
+DEFAULT_PROFILE_SIZES = "100,1000,5000"
+
+# Number of synthetic nodes per ChemShell code in the profile
+NODES_PER_CODE = 50
+
+
+def pytest_addoption(parser):
+    """Add the option setting the sizes of the synthetic profiles."""
+    parser.addoption(
+        "--profile-sizes",
+        default=DEFAULT_PROFILE_SIZES,
+        help="Comma separated numbers of nodes in the synthetic profiles "
+        f"(default: {DEFAULT_PROFILE_SIZES})",
+    )
+    return
+
+
+def pytest_generate_tests(metafunc):
+    """Repeat the benchmarks using a synthetic profile for each size."""
+    if "profile_size" in metafunc.fixturenames:
+        sizes = metafunc.config.getoption("profile_sizes")
+        metafunc.parametrize(
+            "profile_size",
+            [int(size) for size in sizes.split(",")],
+            indirect=True,
+            scope="module",
+        )
+    return
+
+
+@pytest.fixture(scope="module")
+def profile_size(request):
+    """Return the number of nodes in the synthetic profile."""
+    return request.param
+
+
+class SyntheticProfile(NamedTuple):
+    """The nodes stored in a synthetic profile."""
+
+    size: int
+    uploaded: list[int]
+    calculated: list[int]
+    structures: list[int]
+    processes: list[str]
+    codes: list[str]
+
+
+def populate_profile(size: int, computer) -> SyntheticProfile:
+    """
+    Fill the profile with synthetic data.
+
+    Half the nodes are uploaded structure files. A quarter are StructureData.
+    The rest are split between calculations and the files they created, each
+    calculation having an uploaded file as its input. ChemShell codes are
+    added in proportion to the number of nodes.
+
+    Parameters
+    ----------
+    size : int
+        The approximate number of nodes to store.
+    computer : Computer
+        The computer the codes are installed on.
+
+    Returns
+    -------
+    SyntheticProfile
+        The pks of the stored data nodes, uuids of the processes and full
+        labels of the codes.
+    """
+    nuploaded = size // 2
+    nstructures = size // 4
+    nprocesses = (size - nuploaded - nstructures) // 2
+    with get_manager().get_profile_storage().transaction():
+        uploaded = [
+            SinglefileData.from_string(
+                f"1\nfile {i}\nH {i} 0 0\n", filename=f"upload{i}.xyz"
+            ).store()
+            for i in range(nuploaded)
+        ]
+        structures = [
+            StructureData(cell=[[1, 0, 0], [0, 1, 0], [0, 0, 1]]).store()
+            for _ in range(nstructures)
+        ]
+        processes = []
+        calculated = []
+        for i in range(nprocesses):
+            calc = CalcJobNode(label=f"calc{i}")
+            calc.set_process_state("finished")
+            calc.set_exit_status(0)
+            calc.base.links.add_incoming(
+                uploaded[i % nuploaded], LinkType.INPUT_CALC, "structure"
+            )
+            calc.store()
+            output = SinglefileData.from_string(f"{i}", filename=f"output{i}.xyz")
+            output.base.links.add_incoming(calc, LinkType.CREATE, "structure")
+            calculated.append(output.store().pk)
+            processes.append(calc.uuid)
+    codes = [
+        InstalledCode(
+            label=f"chemsh-{i}",
+            computer=computer,
+            filepath_executable="/bin/true",
+            default_calc_job_plugin="chemshell",
+        )
+        .store()
+        .full_label
+        for i in range(max(size // NODES_PER_CODE, 1))
+    ]
+    return SyntheticProfile(
+        size=size,
+        uploaded=[node.pk for node in uploaded],
+        calculated=calculated,
+        structures=[node.pk for node in structures],
+        processes=processes,
+        codes=codes,
+    )
+
+
+@pytest.fixture(scope="module")
+def synthetic_profile(profile_size, aiida_profile, tmp_path_factory):
+    """Reset the profile and fill it with synthetic data of the given size."""
+    aiida_profile.reset_storage()
+    computer = Computer(
+        label="localhost",
+        hostname="localhost",
+        transport_type="core.local",
+        scheduler_type="core.direct",
+        workdir=str(tmp_path_factory.mktemp("workdir")),
+    ).store()
+    computer.set_default_mpiprocs_per_machine(32)
+    computer.configure()
+    return populate_profile(profile_size, computer)
@@ -0,0 +1,65 @@
+"""Benchmark the AiiDA database widget's search queries."""
+
+import pytest
+from aiida.orm import Node, QueryBuilder, SinglefileData
+
+from aiidalab_alc.common.database import (
+    AiiDADatabaseWidget,
+    exclude_nodes_with_incoming,
+)
+
+
+def _search_query() -> QueryBuilder:
+    return QueryBuilder().append(
+        SinglefileData, tag="structures", project=["id", "ctime"]
+    )
+
+
+def _legacy_not_in_search() -> list:
+    """Pull every linked node id into Python and filter with ``!in``."""
+    processed = [
+        n[0]
+        for n in QueryBuilder()
+        .append(SinglefileData, project=["id"], tag="structures")
+        .append(Node, with_outgoing="structures")
+        .all()
+    ]
+    return (
+        QueryBuilder()
+        .append(SinglefileData, filters={"id": {"!in": processed}}, project="id")
+        .all()
+    )
+
+
+def _anti_join_search() -> list:
+    return exclude_nodes_with_incoming(_search_query(), "structures").all()
+
+
+def test_uploaded_not_in(benchmark, synthetic_profile):
+    """Time the legacy uploaded search for a growing number of nodes."""
+    benchmark.extra_info["nodes"] = synthetic_profile.size
+    result = benchmark(_legacy_not_in_search)
+    assert len(result) == len(synthetic_profile.uploaded)
+
+
+def test_uploaded_anti_join(benchmark, synthetic_profile):
+    """Time the anti-join uploaded search for a growing number of nodes."""
+    benchmark.extra_info["nodes"] = synthetic_profile.size
+    result = benchmark(_anti_join_search)
+    assert len(result) == len(synthetic_profile.uploaded)
+
+
+@pytest.mark.parametrize("mode", ["all", "uploaded", "calculated"])
+def test_widget_search(benchmark, synthetic_profile, mode):
+    """Time a search of the database widget, fetching its first window."""
+    widget = AiiDADatabaseWidget(query=[SinglefileData], debounce=0)
+    widget.mode.value = mode
+    widget.wait()
+    benchmark.extra_info["nodes"] = synthetic_profile.size
+    benchmark(widget.search)
+    expected = {
+        "all": len(synthetic_profile.uploaded) + len(synthetic_profile.calculated),
+        "uploaded": len(synthetic_profile.uploaded),
+        "calculated": len(synthetic_profile.calculated),
+    }
+    assert widget.results.total == expected[mode]
@@ -0,0 +1,32 @@
+"""Benchmark accessing the process of the results step's model."""
+
+import itertools
+
+from aiidalab_alc.models.results import ProcessModel
+
+
+def test_process_access(benchmark, synthetic_profile):
+    """Time switching process and reading its node, inputs and outputs."""
+    model = ProcessModel()
+    uuids = itertools.cycle(synthetic_profile.processes)
+
+    def access():
+        model.process_uuid = next(uuids)
+        return model.process, list(model.inputs), list(model.outputs)
+
+    benchmark.extra_info["nodes"] = synthetic_profile.size
+    process, inputs, outputs = benchmark(access)
+    assert process is not None
+    assert inputs == outputs == ["structure"]
+
+
+def test_cached_process_access(benchmark, synthetic_profile):
+    """Time reading the node, inputs and outputs of an already loaded process."""
+    model = ProcessModel(process_uuid=synthetic_profile.processes[-1])
+
+    def access():
+        return model.process, list(model.inputs), list(model.outputs)
+
+    benchmark.extra_info["nodes"] = synthetic_profile.size
+    benchmark(access)
+    assert model.load_count == 1
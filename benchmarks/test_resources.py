@@ -0,0 +1,29 @@
+"""Benchmark listing the ChemShell codes for the resources step."""
+
+import pytest
+
+from aiidalab_alc.models.resources import CodeRegistry, ComputationalResourcesModel
+from aiidalab_alc.resources import ResourceSetupBox
+
+
+@pytest.fixture
+def setup_box(synthetic_profile):
+    """Return a resources box listing the codes of the synthetic profile."""
+    return ResourceSetupBox(model=ComputationalResourcesModel())
+
+
+def test_update_codes_cold(benchmark, synthetic_profile, setup_box):
+    """Time listing the codes when the registry has to query them."""
+    registry = CodeRegistry.get_registry()
+    benchmark.extra_info["codes"] = len(synthetic_profile.codes)
+    benchmark.pedantic(
+        setup_box.update_codes, setup=registry.invalidate, rounds=20, iterations=1
+    )
+    assert len(setup_box.code.options) == len(synthetic_profile.codes)
+
+
+def test_update_codes_cached(benchmark, synthetic_profile, setup_box):
+    """Time listing the codes when the registry's cache is up to date."""
+    benchmark.extra_info["codes"] = len(synthetic_profile.codes)
+    benchmark(setup_box.update_codes)
+    assert len(setup_box.code.options) == len(synthetic_profile.codes)
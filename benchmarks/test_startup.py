@@ -0,0 +1,40 @@
+"""Benchmark the app's startup, from importing it to its first paint."""
+
+import subprocess
+import sys
+
+STARTUP_SCRIPT = """
+import time
+from unittest import mock
+
+start = time.perf_counter()
+with mock.patch("aiidalab_alc.main.display") as display:
+    display.side_effect = lambda _: print(time.perf_counter() - start)
+    from aiidalab_alc.main import MainApp
+
+    MainApp()
+"""
+
+
+def _run_python(code: str) -> str:
+    return subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+
+
+def test_import_main(benchmark):
+    """Import the app's main module in a fresh interpreter."""
+    benchmark.pedantic(
+        _run_python, args=("import aiidalab_alc.main",), rounds=5, iterations=1
+    )
+
+
+def test_time_to_first_paint(benchmark, aiida_profile):
+    """Time from importing the app until its page is first displayed."""
+
+    def first_paint() -> float:
+        code = f"from aiida import load_profile\nload_profile({aiida_profile.name!r})\n"
+        return float(_run_python(code + STARTUP_SCRIPT).split()[0])
+
+    seconds = benchmark.pedantic(first_paint, rounds=5, iterations=1)
+    benchmark.extra_info["first_paint_seconds"] = seconds
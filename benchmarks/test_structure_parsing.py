@@ -0,0 +1,41 @@
+"""Benchmark parsing large structure files."""
+
+import io
+
+import ase
+import ase.io
+import numpy as np
+import pytest
+
+from aiidalab_alc.common.files import open_buffer, read_structure
+
+NATOMS = [1000, 10000, 100000]
+
+
+@pytest.fixture(scope="module", params=NATOMS)
+def atoms(request):
+    """Return a random structure with the given number of atoms."""
+    rng = np.random.default_rng(0)
+    natoms = request.param
+    return ase.Atoms(
+        symbols=rng.choice(["C", "H", "O", "N"], natoms),
+        positions=rng.uniform(0.0, natoms ** (1 / 3) * 2.0, (natoms, 3)),
+    )
+
+
+@pytest.mark.parametrize("format", ["xyz", "proteindatabank"])
+def test_read_structure(benchmark, atoms, format):
+    """Time reading the first frame of a structure file from an upload buffer."""
+    text = io.StringIO()
+    ase.io.write(text, atoms, format=format)
+    data = text.getvalue().encode()
+    suffix = "pdb" if format == "proteindatabank" else format
+
+    def read():
+        with open_buffer(data) as handle:
+            return read_structure(handle, f"structure.{suffix}")
+
+    benchmark.extra_info["natoms"] = len(atoms)
+    benchmark.extra_info["nbytes"] = len(data)
+    structure, _ = benchmark.pedantic(read, rounds=3, iterations=1)
+    assert len(structure) == len(atoms)
@@ -0,0 +1,52 @@
+"""Benchmark submitting a batch of ChemShell processes."""
+
+from io import BytesIO
+
+import pytest
+from aiida.orm import SinglefileData, WorkflowNode, load_code
+
+from aiidalab_alc import process
+from aiidalab_alc.process import ChemShellProcess, MainAppModel
+
+BATCH_SIZES = [10, 50]
+
+
+@pytest.fixture
+def dummy_process(synthetic_profile, monkeypatch):
+    """
+    Return a process submitting to a dummy code.
+
+    The ChemShell plugin is not needed: the builder holds the same inputs as
+    a real one, and submission stores a process node without running it.
+    """
+
+    def build_builder(self, parameters, code=None):
+        return {
+            "code": code,
+            "structure": parameters["structure"],
+            "parameters": self.get_dict(
+                {k: v for k, v in parameters.items() if k != "structure"}
+            ),
+        }
+
+    monkeypatch.setattr(ChemShellProcess, "build_builder", build_builder)
+    monkeypatch.setattr(process, "submit", lambda _: WorkflowNode().store())
+    model = MainAppModel()
+    model.resource_model.code_label = synthetic_profile.codes[0]
+    model.resource_model.reuse_results = False
+    model.structure_model.structure_file = SinglefileData(
+        BytesIO(b"1\n\nH 0 0 0\n"), filename="h.xyz"
+    )
+    assert load_code(synthetic_profile.codes[0])
+    return ChemShellProcess(model)
+
+
+@pytest.mark.parametrize("batch_size", BATCH_SIZES)
+def test_submit_sweep(benchmark, synthetic_profile, dummy_process, batch_size):
+    """Time submitting a sweep of distinct parameter sets into a group."""
+    sweep = [{"functional": f"functional-{i}"} for i in range(batch_size)]
+    benchmark.extra_info["nodes"] = synthetic_profile.size
+    group = benchmark.pedantic(
+        dummy_process.submit_sweep, args=(sweep,), rounds=3, iterations=1
+    )
+    assert group.count() == batch_size
@@ -0,0 +1,355 @@
+"""
+Scriptable API for submitting ChemShell calculations without the app.
+
+The same models and validation as the app's wizard are used, they are just
+filled from keyword arguments or the rows of a job manifest rather than by
+the wizard's widgets, so no widgets are built or imported. Manifests are
+CSV or YAML files with a job per row, which are read and submitted one row
+at a time, so a manifest of any size can be submitted from a script or a
+scheduled job.
+"""
+
+import csv
+import re
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from aiida.orm import Data, Group, load_node
+
+from aiidalab_alc.common.files import store_file
+from aiidalab_alc.process import ChemShellProcess, MainAppModel
+
+# The options of the workflow and resource models which may be set, and the
+# types values given as text are converted to
+WORKFLOW_OPTIONS = {
+    "qm_theory": str,
+    "qm_method": str,
+    "functional": str,
+    "basis_quality": bool,
+    "use_mm": bool,
+    "mm_theory": str,
+    "qm_region": list,
+    "force_field": Data,
+}
+RESOURCE_OPTIONS = {
+    "ncpus": int,
+    "omp_threads": int,
+    "walltime_hours": float,
+    "memory_gb": float,
+    "reuse_results": bool,
+    "label": str,
+    "description": str,
+}
+
+# The resource model's traits for the options named differently
+RESOURCE_TRAITS = {"label": "process_label", "description": "process_description"}
+
+TRUE_STRINGS = ("1", "true", "yes", "y", "on")
+FALSE_STRINGS = ("0", "false", "no", "n", "off")
+
+
+class JobResult(NamedTuple):
+    """The outcome of submitting a job of a manifest."""
+
+    index: int
+    pks: tuple[int, ...] = ()
+    reused: int = 0
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        """True if the job was submitted, or identical results reused."""
+        return self.error is None
+
+
+def load_input(
+    value: Any,
+    cache: dict[str, Data] | None = None,
+    description: str = "",
+    structures: bool = False,
+) -> Data:
+    """
+    Load an input node from a node, pk, uuid or the path of a file.
+
+    Parameters
+    ----------
+    value : Any
+        A data node, the pk or uuid of a stored node, or the path of a file
+        to store, which reuses a stored file with identical contents.
+    cache : dict[str, Data], optional
+        Nodes already loaded, keyed by the value given, which is updated.
+    description : str
+        The description of a newly stored file.
+    structures : bool
+        Whether the value is a structure, whose metadata is stored as extras
+        of a newly stored file.
+
+    Returns
+    -------
+    aiida.orm.Data
+        The node.
+
+    Raises
+    ------
+    ValueError
+        If the value is not an existing file, nor the identifier of a node.
+    """
+    if isinstance(value, Data):
+        return value
+    key = str(value)
+    if cache is not None and key in cache:
+        return cache[key]
+    if Path(key).expanduser().is_file():
+        node, _ = store_file(key, description=description, structures=structures)
+    elif isinstance(value, int) or key.isdigit():
+        node = load_node(int(key))
+    else:
+        try:
+            node = load_node(key)
+        except Exception as err:
+            raise ValueError(f"No file or node found for {key!r}") from err
+    if cache is not None:
+        cache[key] = node
+    return node
+
+
+def convert_option(name: str, value: Any) -> Any:
+    """
+    Convert an option given as text to the type of its model trait.
+
+    Parameters
+    ----------
+    name : str
+        The name of the option.
+    value : Any
+        The value, which is only converted if it is a string.
+
+    Returns
+    -------
+    Any
+        The converted value.
+
+    Raises
+    ------
+    ValueError
+        If the option is unknown, or the text is not a valid value.
+    """
+    kind = {**WORKFLOW_OPTIONS, **RESOURCE_OPTIONS}.get(name)
+    if kind is None:
+        raise ValueError(f"Unknown option: {name}")
+    if not isinstance(value, str) or kind in (str, Data):
+        return value
+    if kind is bool:
+        if value.strip().lower() in TRUE_STRINGS:
+            return True
+        if value.strip().lower() in FALSE_STRINGS:
+            return False
+        raise ValueError(f"Invalid {name}: {value!r} is not true or false")
+    if kind is list:
+        return [int(atom) for atom in re.split(r"[\s,;]+", value.strip()) if atom]
+    return kind(value)
+
+
+def build_model(structures: Any | list[Any], code: str, **options) -> MainAppModel:
+    """
+    Fill an application model as the wizard's steps would.
+
+    Parameters
+    ----------
+    structures : Any or list[Any]
+        The structure, or structures to submit a process for each of, given
+        as anything `load_input` accepts.
+    code : str
+        The label of the code to run.
+    **options :
+        The workflow and resource options, see `WORKFLOW_OPTIONS` and
+        `RESOURCE_OPTIONS`, given as their values or as text.
+
+    Returns
+    -------
+    MainAppModel
+        The filled model.
+
+    Raises
+    ------
+    ValueError
+        If an option is unknown or invalid.
+    """
+    if not isinstance(structures, list | tuple):
+        structures = [structures]
+    model = MainAppModel()
+    model.structure_model.structures = [
+        load_input(structure, structures=True) for structure in structures
+    ]
+    for name, value in options.items():
+        value = convert_option(name, value)
+        if name == "force_field" and value is not None:
+            value = load_input(value, description="Force field")
+        if name in WORKFLOW_OPTIONS:
+            setattr(model.workflow_model, name, value)
+        else:
+            setattr(model.resource_model, RESOURCE_TRAITS.get(name, name), value)
+    model.resource_model.code_label = code
+    return model
+
+
+def submit(
+    structures: Any | list[Any],
+    code: str,
+    sweep: dict[str, list] | list[dict] | None = None,
+    group_label: str | None = None,
+    **options,
+) -> ChemShellProcess:
+    """
+    Submit ChemShell calculations without the app.
+
+    Parameters
+    ----------
+    structures : Any or list[Any]
+        The structure, or structures to submit a process for each of, given
+        as a data node, the pk or uuid of a node, or the path of a file.
+    code : str
+        The label of the code to run.
+    sweep : dict[str, list] | list[dict], optional
+        A parameter sweep, see `aiidalab_alc.process.expand_sweep`.
+    group_label : str, optional
+        The label of the group created for a sweep, or for several structures.
+    **options :
+        The workflow and resource options, see `WORKFLOW_OPTIONS` and
+        `RESOURCE_OPTIONS`.
+
+    Returns
+    -------
+    ChemShellProcess
+        The submission, whose `nodes` are the processes submitted, `node`
+        the first of them, and `group` the group of the processes of a sweep.
+
+    Raises
+    ------
+    ValueError
+        If the options are invalid, with the same messages as the app.
+    """
+    model = build_model(structures, code, **options)
+    model.workflow_model.sweep = sweep or {}
+    errors = ChemShellProcess.get_validation_errors(model)
+    if errors:
+        raise ValueError(" ".join(errors))
+    process = ChemShellProcess(model)
+    process.submit_sweep(process.get_sweep(), group_label)
+    return process
+
+
+def iter_manifest(path: str | Path) -> Iterator[dict]:
+    """
+    Read the jobs of a manifest one at a time.
+
+    CSV manifests have a header naming the options of each column, empty
+    cells are left unset. YAML manifests are a list of jobs, or a stream of
+    documents each of which is a job or a list of jobs.
+
+    Parameters
+    ----------
+    path : str or Path
+        The path of the manifest, a ``.csv``, ``.yaml`` or ``.yml`` file.
+
+    Yields
+    ------
+    dict
+        The options of each job.
+
+    Raises
+    ------
+    ValueError
+        If the manifest is not a CSV or YAML file.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        with open(path, newline="") as handle:
+            for row in csv.DictReader(handle):
+                yield {
+                    name.strip(): value.strip()
+                    for name, value in row.items()
+                    if name and value and value.strip()
+                }
+    elif suffix in (".yaml", ".yml"):
+        import yaml
+
+        with open(path) as handle:
+            for document in yaml.safe_load_all(handle):
+                if isinstance(document, dict):
+                    yield document
+                elif document:
+                    yield from document
+    else:
+        raise ValueError(f"Unsupported manifest format: {path.name}")
+    return
+
+
+def submit_manifest(
+    path: str | Path,
+    callback: Callable[[JobResult], None] | None = None,
+    fail_fast: bool = False,
+    **defaults,
+) -> list[JobResult]:
+    """
+    Submit a ChemShell calculation for each job of a manifest.
+
+    The jobs are submitted as they are read. A job that fails to submit is
+    reported and skipped, the rest of the manifest is still submitted. Files
+    named by several jobs are only stored once.
+
+    Parameters
+    ----------
+    path : str or Path
+        The path of the manifest, see `iter_manifest`. Each job needs a
+        `structure` and a `code`, and may name a `group` to add its processes
+        to, and any of the options accepted by `submit`, including a `sweep`.
+    callback : Callable[[JobResult], None], optional
+        Called with the result of each job, once it has been submitted.
+    fail_fast : bool
+        Stop at the first job that fails to submit.
+    **defaults :
+        Options used for any job which does not set them.
+
+    Returns
+    -------
+    list[JobResult]
+        The result of each job, in the order of the manifest.
+    """
+    files = {}
+    groups = {}
+    results = []
+    for index, row in enumerate(iter_manifest(path)):
+        job = {**defaults, **row}
+        try:
+            result = _submit_job(index, job, files, groups)
+        except Exception as err:
+            result = JobResult(index, error=str(err) or type(err).__name__)
+        results.append(result)
+        if callback is not None:
+            callback(result)
+        if fail_fast and not result.ok:
+            break
+    return results
+
+
+def _submit_job(
+    index: int, job: dict, files: dict[str, Data], groups: dict[str, Group]
+) -> JobResult:
+    """Submit a job of a manifest, adding its processes to the job's group."""
+    structure = job.pop("structure", None)
+    if structure is None:
+        raise ValueError("No structure provided.")
+    structure = load_input(structure, files, "Structure", structures=True)
+    if job.get("force_field") is not None:
+        job["force_field"] = load_input(job["force_field"], files, "Force field")
+    group_label = job.pop("group", None)
+    process = submit(structure, str(job.pop("code", "")), **job)
+    if group_label:
+        if group_label not in groups:
+            groups[group_label], _ = Group.collection.get_or_create(group_label)
+        groups[group_label].add_nodes(process.nodes)
+    pks = tuple(node.pk for node in process.nodes)
+    return JobResult(index, pks, reused=len(process.reused))
@@ -0,0 +1,82 @@
+"""Defines the `alc-ux` command line interface."""
+
+import click
+
+
+@click.group()
+@click.option(
+    "-p",
+    "--profile",
+    default=None,
+    help="The AiiDA profile to use, the default profile if not given.",
+)
+def cli(profile: str | None) -> None:
+    """Manage the data and calculations of the ALC AiiDAlab app."""
+    from aiida import load_profile
+
+    load_profile(profile, allow_switch=True)
+    return
+
+
+@cli.command("backfill-metadata")
+@click.option(
+    "--batch-size",
+    default=100,
+    show_default=True,
+    help="The number of file nodes loaded at a time.",
+)
+def backfill_metadata(batch_size: int) -> None:
+    """Store the structure metadata extras of previously uploaded files."""
+    from aiidalab_alc.common.files import backfill_structure_metadata
+
+    def _report(ndone: int, total: int) -> None:
+        click.echo(f"Processed {ndone} of {total} files")
+
+    nupdated = backfill_structure_metadata(batch_size=batch_size, callback=_report)
+    click.echo(f"Stored the metadata of {nupdated} files")
+    return
+
+
+@cli.command("submit")
+@click.argument("manifest", type=click.Path(exists=True, dir_okay=False))
+@click.option("--code", default=None, help="The code of jobs which do not set one.")
+@click.option("--group", default=None, help="The group of jobs which do not set one.")
+@click.option("--fail-fast", is_flag=True, help="Stop at the first failed job.")
+def submit(manifest: str, code: str | None, group: str | None, fail_fast: bool) -> None:
+    """
+    Submit a ChemShell calculation for each job of a CSV or YAML manifest.
+
+    Each job needs a structure, given as the path of a file or the pk or uuid
+    of a node, and a code. Any other column sets an option of the job, e.g.
+    qm_theory, ncpus or label.
+    """
+    from aiidalab_alc.api import JobResult, submit_manifest
+
+    defaults = {
+        name: value for name, value in (("code", code), ("group", group)) if value
+    }
+
+    def _report(result: JobResult) -> None:
+        job = f"Job {result.index + 1}"
+        pks = ", ".join(str(pk) for pk in result.pks)
+        pks = f"PKs {pks}" if len(result.pks) > 1 else f"PK {pks}"
+        if result.error is not None:
+            click.echo(f"{job}: failed: {result.error}", err=True)
+        elif result.reused == len(result.pks):
+            click.echo(f"{job}: reused {pks}")
+        elif result.reused:
+            click.echo(f"{job}: submitted {pks} ({result.reused} reused)")
+        else:
+            click.echo(f"{job}: submitted {pks}")
+
+    results = submit_manifest(
+        manifest,
+        callback=_report,
+        fail_fast=fail_fast,
+        **defaults,
+    )
+    nfailed = sum(not result.ok for result in results)
+    click.echo(f"Submitted {len(results) - nfailed} of {len(results)} jobs")
+    if nfailed:
+        raise SystemExit(1)
+    return
@@ -1,6 +1,10 @@
 """Module for components relating to AiiDA database management."""
 
 import datetime
+import logging
+import threading
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import ipywidgets as ipw
 import traitlets as tl
@@ -8,45 +12,139 @@ from aiida.orm import (
     CalcFunctionNode,
     CalcJobNode,
     Data,
-    Node,
     QueryBuilder,
     WorkChainNode,
+    load_node,
 )
 
+from aiidalab_alc.common.profiling import profiled
+from aiidalab_alc.common.queries import (
+    ProcessLabelIndex,
+    exclude_nodes_with_incoming,
+    load_nodes,
+    parse_elements,
+    structure_metadata_filters,
+)
+from aiidalab_alc.common.table import Column, WindowedTable
+from aiidalab_alc.common.threads import call_in_loop, get_kernel_loop
+
+LOGGER = logging.getLogger(__name__)
+
 
 class AiiDADatabaseWidget(ipw.VBox, tl.HasTraits):
-    """Widget for AiiDA database querying."""
+    """
+    Widget for AiiDA database querying.
+
+    The node chosen from the search results is held by `data_object`. Nodes
+    may also be added to a selection, either one at a time or every match of
+    the current search at once. The `data_objects` trait holds the nodes in
+    the selection in order, or the chosen node if the selection is empty.
+    """
 
     data_object = tl.Instance(Data, allow_none=True)
+    data_objects = tl.List(tl.Instance(Data))
+
+    # The formula and number of atoms are extras set when structure files are
+    # uploaded, so they are shown without opening the files. They are cast as
+    # they are sorted on, and a distinct query can only be sorted on the
+    # expressions it projects.
+    projections = (
+        "id",
+        "ctime",
+        {"extras.formula": {"cast": "t"}},
+        {"extras.natoms": {"cast": "i"}},
+        "node_type",
+        "label",
+        "description",
+    )
 
-    def __init__(self, title: str = "", query: list = None):
+    # The columns of the results table, in the order of the projections
+    columns = (
+        Column("id", "PK", 8),
+        Column("ctime", "Created", 16),
+        Column("formula", "Formula", 14),
+        Column("natoms", "Atoms", 7),
+        Column("node_type", "Type", 16),
+        Column("label", "Label", 20),
+        Column("description", "Description", 30, sortable=False),
+    )
+
+    # The node fields the results can be sorted by, keyed by column
+    sort_fields = {
+        "id": "id",
+        "ctime": "ctime",
+        "formula": ("extras.formula", "t"),
+        "natoms": ("extras.natoms", "i"),
+        "node_type": "node_type",
+        "label": "label",
+    }
+
+    batch_size = 20
+
+    def __init__(
+        self,
+        title: str = "",
+        query: list = None,
+        page_size: int = 20,
+        debounce: float = 0.3,
+    ):
+        """
+        AiiDADatabaseWidget constructor.
+
+        Parameters
+        ----------
+        title : str
+            The title of the widget.
+        query : list
+            The AiiDA node classes to search for.
+        page_size : int
+            The number of matches shown, and fetched from the database, at once.
+        debounce : float
+            The time in seconds the search settings must be left unchanged
+            before a background search is started.
+        """
         if query is None:
             query = []
         self.title = title
         self.query_type = tuple(query)
+        self.page_size = page_size
+        self._qbuild = None
+        self._uploaded_only = False
+        self.label_index = ProcessLabelIndex()
 
-        qbuilder = QueryBuilder().append((CalcJobNode, WorkChainNode), project="label")
+        # Searches run on a single background worker, each request is given a new
+        # generation so that queued or in-flight searches can tell they have been
+        # superseded. Their results are shown on the kernel's event loop.
+        self.debounce = debounce
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._timer = None
+        self._future = None
+        self._loop = None
 
         self.drop_down = ipw.Dropdown(
-            options=sorted({"All"}.union({i[0] for i in qbuilder.iterall() if i[0]})),
+            options=self._process_label_options(),
             value="All",
             description="Process Label",
             disabled=True,
             style={"description_width": "120px"},
             layout={"width": "50%"},
         )
-        self.drop_down.observe(self.search, names="value")
+        self.drop_down.observe(self.schedule_search, names="value")
 
         # Disable process labels selection if we are not looking for the calculated
         # structures.
         def disable_drop_down(change):
             self.drop_down.disabled = not change["new"] == "calculated"
+            if not self.drop_down.disabled:
+                self._update_process_labels()
 
         # Select structures kind.
         self.mode = ipw.RadioButtons(
             options=["all", "uploaded", "calculated"], layout={"width": "25%"}
         )
-        self.mode.observe(self.search, names="value")
+        self.mode.observe(self.schedule_search, names="value")
         self.mode.observe(disable_drop_down, names="value")
 
         # Date range.
@@ -64,7 +162,7 @@ class AiiDADatabaseWidget(ipw.VBox, tl.HasTraits):
             button_style="info",
             layout={"width": "initial", "margin": "2px 0 0 2em"},
         )
-        btn_search.on_click(self.search)
+        btn_search.on_click(self.schedule_search)
 
         age_selection = ipw.VBox(
             [
@@ -74,16 +172,329 @@ class AiiDADatabaseWidget(ipw.VBox, tl.HasTraits):
             layout={"border": "1px solid #fafafa", "padding": "1em"},
         )
 
+        # Filters on the metadata of the structures
+        self.formula_widget = ipw.Text(
+            description="Formula:",
+            placeholder="e.g. H2O or C*H*",
+            continuous_update=False,
+        )
+        self.include_widget = ipw.Text(
+            description="Contains:",
+            placeholder="e.g. Cu, O",
+            continuous_update=False,
+        )
+        self.exclude_widget = ipw.Text(
+            description="Excludes:",
+            placeholder="e.g. H",
+            continuous_update=False,
+        )
+        self.min_atoms_widget = ipw.BoundedIntText(
+            value=0, min=0, max=2**31 - 1, description="Min. atoms:"
+        )
+        self.max_atoms_widget = ipw.BoundedIntText(
+            value=0,
+            min=0,
+            max=2**31 - 1,
+            description="Max. atoms:",
+            description_tooltip="0 for no maximum",
+        )
+        self.periodic_widget = ipw.Dropdown(
+            options=[("Any", None), ("Periodic", True), ("Non-periodic", False)],
+            description="Periodicity:",
+        )
+        self.metadata_widgets = [
+            self.formula_widget,
+            self.include_widget,
+            self.exclude_widget,
+            self.min_atoms_widget,
+            self.max_atoms_widget,
+            self.periodic_widget,
+        ]
+        for widget in self.metadata_widgets:
+            widget.observe(self.schedule_search, names="value")
+        metadata_selection = ipw.VBox(
+            [
+                ipw.HTML(value="<p>Filter the structures:</p>"),
+                ipw.HBox([self.formula_widget, self.periodic_widget]),
+                ipw.HBox([self.include_widget, self.exclude_widget]),
+                ipw.HBox([self.min_atoms_widget, self.max_atoms_widget]),
+            ],
+            layout={"border": "1px solid #fafafa", "padding": "1em"},
+        )
+
         h_line = ipw.HTML("<hr>")
-        box = ipw.VBox([age_selection, h_line, ipw.HBox([self.mode, self.drop_down])])
+        box = ipw.VBox(
+            [
+                age_selection,
+                metadata_selection,
+                h_line,
+                ipw.HBox([self.mode, self.drop_down]),
+            ]
+        )
 
-        self.results = ipw.Dropdown(layout={"width": "900px"})
+        # Only the visible window of matches is fetched, as the table is
+        # scrolled or sorted
+        self.results = WindowedTable(
+            self.columns,
+            self._fetch_window,
+            nrows=page_size,
+            sort_by="ctime",
+            layout={"width": "900px"},
+        )
         self.results.observe(self._on_select_structure, names="value")
-        self.search()
-        super().__init__([box, h_line, self.results])
+
+        self.status = ipw.HTML("")
+
+        self.add_btn = ipw.Button(
+            description="Add",
+            tooltip="Add the chosen match to the selection",
+            icon="plus",
+            layout={"width": "initial"},
+        )
+        self.add_btn.on_click(self.add_selected)
+        self.add_all_btn = ipw.Button(
+            description="Add All",
+            tooltip="Add every match of the search to the selection",
+            icon="check-double",
+            layout={"width": "initial", "margin": "2px 0 0 1em"},
+        )
+        self.add_all_btn.on_click(self.add_all)
+        self.clear_btn = ipw.Button(
+            description="Clear",
+            tooltip="Clear the selection",
+            icon="times",
+            layout={"width": "initial", "margin": "2px 0 0 1em"},
+        )
+        self.clear_btn.on_click(self.clear_selection)
+        self.selection_info = ipw.HTML("<p>0 selected</p>")
+        self.selection = []
+
+        self.schedule_search()
+        super().__init__(
+            [
+                box,
+                h_line,
+                self.results,
+                self.status,
+                ipw.HBox(
+                    [
+                        self.add_btn,
+                        self.add_all_btn,
+                        self.clear_btn,
+                        self.selection_info,
+                    ]
+                ),
+            ]
+        )
 
     def search(self, _=None) -> None:
         """Search structures in the AiiDA database."""
+        qbuild, uploaded_only = self._prepare_search()
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            self._loop = get_kernel_loop()
+        self._run_search(generation, qbuild, uploaded_only)
+        return
+
+    def schedule_search(self, _=None) -> None:
+        """
+        Search structures in the AiiDA database in the background.
+
+        The search is debounced, so it only starts once the search settings have
+        been left unchanged for `debounce` seconds. Any search that is still
+        waiting or running when a newer one is scheduled is abandoned. The query
+        is built from the settings straight away, and only run in the background.
+        """
+        qbuild, uploaded_only = self._prepare_search()
+        with self._lock:
+            self._generation += 1
+            self._loop = get_kernel_loop()
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(
+                self.debounce,
+                self._submit_search,
+                args=(self._generation, qbuild, uploaded_only),
+            )
+            self._timer.daemon = True
+            self._timer.start()
+        self.status.value = self._status_html("Waiting to search...")
+        return
+
+    def wait(self, timeout: float | None = None) -> None:
+        """
+        Block until the most recently scheduled search has finished.
+
+        If an event loop was running when the search was scheduled, its results
+        are only shown once control returns to the loop.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The maximum time to wait in seconds for each stage of the search.
+        """
+        if self._timer is not None:
+            self._timer.join(timeout)
+        if self._future is not None:
+            self._future.result(timeout)
+        return
+
+    def add_selected(self, _=None) -> None:
+        """Add the chosen match to the selection."""
+        node = self.data_object
+        if node is None or node.pk in {n.pk for n in self.selection}:
+            return
+        self._set_selection([*self.selection, node])
+        return
+
+    def add_all(self, _=None) -> None:
+        """Add every match of the last completed search to the selection."""
+        with self._lock:
+            if self._qbuild is None:
+                return
+            qbuild, uploaded_only = self._qbuild, self._uploaded_only
+            # Only the pks are needed, not the window of projections last fetched
+            qbuild.offset(None).limit(None)
+            if uploaded_only:
+                rows = exclude_nodes_with_incoming(qbuild, "structures")
+            else:
+                rows = qbuild.iterall(batch_size=self.page_size)
+            pks = [row[0] for row in rows]
+        selected = {node.pk for node in self.selection}
+        new_pks = [pk for pk in pks if pk not in selected]
+        self._set_selection([*self.selection, *load_nodes(new_pks)])
+        return
+
+    def clear_selection(self, _=None) -> None:
+        """Clear the selection."""
+        self._set_selection([])
+        return
+
+    def _set_selection(self, nodes: list[Data]) -> None:
+        """Replace the selection and update the nodes in use."""
+        self.selection = nodes
+        self.selection_info.value = f"<p>{len(nodes)} selected</p>"
+        self._update_data_objects()
+        return
+
+    def _update_data_objects(self) -> None:
+        """Use the selection, or the chosen node if nothing is selected."""
+        if self.selection:
+            self.data_objects = list(self.selection)
+        elif self.data_object is not None:
+            self.data_objects = [self.data_object]
+        else:
+            self.data_objects = []
+        return
+
+    def _submit_search(
+        self, generation: int, qbuild: QueryBuilder, uploaded_only: bool
+    ) -> Future:
+        """Queue a search on the background worker."""
+        self._future = self._executor.submit(
+            self._run_search, generation, qbuild, uploaded_only
+        )
+        return self._future
+
+    def _superseded(self, generation: int) -> bool:
+        """Return True if a newer search has been requested."""
+        return generation != self._generation
+
+    def _prepare_search(self) -> tuple[QueryBuilder, bool]:
+        """Build the ordered query of the current search settings."""
+        qbuild = self._build_query()
+        self._order_query(qbuild, self.results.sort_by, self.results.ascending)
+        return qbuild, self.mode.value == "uploaded"
+
+    @profiled("database.search")
+    def _run_search(
+        self, generation: int, qbuild: QueryBuilder, uploaded_only: bool
+    ) -> None:
+        """
+        Run a search, stopping early if a newer search is requested.
+
+        Only the database is queried here, the results are handed back to the
+        kernel's event loop to be shown. A running database query cannot be
+        interrupted, so the search checks whether it has been superseded
+        between each query and batch of results.
+        """
+        if self._superseded(generation):
+            return
+        call_in_loop(
+            self._loop, self._show_status, generation, self._status_html("Searching...")
+        )
+        try:
+            if uploaded_only:
+                nmatches = exclude_nodes_with_incoming(qbuild, "structures").count()
+            else:
+                nmatches = qbuild.count()
+            rows = []
+            for row in self._iter_page(qbuild, uploaded_only, 0, self.page_size):
+                rows.append(row)
+                if len(rows) % self.batch_size == 0 and self._superseded(generation):
+                    return
+        except Exception as err:
+            LOGGER.exception("Database search failed")
+            call_in_loop(
+                self._loop,
+                self._show_status,
+                generation,
+                f"<p style='color:red;'>Search failed: {err}</p>",
+            )
+            return
+        call_in_loop(
+            self._loop,
+            self._show_results,
+            generation,
+            qbuild,
+            uploaded_only,
+            nmatches,
+            rows,
+        )
+        return
+
+    def _show_status(self, generation: int, status: str) -> None:
+        """Show the status of a search, unless it has been superseded."""
+        if not self._superseded(generation):
+            self.status.value = status
+        return
+
+    def _show_results(
+        self,
+        generation: int,
+        qbuild: QueryBuilder,
+        uploaded_only: bool,
+        nmatches: int,
+        rows: list[list],
+    ) -> None:
+        """Show the first window of a search's matches in the results table."""
+        with self._lock:
+            if self._superseded(generation):
+                return
+            self._qbuild = qbuild
+            self._uploaded_only = uploaded_only
+        self.results.value = None
+        self.results.reset(nmatches, [self._format_row(*row) for row in rows])
+        self.status.value = ""
+        return
+
+    def _process_label_options(self) -> list[str]:
+        """Return the process label options from the refreshed label index."""
+        return sorted({"All"}.union(self.label_index.refresh()))
+
+    def _update_process_labels(self) -> None:
+        """Add any newly stored process labels to the drop down."""
+        options = self._process_label_options()
+        if list(self.drop_down.options) != options:
+            with self.drop_down.hold_trait_notifications():
+                value = self.drop_down.value
+                self.drop_down.options = options
+                self.drop_down.value = value if value in options else "All"
+        return
+
+    def _build_query(self) -> QueryBuilder:
+        """Build the (unpaginated) query for the current search settings."""
         qbuild = QueryBuilder()
 
         # If the date range is valid, use it for the search
@@ -105,17 +516,11 @@ class AiiDADatabaseWidget(ipw.VBox, tl.HasTraits):
 
         filters = {}
         filters["ctime"] = {"and": [{">": start_date}, {"<=": end_date}]}
+        filters.update(self._metadata_filters())
 
+        # Nodes with incoming links are excluded when the query is executed
         if self.mode.value == "uploaded":
-            qbuild2 = (
-                QueryBuilder()
-                .append(self.query_type, project=["id"], tag="structures")
-                .append(Node, with_outgoing="structures")
-            )
-            processed_nodes = [n[0] for n in qbuild2.all()]
-            if processed_nodes:
-                filters["id"] = {"!in": processed_nodes}
-            qbuild.append(self.query_type, filters=filters)
+            qbuild.append(self.query_type, filters=filters, tag="structures")
 
         elif self.mode.value == "calculated":
             if self.drop_down.value == "All":
@@ -130,6 +535,7 @@ class AiiDADatabaseWidget(ipw.VBox, tl.HasTraits):
                 self.query_type,
                 with_incoming="calcjobworkchain",
                 filters=filters,
+                tag="structures",
             )
 
         elif self.mode.value == "edited":
@@ -138,34 +544,105 @@ class AiiDADatabaseWidget(ipw.VBox, tl.HasTraits):
                 self.query_type,
                 with_incoming=CalcFunctionNode,
                 filters=filters,
+                tag="structures",
             )
 
         elif self.mode.value == "all":
-            qbuild.append(self.query_type, filters=filters)
+            qbuild.append(self.query_type, filters=filters, tag="structures")
+
+        # A node can be returned by more than one process so remove duplicate rows
+        qbuild.add_projection("structures", list(self.projections))
+        qbuild.distinct()
+        return qbuild
+
+    def _order_query(self, qbuild: QueryBuilder, sort_by: str, ascending: bool) -> None:
+        """
+        Order the matches of a query by a column of the results table.
+
+        The pk is included in the ordering to keep the windows stable.
+        """
+        order = "asc" if ascending else "desc"
+        field = self.sort_fields[sort_by]
+        if isinstance(field, tuple):
+            field, cast = field
+            sort_key = {field: {"order": order, "cast": cast}}
+        else:
+            sort_key = {field: order}
+        qbuild.order_by({"structures": [sort_key, {"id": order}]})
+        return
 
-        qbuild.order_by({self.query_type: {"ctime": "desc"}})
-        matches = {n[0] for n in qbuild.iterall()}
-        matches = sorted(matches, reverse=True, key=lambda n: n.ctime)
+    def _fetch_window(
+        self, offset: int, limit: int, sort_by: str, ascending: bool
+    ) -> list[tuple]:
+        """Fetch a window of the matches of the last search for the table."""
+        with self._lock:
+            if self._qbuild is None:
+                return []
+            self._order_query(self._qbuild, sort_by, ascending)
+            rows = self._iter_page(self._qbuild, self._uploaded_only, offset, limit)
+            return [self._format_row(*row) for row in rows]
 
-        options = [(f"Select a Structure ({len(matches)} found)", False)]
-        for mch in matches:
-            label = f"PK: {mch.pk}"
-            label += " | " + mch.ctime.strftime("%Y-%m-%d %H:%M")
-            label += " | " + mch.base.extras.get("formula", "")
-            label += " | " + mch.node_type.split(".")[-2]
-            label += " | " + mch.label
-            label += " | " + mch.description
-            options.append((label, mch))
+    def _metadata_filters(self) -> dict:
+        """Build the filters on the structures' metadata from the filter widgets."""
+        return structure_metadata_filters(
+            formula=self.formula_widget.value.strip(),
+            include=parse_elements(self.include_widget.value),
+            exclude=parse_elements(self.exclude_widget.value),
+            min_atoms=self.min_atoms_widget.value or None,
+            max_atoms=self.max_atoms_widget.value or None,
+            periodic=self.periodic_widget.value,
+        )
 
-        self.results.options = options
+    def _iter_page(
+        self, qbuild: QueryBuilder, uploaded_only: bool, offset: int, limit: int
+    ) -> Iterator[list]:
+        """Iterate over the rows of a window of matches in batches."""
+        if uploaded_only:
+            query = exclude_nodes_with_incoming(qbuild, "structures")
+            query = query.offset(offset).limit(limit)
+            yield from query.yield_per(self.batch_size)
+        else:
+            qbuild.offset(offset).limit(limit)
+            yield from qbuild.iterall(batch_size=self.batch_size)
         return
 
+    @staticmethod
+    def _status_html(message: str) -> str:
+        """Format a search progress message with a spinner."""
+        return f"<p><i class='fa fa-spinner fa-pulse'></i> {message}</p>"
+
+    @staticmethod
+    def _format_row(
+        pk: int,
+        ctime: datetime.datetime,
+        formula: str | None,
+        natoms: int | None,
+        node_type: str,
+        label: str,
+        description: str,
+    ) -> tuple:
+        """Format a projected query row as the cells of a table row."""
+        return (
+            pk,
+            ctime.strftime("%Y-%m-%d %H:%M"),
+            formula,
+            natoms,
+            node_type.split(".")[-2],
+            label,
+            description,
+        )
+
     def _on_select_structure(self, _) -> None:
-        self.data_object = self.results.value or None
+        """Load the selected node from the database."""
+        pk = self.results.value
+        self.data_object = load_node(pk) if pk is not None else None
+        self._update_data_objects()
         return
 
     def disable(self, val: bool) -> None:
         """Disable the widget."""
-        self.results.disabled = True
-        # self.
+        self.results.disabled = val
+        self.add_btn.disabled = val
+        self.add_all_btn.disabled = val
+        self.clear_btn.disabled = val
         return
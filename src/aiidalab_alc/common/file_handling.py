@@ -1,32 +1,82 @@
 """Module for providing functionality to deal with files."""
 
-from io import BytesIO
+import io
+from collections.abc import Iterator
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO
 
 import traitlets as tl
 from aiida.orm import SinglefileData
-from ipywidgets import FileUpload, HBox, Text
+from ipywidgets import HTML, Button, FileUpload, FloatProgress, HBox, Text
+
+from aiidalab_alc.common.files import (
+    CONTENT_HASH_EXTRA,
+    ProgressReader,
+    find_file_node,
+    hash_file,
+    is_archive,
+    iter_archive,
+    open_buffer,
+    set_structure_metadata,
+    spool_file,
+)
+from aiidalab_alc.common.profiling import profiled
 
 
 class FileUploadWidget(HBox, tl.HasTraits):
-    """A widget for uploading files."""
+    """
+    A widget for uploading files.
+
+    Files can either be uploaded from the browser, or chosen from the server's
+    filesystem. Browser uploads are held in memory by the kernel, so large
+    files should first be uploaded to the server through the Jupyter file
+    browser, which uploads them in chunks, and then chosen by their path.
+    Server files are streamed into the AiiDA repository in fixed size blocks.
+
+    Several files may be uploaded at once, and zip or tar archives are
+    unpacked into their member files as they are streamed. All the files are
+    held by the `files` trait in order, the first of which is `file`. The
+    structure metadata of each file is only extracted if the widget is
+    uploading structures.
+    """
+
+    chunk_size = 2**20
 
     file = tl.Instance(SinglefileData, allow_none=True)
+    files = tl.List(tl.Instance(SinglefileData))
+    reused = tl.Bool(False)
 
-    def __init__(self, description: str = "File: ", **kwargs):
+    def __init__(
+        self,
+        description: str = "File: ",
+        multiple: bool = False,
+        structures: bool = False,
+        **kwargs,
+    ):
         """
         FileUploadWidget constructor.
 
         Parameters
         ----------
+        description : str
+            The description of the file shown to the user.
+        multiple : bool
+            Whether several files may be uploaded at once.
+        structures : bool
+            Whether the files are structures, whose metadata is stored as
+            extras so they can be searched for.
         **kwargs :
             Keyword arguments passed to the parent class's constructor.
         """
         super().__init__(**kwargs)
         self.file_dict = None
+        self.file_dicts = []
+        self.file_path = None
+        self.structures = structures
 
         self.file_upload = FileUpload(
             accept="",
-            multiple=False,
+            multiple=multiple,
             description="Upload",
             layout={"width": "20%"},
         )
@@ -35,9 +85,39 @@ class FileUploadWidget(HBox, tl.HasTraits):
             placeholder="",
             description=description,
             disabled=True,
-            layout={"width": "70%"},
+            layout={"width": "60%"},
         )
-        self.children = [self.file_handle, self.file_upload]
+        self.status = HTML("", layout={"width": "20%", "margin": "0 0 0 1em"})
+
+        self.server_path = Text(
+            value="",
+            placeholder="Path to a file on the server",
+            description="Server file: ",
+            layout={"width": "60%"},
+        )
+        self.server_file_btn = Button(
+            description="Load",
+            tooltip="Use a file that is already on the server",
+            icon="folder-open",
+            layout={"width": "20%"},
+        )
+        self.server_file_btn.on_click(self._on_server_file)
+        self.progress = FloatProgress(
+            value=0.0,
+            min=0.0,
+            max=1.0,
+            layout={"width": "20%", "visibility": "hidden"},
+        )
+
+        self.layout.flex_flow = "row wrap"
+        self.children = [
+            self.file_handle,
+            self.file_upload,
+            self.status,
+            self.server_path,
+            self.server_file_btn,
+            self.progress,
+        ]
 
         self.file_upload.observe(self._on_file_upload, names="value")
 
@@ -51,39 +131,187 @@ class FileUploadWidget(HBox, tl.HasTraits):
     def _on_file_upload(self, _):
         """Handle file upload events."""
         if self.file_upload.value:
-            self.file_dict = self.file_upload.value[
-                list(self.file_upload.value.keys())[0]
-            ]
-            self.file_handle.value = self.file_dict["metadata"]["name"]
-            self.file = self.get_aiida_file_object()
+            self.file_dicts = list(self.file_upload.value.values())
+            self.file_dict = self.file_dicts[0]
+            self.file_path = None
+            self.file_handle.value = ", ".join(
+                file_dict["metadata"]["name"] for file_dict in self.file_dicts
+            )
+            self._update_file()
         else:
             self.file_handle.value = ""
+            self.status.value = ""
+        return
+
+    def _on_server_file(self, _=None) -> None:
+        """Handle a file being chosen from the server's filesystem."""
+        path = Path(self.server_path.value).expanduser()
+        if not path.is_file():
+            self.status.value = "<p style='color:red;'>File not found</p>"
+            return
+        self.file_dict = None
+        self.file_dicts = []
+        self.file_path = path.resolve()
+        self.file_handle.value = path.name
+        self._update_file()
+        return
+
+    def _update_file(self) -> None:
+        """Create the AiiDA file objects for the current files."""
+        files, nreused = self.get_aiida_file_objects()
+        if len(files) == 1 and self.reused:
+            self.status.value = f"<p>Reused existing node PK {files[0].pk}</p>"
+        elif len(files) > 1:
+            self.status.value = f"<p>{len(files)} files ({nreused} reused)</p>"
+        elif not files:
+            self.status.value = "<p style='color:red;'>No files found</p>"
+        else:
+            self.status.value = ""
+        self.files = files
+        self.file = files[0] if files else None
         return
 
-    def get_file_contents(self) -> BytesIO | None:
-        """Get the contents of the uploaded file as a BytesIO object."""
+    def get_file_contents(self) -> BinaryIO | None:
+        """Get the contents of the uploaded file as a binary file object."""
+        if self.file_path is not None:
+            return open(self.file_path, "rb")
         if self.file_dict is not None:
-            return BytesIO(self.file_dict["content"])
+            return open_buffer(self.file_dict["content"])
         return None
 
+    def get_file_size(self) -> int:
+        """Get the size of the uploaded file in bytes."""
+        if self.file_path is not None:
+            return self.file_path.stat().st_size
+        if self.file_dict is not None:
+            return memoryview(self.file_dict["content"]).nbytes
+        return 0
+
     def filename(self) -> str:
         """Get the name of the uploaded file."""
+        if self.file_path is not None:
+            return self.file_path.name
         if self.file_dict is not None:
             return self.file_dict["metadata"]["name"]
         return ""
 
-    def get_aiida_file_object(self):
-        """Get the uploaded file as an AiiDA SinglefileData object."""
-        if self.file_dict is not None:
-            return SinglefileData(
-                file=self.get_file_contents(),
+    def _open_with_progress(self, stage: str) -> io.BufferedReader:
+        """Open the file, reporting the progress of reading it."""
+        size = max(self.get_file_size(), 1)
+        self.progress.description = stage
+        self.progress.value = 0.0
+        self.progress.layout.visibility = "visible"
+
+        def _update_progress(nread: int) -> None:
+            # Limit the number of updates sent to the front end
+            if nread == size or nread / size - self.progress.value >= 0.01:
+                self.progress.value = nread / size
+
+        return io.BufferedReader(
+            ProgressReader(self.get_file_contents(), _update_progress),
+            buffer_size=self.chunk_size,
+        )
+
+    def get_aiida_file_object(self) -> SinglefileData | None:
+        """
+        Get the uploaded file as an AiiDA SinglefileData object.
+
+        If a file with identical contents has already been stored in the AiiDA
+        database the existing node is reused rather than storing another copy.
+        """
+        self.reused = False
+        if self.file_dict is None and self.file_path is None:
+            return None
+
+        with self._open_with_progress("Hashing:") as handle:
+            digest = hash_file(handle, chunk_size=self.chunk_size)
+        node = find_file_node(digest)
+        if node is not None:
+            self.reused = True
+            return node
+
+        with self._open_with_progress("Storing:") as handle:
+            node = SinglefileData(
+                file=handle,
                 filename=self.filename(),
                 label=self.filename(),
                 description=self.file_handle.description,
             )
-        return None
+        node.base.extras.set(CONTENT_HASH_EXTRA, digest)
+        if self.structures:
+            with self._open_with_progress("Analysing:") as handle:
+                set_structure_metadata(node, handle)
+        return node
+
+    @profiled("upload.store")
+    def get_aiida_file_objects(self) -> tuple[list[SinglefileData], int]:
+        """
+        Get all the uploaded files as AiiDA SinglefileData objects.
+
+        Archives are unpacked into a node per member file. Afterwards the
+        current file is left as the first uploaded file, unless that is an
+        archive, in which case there is no current file.
+
+        Returns
+        -------
+        tuple[list[SinglefileData], int]
+            The file nodes in upload order and the number of them that are
+            existing nodes being reused.
+        """
+        if self.file_path is not None:
+            entries = [(None, self.file_path)]
+        else:
+            entries = [(file_dict, None) for file_dict in self.file_dicts]
+
+        nodes = []
+        nreused = 0
+        for file_dict, file_path in entries:
+            self.file_dict, self.file_path = file_dict, file_path
+            if is_archive(self.filename()):
+                with self._open_with_progress("Unpacking:") as handle:
+                    for node, reused in self._iter_archive_file_objects(handle):
+                        nodes.append(node)
+                        nreused += reused
+            else:
+                nodes.append(self.get_aiida_file_object())
+                nreused += self.reused
+
+        self.file_dict, self.file_path = entries[0] if entries else (None, None)
+        if is_archive(self.filename()):
+            self.file_dict, self.file_path = None, None
+        self.reused = len(nodes) == 1 and nreused == 1
+        return nodes, nreused
+
+    def _iter_archive_file_objects(
+        self, handle: BinaryIO
+    ) -> Iterator[tuple[SinglefileData, bool]]:
+        """Create a file node for each member of an archive."""
+        archive_name = self.filename()
+        description = f"{self.file_handle.description.strip()} {archive_name}"
+        for name, member in iter_archive(handle, archive_name):
+            spool, digest = spool_file(member, chunk_size=self.chunk_size)
+            with spool:
+                node = find_file_node(digest)
+                if node is not None:
+                    yield node, True
+                    continue
+                filename = PurePosixPath(name).name
+                node = SinglefileData(
+                    file=spool,
+                    filename=filename,
+                    label=filename,
+                    description=description,
+                )
+                if self.structures:
+                    spool.seek(0)
+                    set_structure_metadata(node, spool)
+            node.base.extras.set(CONTENT_HASH_EXTRA, digest)
+            yield node, False
+        return
 
     def disable(self, val: bool) -> None:
         """Disable the file upload widget."""
         self.file_upload.disabled = val
+        self.server_path.disabled = val
+        self.server_file_btn.disabled = val
         return
@@ -0,0 +1,544 @@
+"""Module for reading, hashing and storing files, independent of any widgets."""
+
+import hashlib
+import io
+import shutil
+import tarfile
+import zipfile
+from collections.abc import Callable, Iterator
+from pathlib import Path, PurePosixPath
+from tempfile import NamedTemporaryFile, SpooledTemporaryFile
+from typing import TYPE_CHECKING, BinaryIO
+
+from aiida.orm import QueryBuilder, SinglefileData
+
+from aiidalab_alc.common.profiling import add_bytes, profile
+from aiidalab_alc.common.queries import load_nodes
+
+if TYPE_CHECKING:
+    import ase
+
+# Memory backed directory for parsers that cannot read from a file object
+SHM_DIR = Path("/dev/shm")
+
+# Extra used to record the SHA-256 hash of a file node's contents
+CONTENT_HASH_EXTRA = "content_sha256"
+
+# Extra recording the format of a structure file, set once its metadata has
+# been extracted, None if it could not be read as a structure
+METADATA_MARKER_EXTRA = "format"
+
+# Archives of files which are unpacked on upload
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tgz", ".tbz2", ".txz")
+ARCHIVE_COMPRESSED_SUFFIXES = (".gz", ".bz2", ".xz")
+
+# Archive members larger than this are spooled to disk rather than memory
+SPOOL_MAX_SIZE = 2**26
+
+
+class BufferReader(io.RawIOBase):
+    """
+    A seekable, read-only binary stream over an in-memory buffer.
+
+    Unlike `io.BytesIO`, which copies any buffer other than a bytes object,
+    reads are served straight from a memoryview of the buffer so large
+    uploads are never duplicated in memory.
+    """
+
+    def __init__(self, buffer: bytes | memoryview):
+        """
+        BufferReader constructor.
+
+        Parameters
+        ----------
+        buffer : bytes or memoryview
+            The buffer to read from.
+        """
+        super().__init__()
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+        return
+
+    def readable(self) -> bool:
+        """Return True, the stream can always be read."""
+        return True
+
+    def seekable(self) -> bool:
+        """Return True, the stream supports random access."""
+        return True
+
+    def readinto(self, b) -> int:
+        """Read bytes into a pre-allocated buffer and return the number read."""
+        nbytes = max(0, min(len(b), len(self._view) - self._pos))
+        b[:nbytes] = self._view[self._pos : self._pos + nbytes]
+        self._pos += nbytes
+        return nbytes
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """Change the stream position and return the new absolute position."""
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError(f"negative seek position {offset}")
+        self._pos = offset
+        return self._pos
+
+    def tell(self) -> int:
+        """Return the current stream position."""
+        return self._pos
+
+
+class ProgressReader(io.RawIOBase):
+    """A binary stream that reports its position as it is read."""
+
+    def __init__(self, handle: BinaryIO, callback: Callable[[int], None]):
+        """
+        ProgressReader constructor.
+
+        Parameters
+        ----------
+        handle : BinaryIO
+            The binary file object to read from.
+        callback : Callable[[int], None]
+            Called with the position in the stream after each read, which
+            is the total number of bytes read unless the stream is seeked.
+        """
+        super().__init__()
+        self._handle = handle
+        self._callback = callback
+        self._nread = 0
+        return
+
+    def readable(self) -> bool:
+        """Return True, the stream can always be read."""
+        return True
+
+    def seekable(self) -> bool:
+        """Return True if the underlying file object supports random access."""
+        return self._handle.seekable()
+
+    def readinto(self, b) -> int:
+        """Read bytes into a pre-allocated buffer and return the number read."""
+        nbytes = self._handle.readinto(b)
+        self._nread += nbytes
+        add_bytes(nbytes)
+        self._callback(self._nread)
+        return nbytes
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """Change the stream position and return the new absolute position."""
+        self._nread = self._handle.seek(offset, whence)
+        return self._nread
+
+    def tell(self) -> int:
+        """Return the current stream position."""
+        return self._nread
+
+    def close(self) -> None:
+        """Close the stream and the underlying file object."""
+        self._handle.close()
+        super().close()
+        return
+
+
+def open_buffer(buffer: bytes | memoryview) -> io.BufferedReader:
+    """
+    Open an in-memory buffer as a binary file object without copying it.
+
+    Parameters
+    ----------
+    buffer : bytes or memoryview
+        The buffer to read from.
+
+    Returns
+    -------
+    io.BufferedReader
+        A seekable binary file object reading from the buffer.
+    """
+    return io.BufferedReader(BufferReader(buffer))
+
+
+def hash_file(handle: BinaryIO, chunk_size: int = 2**20) -> str:
+    """
+    Compute the SHA-256 hash of a file's contents.
+
+    The file is streamed in fixed size chunks, so it is never loaded into
+    memory in full, and is rewound once it has been hashed if it is seekable.
+
+    Parameters
+    ----------
+    handle : BinaryIO
+        A binary file object for the file.
+    chunk_size : int
+        The number of bytes read from the file at a time.
+
+    Returns
+    -------
+    str
+        The hex digest of the file's contents.
+    """
+    sha256 = hashlib.sha256()
+    while chunk := handle.read(chunk_size):
+        sha256.update(chunk)
+    if handle.seekable():
+        handle.seek(0)
+    return sha256.hexdigest()
+
+
+def is_archive(filename: str) -> bool:
+    """
+    Check whether a file is a zip or tar archive from its name.
+
+    Parameters
+    ----------
+    filename : str
+        The name of the file.
+
+    Returns
+    -------
+    bool
+        True if the file is an archive of files to be unpacked.
+    """
+    suffixes = [suffix.lower() for suffix in Path(filename).suffixes]
+    if not suffixes:
+        return False
+    if suffixes[-1] in ARCHIVE_SUFFIXES:
+        return True
+    return (
+        len(suffixes) > 1
+        and suffixes[-1] in ARCHIVE_COMPRESSED_SUFFIXES
+        and suffixes[-2] == ".tar"
+    )
+
+
+def iter_archive(handle: BinaryIO, filename: str) -> Iterator[tuple[str, BinaryIO]]:
+    """
+    Iterate over the regular files in a zip or tar archive.
+
+    Tar archives are read in a single pass, so the handle need not be
+    seekable, zip archives are read through their central directory. Each
+    member is streamed from the archive and must be consumed before the
+    next is requested. Hidden files and directories are skipped.
+
+    Parameters
+    ----------
+    handle : BinaryIO
+        A binary file object for the archive.
+    filename : str
+        The name of the archive, used to detect its format.
+
+    Yields
+    ------
+    tuple[str, BinaryIO]
+        The path of each member within the archive and a binary file object
+        for its contents.
+    """
+
+    def _hidden(name: str) -> bool:
+        return any(
+            part.startswith((".", "__MACOSX")) for part in PurePosixPath(name).parts
+        )
+
+    if Path(filename).suffix.lower() == ".zip":
+        with zipfile.ZipFile(handle) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or _hidden(info.filename):
+                    continue
+                with archive.open(info) as member:
+                    yield info.filename, member
+        return
+
+    with tarfile.open(fileobj=handle, mode="r|*") as archive:
+        for info in archive:
+            if not info.isfile() or _hidden(info.name):
+                continue
+            member = archive.extractfile(info)
+            yield info.name, member
+            member.close()
+    return
+
+
+def spool_file(
+    handle: BinaryIO, chunk_size: int = 2**20
+) -> tuple[SpooledTemporaryFile, str]:
+    """
+    Copy a file into a temporary file, hashing its contents in the same pass.
+
+    Parameters
+    ----------
+    handle : BinaryIO
+        A binary file object for the file, which need not be seekable.
+    chunk_size : int
+        The number of bytes read from the file at a time.
+
+    Returns
+    -------
+    tuple[SpooledTemporaryFile, str]
+        The rewound temporary copy, held in memory unless it is large, and
+        the SHA-256 hex digest of the file's contents.
+    """
+    sha256 = hashlib.sha256()
+    spool = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    while chunk := handle.read(chunk_size):
+        sha256.update(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+    return spool, sha256.hexdigest()
+
+
+def find_file_node(digest: str) -> SinglefileData | None:
+    """
+    Find a stored file node with the given content hash.
+
+    Parameters
+    ----------
+    digest : str
+        The SHA-256 hex digest of the file's contents.
+
+    Returns
+    -------
+    SinglefileData or None
+        The most recently created matching node, or None if there is no match.
+    """
+    qbuild = QueryBuilder().append(
+        SinglefileData,
+        filters={f"extras.{CONTENT_HASH_EXTRA}": digest},
+        tag="file",
+    )
+    qbuild.order_by({"file": {"ctime": "desc"}}).limit(1)
+    return qbuild.first(flat=True)
+
+
+def detect_structure_format(handle: BinaryIO, filename: str) -> str:
+    """
+    Detect the ASE format of a structure file from its name and header.
+
+    Parameters
+    ----------
+    handle : BinaryIO
+        A seekable binary file object for the file, only its header is read.
+    filename : str
+        The name of the file.
+
+    Returns
+    -------
+    str
+        The name of the ASE io format.
+
+    Raises
+    ------
+    ase.io.formats.UnknownFileTypeError
+        If the format could not be detected.
+    """
+    from ase.io.formats import (
+        PEEK_BYTES,
+        UnknownFileTypeError,
+        extension2format,
+        filetype,
+        match_magic,
+    )
+
+    header = handle.read(PEEK_BYTES)
+    handle.seek(0)
+    if not header:
+        raise UnknownFileTypeError(f"Empty file: {filename}")
+    try:
+        return match_magic(header).name
+    except UnknownFileTypeError:
+        pass
+    try:
+        return filetype(Path(filename).name, read=False)
+    except UnknownFileTypeError:
+        lines = header.splitlines()
+        if lines and lines[0].strip().isdigit():
+            return extension2format["xyz"].name
+        raise
+
+
+def read_structure(
+    handle: BinaryIO, filename: str, index: int = 0, format: str | None = None
+) -> tuple["ase.Atoms", str]:
+    """
+    Read a single frame of a structure file from a binary file object.
+
+    The file object is handed to ASE directly when the format's parser
+    supports it, otherwise it is copied to a memory backed temporary file.
+
+    Parameters
+    ----------
+    handle : BinaryIO
+        A seekable binary file object for the file.
+    filename : str
+        The name of the file, used to detect its format.
+    index : int
+        The index of the frame to read, only this frame is parsed.
+    format : str, optional
+        The ASE io format of the file, detected if not given.
+
+    Returns
+    -------
+    tuple[ase.Atoms, str]
+        The structure and the ASE io format of the file.
+    """
+    import ase.io
+    from ase.io.formats import get_ioformat
+
+    if format is None:
+        format = detect_structure_format(handle, filename)
+    ioformat = get_ioformat(format)
+
+    if not ioformat.acceptsfd or not handle.seekable():
+        shm_dir = SHM_DIR if SHM_DIR.is_dir() else None
+        suffix = "".join(Path(filename).suffixes)
+        with NamedTemporaryFile(suffix=suffix, dir=shm_dir) as tmpf:
+            shutil.copyfileobj(handle, tmpf)
+            tmpf.flush()
+            return ase.io.read(tmpf.name, index=index, format=format), format
+
+    if ioformat.isbinary:
+        return ase.io.read(handle, index=index, format=format), format
+
+    text = io.TextIOWrapper(handle, encoding="utf-8", errors="replace")
+    try:
+        return ase.io.read(text, index=index, format=format), format
+    finally:
+        # Leave the caller's file object open
+        text.detach()
+
+
+def extract_structure_metadata(handle: BinaryIO, filename: str) -> dict:
+    """
+    Parse the first frame of a structure file and summarise it.
+
+    Parameters
+    ----------
+    handle : BinaryIO
+        A seekable binary file object for the file.
+    filename : str
+        The name of the file, used to detect its format.
+
+    Returns
+    -------
+    dict
+        The metadata extras of the file: its chemical formula, number of
+        atoms, sorted elements, periodicity, cell volume (None unless the
+        cell is three dimensional) and ASE io format. Only the format is
+        given, as None, if the file could not be read as a structure.
+    """
+    try:
+        atoms, format = read_structure(handle, filename)
+    except Exception:
+        # Any file may be uploaded, most parse errors just mean it is not a
+        # structure, so the file is recorded as unreadable instead
+        return {"format": None}
+    periodic = bool(atoms.pbc.any())
+    return {
+        "formula": atoms.get_chemical_formula(),
+        "natoms": len(atoms),
+        "elements": sorted(set(atoms.get_chemical_symbols())),
+        "periodic": periodic,
+        "volume": float(atoms.cell.volume) if atoms.cell.rank == 3 else None,
+        "format": format,
+    }
+
+
+def set_structure_metadata(node: SinglefileData, handle: BinaryIO) -> None:
+    """
+    Store the metadata of a structure file as extras of its node.
+
+    Parameters
+    ----------
+    node : SinglefileData
+        The file node, which may be unstored.
+    handle : BinaryIO
+        A seekable binary file object for the file's contents.
+    """
+    with profile("upload.extract_metadata"):
+        metadata = extract_structure_metadata(handle, node.filename)
+    node.base.extras.set_many(metadata)
+    return
+
+
+def backfill_structure_metadata(
+    batch_size: int = 100, callback: Callable[[int, int], None] | None = None
+) -> int:
+    """
+    Store the metadata extras of the file nodes that do not have them yet.
+
+    Parameters
+    ----------
+    batch_size : int
+        The number of nodes loaded from the database at a time.
+    callback : Callable[[int, int], None], optional
+        Called with the number of nodes done and the total after each batch.
+
+    Returns
+    -------
+    int
+        The number of nodes updated.
+    """
+    qbuild = QueryBuilder().append(
+        SinglefileData,
+        filters={"extras": {"!has_key": METADATA_MARKER_EXTRA}},
+        project="id",
+        tag="file",
+    )
+    # The ids are fetched up front as setting extras commits the session,
+    # which would invalidate an open cursor
+    pks = qbuild.order_by({"file": {"id": "asc"}}).all(flat=True)
+    for start in range(0, len(pks), batch_size):
+        for node in load_nodes(pks[start : start + batch_size]):
+            with node.open(mode="rb") as handle:
+                set_structure_metadata(node, handle)
+        if callback is not None:
+            callback(min(start + batch_size, len(pks)), len(pks))
+    return len(pks)
+
+
+def store_file(
+    path: str | Path,
+    description: str = "",
+    structures: bool = False,
+    chunk_size: int = 2**20,
+) -> tuple[SinglefileData, bool]:
+    """
+    Store a file from the filesystem as a SinglefileData node.
+
+    If a file with identical contents has already been stored in the AiiDA
+    database the existing node is reused rather than storing another copy,
+    otherwise the new node is stored with its content hash, and the metadata
+    of a structure file.
+
+    Parameters
+    ----------
+    path : str or Path
+        The path of the file.
+    description : str
+        The description of a new node.
+    structures : bool
+        Whether the file is a structure, whose metadata is stored as extras.
+    chunk_size : int
+        The number of bytes read at a time.
+
+    Returns
+    -------
+    tuple[SinglefileData, bool]
+        The stored node and whether it is an existing node being reused.
+    """
+    path = Path(path).expanduser()
+    with open(path, "rb") as handle:
+        digest = hash_file(handle, chunk_size=chunk_size)
+        node = find_file_node(digest)
+        if node is not None:
+            return node, True
+        handle.seek(0)
+        node = SinglefileData(
+            file=handle, filename=path.name, label=path.name, description=description
+        )
+        node.base.extras.set(CONTENT_HASH_EXTRA, digest)
+        if structures:
+            handle.seek(0)
+            set_structure_metadata(node, handle)
+    return node.store(), False
@@ -0,0 +1,315 @@
+"""
+Module for lightweight profiling of the app's hot paths.
+
+Profiling is off by default and is switched on by setting the
+`AIIDALAB_ALC_PROFILE` environment variable to a non-empty value other than
+"0". While it is off the context managers and decorators only check a flag.
+While it is on each profiled operation records a `Span` with its wall time,
+the number of database queries run on its thread and the bytes of file data
+it reported with `add_bytes`.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, NamedTuple
+
+# Environment variable switching profiling on
+PROFILE_ENV_VAR = "AIIDALAB_ALC_PROFILE"
+
+# Maximum number of spans kept, the oldest are discarded first
+MAX_SPANS = 10000
+
+
+class Span(NamedTuple):
+    """A single profiled operation."""
+
+    name: str
+    start: float
+    duration: float
+    queries: int
+    nbytes: int
+    thread: int
+    depth: int
+    metadata: dict
+
+
+class _ActiveSpan:
+    """The counters of a span which has not finished yet."""
+
+    __slots__ = ("name", "start", "queries", "nbytes", "metadata")
+
+    def __init__(self, name: str, metadata: dict):
+        self.name = name
+        self.metadata = metadata
+        self.queries = 0
+        self.nbytes = 0
+        self.start = time.perf_counter()
+
+
+class Profiler:
+    """
+    Record the spans of profiled operations.
+
+    Spans may be nested and run on any thread. The queries and bytes of a
+    span include those of the spans nested inside it on the same thread.
+    """
+
+    def __init__(self, enabled: bool | None = None, max_spans: int = MAX_SPANS):
+        """
+        Profiler constructor.
+
+        Parameters
+        ----------
+        enabled : bool, optional
+            Whether to record spans, read from the environment if not given.
+        max_spans : int
+            The maximum number of spans kept.
+        """
+        if enabled is None:
+            enabled = os.environ.get(PROFILE_ENV_VAR, "") not in ("", "0")
+        self.origin = time.perf_counter()
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._listening = False
+        self.enabled = enabled
+        return
+
+    @property
+    def enabled(self) -> bool:
+        """Whether spans are recorded."""
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value: bool) -> None:
+        self._enabled = bool(value)
+        if self._enabled:
+            self._listen()
+        return
+
+    @property
+    def spans(self) -> list[Span]:
+        """The finished spans, in the order they finished."""
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self) -> None:
+        """Discard the recorded spans."""
+        with self._lock:
+            self._spans.clear()
+        return
+
+    @contextmanager
+    def span(self, name: str, **metadata) -> Iterator[None]:
+        """
+        Profile the enclosed block as a span.
+
+        Parameters
+        ----------
+        name : str
+            The name of the operation, dotted by component, e.g. "database.search".
+        **metadata :
+            Extra information recorded with the span.
+        """
+        if not self.enabled:
+            yield
+            return
+        stack = self._stack()
+        active = _ActiveSpan(name, metadata)
+        stack.append(active)
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            stack.pop()
+            if stack:
+                stack[-1].queries += active.queries
+                stack[-1].nbytes += active.nbytes
+            span = Span(
+                name=name,
+                start=active.start - self.origin,
+                duration=end - active.start,
+                queries=active.queries,
+                nbytes=active.nbytes,
+                thread=threading.get_ident(),
+                depth=len(stack),
+                metadata=metadata,
+            )
+            with self._lock:
+                self._spans.append(span)
+        return
+
+    def add_bytes(self, nbytes: int) -> None:
+        """
+        Record bytes of data moved by the current span.
+
+        Parameters
+        ----------
+        nbytes : int
+            The number of bytes read, written or transferred.
+        """
+        if self.enabled and (stack := self._stack()):
+            stack[-1].nbytes += nbytes
+        return
+
+    def summary(self) -> list[dict]:
+        """
+        Aggregate the spans by name.
+
+        Returns
+        -------
+        list[dict]
+            The count, total and maximum time, queries and bytes of each
+            operation, slowest first.
+        """
+        totals = {}
+        for span in self.spans:
+            entry = totals.setdefault(
+                span.name,
+                {
+                    "name": span.name,
+                    "count": 0,
+                    "total": 0.0,
+                    "max": 0.0,
+                    "queries": 0,
+                    "nbytes": 0,
+                },
+            )
+            entry["count"] += 1
+            entry["total"] += span.duration
+            entry["max"] = max(entry["max"], span.duration)
+            entry["queries"] += span.queries
+            entry["nbytes"] += span.nbytes
+        return sorted(totals.values(), key=lambda e: e["total"], reverse=True)
+
+    def to_json(self) -> dict:
+        """Return the recorded spans and their summary as a JSON object."""
+        return {
+            "spans": [span._asdict() for span in self.spans],
+            "summary": self.summary(),
+        }
+
+    def to_chrome_trace(self) -> dict:
+        """
+        Return the recorded spans in the Chrome trace event format.
+
+        The trace can be opened in chrome://tracing or https://ui.perfetto.dev.
+        """
+        pid = os.getpid()
+        events = [
+            {
+                "name": span.name,
+                "ph": "X",
+                "ts": span.start * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": pid,
+                "tid": span.thread,
+                "args": {
+                    "queries": span.queries,
+                    "bytes": span.nbytes,
+                    **{k: str(v) for k, v in span.metadata.items()},
+                },
+            }
+            for span in self.spans
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path: str | Path, chrome_trace: bool = False) -> Path:
+        """
+        Write the recorded spans to a JSON file.
+
+        Parameters
+        ----------
+        path : str or Path
+            The file to write.
+        chrome_trace : bool
+            Write the Chrome trace event format rather than the plain spans.
+
+        Returns
+        -------
+        Path
+            The path of the written file.
+        """
+        path = Path(path)
+        data = self.to_chrome_trace() if chrome_trace else self.to_json()
+        path.write_text(json.dumps(data, indent=1, default=str))
+        return path
+
+    def _stack(self) -> list[_ActiveSpan]:
+        """Return the active spans of the current thread, innermost last."""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _listen(self) -> None:
+        """Count the database queries run by each thread's innermost span."""
+        if self._listening:
+            return
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        event.listen(Engine, "after_cursor_execute", self._on_query)
+        self._listening = True
+        return
+
+    def _on_query(self, *_) -> None:
+        if self.enabled and (stack := self._stack()):
+            stack[-1].queries += 1
+        return
+
+
+# The app wide profiler
+profiler = Profiler()
+
+
+def profile(name: str, **metadata):
+    """
+    Profile the enclosed block with the app wide profiler.
+
+    Parameters
+    ----------
+    name : str
+        The name of the operation.
+    **metadata :
+        Extra information recorded with the span.
+    """
+    return profiler.span(name, **metadata)
+
+
+def profiled(name: str | None = None) -> Callable:
+    """
+    Profile each call of the decorated function with the app wide profiler.
+
+    Parameters
+    ----------
+    name : str, optional
+        The name of the operation, the function's qualified name if not given.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            with profiler.span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def add_bytes(nbytes: int) -> None:
+    """Record bytes of data moved by the current span of the app wide profiler."""
+    profiler.add_bytes(nbytes)
+    return
@@ -0,0 +1,335 @@
+"""Module for queries on the AiiDA database, independent of any widgets."""
+
+import json
+import pathlib
+import re
+from collections import Counter
+
+import sqlalchemy as sa
+from aiida.common.hashing import make_hash
+from aiida.manage import get_manager
+from aiida.orm import (
+    CalcJobNode,
+    Node,
+    QueryBuilder,
+    WorkChainNode,
+)
+from sqlalchemy.orm import Query, aliased
+
+from aiidalab_alc.utils import get_cache_dir
+
+# The helpers below extend the SQL query generated by the storage backend's
+# QueryBuilder implementation, which is private to aiida-core. The version of
+# aiida-core is bounded in setup.cfg to the release series they were checked
+# against, and tests/test_database.py tests them directly.
+
+
+def exclude_nodes_with_incoming(qbuild: QueryBuilder, tag: str) -> Query:
+    """
+    Restrict a query to nodes that have no incoming links.
+
+    The QueryBuilder can only join across links with an inner join, so the
+    anti-join is added as a ``NOT EXISTS`` subquery to the SQL query generated
+    by the storage backend. This keeps the whole search inside the database
+    rather than pulling the ids of every linked node into Python.
+
+    Parameters
+    ----------
+    qbuild : QueryBuilder
+        The query to restrict, it must not have an offset or limit applied.
+    tag : str
+        The tag of the vertex in the query path to restrict.
+
+    Returns
+    -------
+    sqlalchemy.orm.Query
+        The restricted query, which may be paginated and executed directly.
+    """
+    backend_qb = qbuild._impl
+    built = backend_qb.get_query(qbuild.as_dict())
+    node = built.tag_to_alias[tag]
+    link = backend_qb.Link
+    return built.query.filter(~sa.exists().where(link.output_id == node.id))
+
+
+def count_by_projections(qbuild: QueryBuilder) -> Counter:
+    """
+    Count the rows of a query grouped by their projected values.
+
+    The counting is done by the database in a single ``GROUP BY`` query over
+    the SQL query generated by the storage backend, so no rows or nodes are
+    loaded into Python.
+
+    Parameters
+    ----------
+    qbuild : QueryBuilder
+        The query to count, grouped by all of its projections.
+
+    Returns
+    -------
+    Counter
+        The number of rows for each tuple of projected values.
+    """
+    backend_qb = qbuild._impl
+    built = backend_qb.get_query(qbuild.as_dict())
+    rows = built.query.subquery()
+    stmt = sa.select(*rows.c, sa.func.count()).group_by(*rows.c)
+    return Counter(
+        {tuple(row[:-1]): row[-1] for row in backend_qb.get_session().execute(stmt)}
+    )
+
+
+def count_by_input_label(qbuild: QueryBuilder, tag: str, link_label: str) -> Counter:
+    """
+    Count the rows of a query grouped by their projections and an input's label.
+
+    The QueryBuilder joins across links with an inner join, and filters the
+    type of the joined node in the ``WHERE`` clause, so nodes without the input
+    would be dropped. Instead the input is outer joined on its link label in
+    the SQL query generated by the storage backend, and the rows are counted
+    by the database in a single ``GROUP BY`` query.
+
+    Parameters
+    ----------
+    qbuild : QueryBuilder
+        The query to count, grouped by all of its projections.
+    tag : str
+        The tag of the vertex in the query path whose input is joined.
+    link_label : str
+        The label of the link from the input, e.g. "code".
+
+    Returns
+    -------
+    Counter
+        The number of rows for each tuple of projected values followed by the
+        label of the input, None for the rows without the input.
+    """
+    backend_qb = qbuild._impl
+    built = backend_qb.get_query(qbuild.as_dict())
+    node = built.tag_to_alias[tag]
+    link = aliased(backend_qb.Link)
+    source = aliased(backend_qb.Node)
+    query = (
+        built.query.outerjoin(
+            link, sa.and_(link.output_id == node.id, link.label == link_label)
+        )
+        .outerjoin(source, source.id == link.input_id)
+        .add_columns(source.label)
+    )
+    rows = query.subquery()
+    stmt = sa.select(*rows.c, sa.func.count()).group_by(*rows.c)
+    return Counter(
+        {tuple(row[:-1]): row[-1] for row in backend_qb.get_session().execute(stmt)}
+    )
+
+
+def parse_elements(text: str) -> list[str]:
+    """
+    Parse a list of chemical element symbols.
+
+    Parameters
+    ----------
+    text : str
+        The symbols separated by commas or whitespace, in any case.
+
+    Returns
+    -------
+    list[str]
+        The capitalised symbols, e.g. ``["H", "Cu"]`` for "h, CU".
+    """
+    return [symbol.capitalize() for symbol in re.split(r"[\s,]+", text) if symbol]
+
+
+def structure_metadata_filters(
+    formula: str = "",
+    include: list[str] | None = None,
+    exclude: list[str] | None = None,
+    min_atoms: int | None = None,
+    max_atoms: int | None = None,
+    periodic: bool | None = None,
+) -> dict:
+    """
+    Build QueryBuilder filters on the metadata extras of structure files.
+
+    The filters match the extras stored when a structure file is uploaded, so
+    the database does the filtering without any files being opened. Files
+    without metadata only match when no metadata filter is given.
+
+    Parameters
+    ----------
+    formula : str
+        The chemical formula, matched case-insensitively, where ``*`` matches
+        any characters. Not filtered on if empty.
+    include : list[str], optional
+        Elements which must all be in the structure.
+    exclude : list[str], optional
+        Elements which must not be in the structure.
+    min_atoms : int, optional
+        The minimum number of atoms.
+    max_atoms : int, optional
+        The maximum number of atoms.
+    periodic : bool, optional
+        Whether the structure must be periodic, or not, if given.
+
+    Returns
+    -------
+    dict
+        The filters, to be merged with the other filters on the node.
+    """
+    filters = {}
+    if formula:
+        filters["extras.formula"] = {"ilike": formula.replace("*", "%")}
+    elements = []
+    if include:
+        elements.append({"contains": list(include)})
+    elements += [{"!contains": [element]} for element in exclude or []]
+    if elements:
+        filters["extras.elements"] = {"and": elements}
+    natoms = []
+    if min_atoms is not None:
+        natoms.append({">=": min_atoms})
+    if max_atoms is not None:
+        natoms.append({"<=": max_atoms})
+    if natoms:
+        filters["extras.natoms"] = {"and": natoms}
+    if periodic is not None:
+        filters["extras.periodic"] = periodic
+    return filters
+
+
+def find_stored_duplicate(node: Node) -> Node | None:
+    """
+    Find a stored node of the same type with identical contents.
+
+    Stored nodes record the hash AiiDA computes from their contents in the
+    ``_aiida_hash`` extra, so the node's hash is computed and matched against
+    it, without the node having to be stored first.
+
+    Parameters
+    ----------
+    node : Node
+        The node to find a duplicate of, which may be unstored.
+
+    Returns
+    -------
+    Node or None
+        The oldest stored node with identical contents, or None if there is none.
+    """
+    if node.is_stored:
+        return node
+    digest = make_hash(node.base.caching.get_objects_to_hash())
+    qbuild = QueryBuilder().append(
+        type(node),
+        filters={"extras._aiida_hash": digest},
+        subclassing=False,
+        tag="node",
+    )
+    qbuild.order_by({"node": {"id": "asc"}}).limit(1)
+    return qbuild.first(flat=True)
+
+
+def load_nodes(pks: list[int], chunk_size: int = 500) -> list[Node]:
+    """
+    Load several nodes from the database in as few queries as possible.
+
+    Parameters
+    ----------
+    pks : list[int]
+        The pks of the nodes to load.
+    chunk_size : int
+        The maximum number of nodes loaded per query.
+
+    Returns
+    -------
+    list[Node]
+        The nodes, in the order of their pks, missing nodes are skipped.
+    """
+    nodes = {}
+    for start in range(0, len(pks), chunk_size):
+        qbuild = QueryBuilder().append(
+            Node, filters={"id": {"in": pks[start : start + chunk_size]}}
+        )
+        nodes.update((node.pk, node) for node in qbuild.all(flat=True))
+    return [nodes[pk] for pk in pks if pk in nodes]
+
+
+class ProcessLabelIndex:
+    """
+    A persistent index of the process labels stored in an AiiDA profile.
+
+    The index is cached on disk per profile alongside the largest process pk
+    seen, so refreshing it only queries the processes stored since the last
+    refresh rather than scanning every process in the profile. Labels of
+    processes that are later deleted are retained until the profile's largest
+    process pk falls below the cached value, at which point it is rebuilt.
+    """
+
+    process_types = (CalcJobNode, WorkChainNode)
+
+    def __init__(self, path: pathlib.Path | None = None):
+        """
+        ProcessLabelIndex constructor.
+
+        Parameters
+        ----------
+        path : pathlib.Path, optional
+            The cache file, defaults to a file in the app's cache directory
+            keyed by the current profile's uuid.
+        """
+        if path is None:
+            profile = get_manager().get_profile()
+            path = get_cache_dir() / f"process_labels_{profile.uuid}.json"
+        self.path = path
+        self.max_pk = 0
+        self.labels = set()
+        self._load()
+        return
+
+    def refresh(self) -> set[str]:
+        """
+        Add the labels of any processes stored since the last refresh.
+
+        Returns
+        -------
+        set[str]
+            All the process labels in the index.
+        """
+        qbuild = QueryBuilder().append(
+            self.process_types, project={"id": {"func": "max"}}
+        )
+        max_pk = qbuild.first()[0] or 0
+        if max_pk < self.max_pk:
+            self.max_pk = 0
+            self.labels = set()
+        if max_pk == self.max_pk:
+            return self.labels
+
+        qbuild = QueryBuilder().append(
+            self.process_types,
+            filters={"id": {"and": [{">": self.max_pk}, {"<=": max_pk}]}},
+            project="label",
+        )
+        self.labels.update(label for (label,) in qbuild.distinct().iterall() if label)
+        self.max_pk = max_pk
+        self._save()
+        return self.labels
+
+    def _load(self) -> None:
+        """Load the index from the cache file, if it exists."""
+        try:
+            with open(self.path) as f:
+                cache = json.load(f)
+            self.max_pk = int(cache["max_pk"])
+            self.labels = set(cache["labels"])
+        except (OSError, ValueError, KeyError, TypeError):
+            self.max_pk = 0
+            self.labels = set()
+        return
+
+    def _save(self) -> None:
+        """Write the index to the cache file."""
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"max_pk": self.max_pk, "labels": sorted(self.labels)}, f)
+        tmp_path.replace(self.path)
+        return
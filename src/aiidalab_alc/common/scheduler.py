@@ -0,0 +1,230 @@
+"""Module for probing the load of the computers' schedulers."""
+
+import math
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import NamedTuple
+
+from aiida.orm import Computer, User
+from aiida.schedulers import Scheduler
+from aiida.schedulers.datastructures import JobState
+from aiida.transports import Transport
+
+# Rough time taken for a queued job to start per running job on the computer
+SECONDS_PER_QUEUED_JOB = 3600
+
+
+def _count_slurm_idle_nodes(stdout: str) -> int:
+    """Count the idle nodes in the output of `sinfo --format='%D %t'`."""
+    free = 0
+    for line in stdout.splitlines():
+        fields = line.split()
+        if len(fields) == 2 and fields[1] == "idle":
+            free += int(fields[0])
+    return free
+
+
+def _count_lsf_ok_hosts(stdout: str) -> int:
+    """Count the available hosts in the output of `bhosts -w`."""
+    return sum(1 for line in stdout.splitlines()[1:] if line.split()[1:2] == ["ok"])
+
+
+# Commands reporting the free nodes of a scheduler, and their output parsers
+FREE_NODES_COMMANDS: dict[str, tuple[str, Callable[[str], int]]] = {
+    "core.slurm": ("sinfo --noheader --format='%D %t'", _count_slurm_idle_nodes),
+    "core.lsf": ("bhosts -w", _count_lsf_ok_hosts),
+}
+
+
+class ComputerLoad(NamedTuple):
+    """The load on a computer's scheduler when it was probed."""
+
+    computer: str
+    queued: int = 0
+    running: int = 0
+    free_nodes: int | None = None
+    error: str | None = None
+    probed_at: float = 0.0
+
+    def expected_wait(self, num_machines: int = 1) -> float:
+        """
+        Estimate how long a new job would wait to start.
+
+        Parameters
+        ----------
+        num_machines : int
+            The number of machines the job requests.
+
+        Returns
+        -------
+        float
+            The expected wait in seconds, zero if enough nodes are free and
+            infinite if the computer could not be probed.
+        """
+        if self.error is not None:
+            return math.inf
+        if self.free_nodes is not None and self.free_nodes >= num_machines:
+            return 0.0
+        return SECONDS_PER_QUEUED_JOB * (self.queued + 1) / max(self.running, 1)
+
+
+def probe_load(
+    computer: str,
+    transport: Transport,
+    scheduler: Scheduler,
+    scheduler_type: str = "",
+) -> ComputerLoad:
+    """
+    Read the queue depth and free nodes of a computer's scheduler.
+
+    Only the transport is used, so it is safe to call from a worker thread.
+
+    Parameters
+    ----------
+    computer : str
+        The label of the computer.
+    transport : Transport
+        An unopened transport to the computer.
+    scheduler : Scheduler
+        The computer's scheduler.
+    scheduler_type : str
+        The entry point of the scheduler, used to find its free nodes command.
+
+    Returns
+    -------
+    ComputerLoad
+        The load on the computer, with the error if it could not be probed.
+    """
+    try:
+        with transport:
+            scheduler.set_transport(transport)
+            jobs = scheduler.get_jobs()
+            free_nodes = None
+            if scheduler_type in FREE_NODES_COMMANDS:
+                command, parse = FREE_NODES_COMMANDS[scheduler_type]
+                retval, stdout, _ = transport.exec_command_wait(command)
+                if retval == 0:
+                    free_nodes = parse(stdout)
+    except Exception as err:
+        return ComputerLoad(computer, error=str(err) or type(err).__name__)
+    states = [job.job_state for job in jobs]
+    return ComputerLoad(
+        computer,
+        queued=sum(
+            state in (JobState.QUEUED, JobState.QUEUED_HELD) for state in states
+        ),
+        running=states.count(JobState.RUNNING),
+        free_nodes=free_nodes,
+        probed_at=time.monotonic(),
+    )
+
+
+class SchedulerProbe:
+    """
+    Probe the load on the schedulers of several computers concurrently.
+
+    The transports are set up on the calling thread, which reads their
+    configuration from the database, and each computer is then probed on a
+    worker thread. Successful results are cached for `ttl` seconds.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_workers: int = 4):
+        """
+        SchedulerProbe constructor.
+
+        Parameters
+        ----------
+        ttl : float
+            The time in seconds a computer's load is cached for.
+        max_workers : int
+            The maximum number of computers probed at once.
+        """
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._cache = {}
+        return
+
+    def submit(self, computers: Iterable[Computer]) -> dict[str, Future]:
+        """
+        Start probing the computers without waiting for the results.
+
+        Parameters
+        ----------
+        computers : Iterable[Computer]
+            The computers to probe, those that are not configured for the
+            current user are reported as such without being probed.
+
+        Returns
+        -------
+        dict[str, Future]
+            A future of each computer's `ComputerLoad`, keyed by its label.
+        """
+        user = User.collection.get_default()
+        futures = {}
+        for computer in computers:
+            with self._lock:
+                cached = self._cache.get(computer.uuid)
+            if cached is not None and self._is_fresh(cached):
+                futures[computer.label] = cached
+                continue
+            if not computer.is_user_configured(user):
+                future = Future()
+                future.set_result(
+                    ComputerLoad(computer.label, error="Computer not configured")
+                )
+            else:
+                future = self._executor.submit(
+                    probe_load,
+                    computer.label,
+                    computer.get_authinfo(user).get_transport(),
+                    computer.get_scheduler(),
+                    computer.scheduler_type,
+                )
+            with self._lock:
+                self._cache[computer.uuid] = future
+            futures[computer.label] = future
+        return futures
+
+    def probe(
+        self, computers: Iterable[Computer], timeout: float | None = None
+    ) -> dict[str, ComputerLoad]:
+        """
+        Probe the computers, waiting for the results.
+
+        Parameters
+        ----------
+        computers : Iterable[Computer]
+            The computers to probe.
+        timeout : float, optional
+            The maximum time to wait in seconds, computers that have not
+            been probed in time are reported with an error.
+
+        Returns
+        -------
+        dict[str, ComputerLoad]
+            The load on each computer, keyed by its label.
+        """
+        futures = self.submit(computers)
+        wait(futures.values(), timeout=timeout)
+        return {
+            label: future.result()
+            if future.done()
+            else ComputerLoad(label, error="Timed out")
+            for label, future in futures.items()
+        }
+
+    def _is_fresh(self, future: Future) -> bool:
+        """Return True if a probe is running or finished within the ttl."""
+        if not future.done():
+            return True
+        load = future.result()
+        return load.error is None and time.monotonic() - load.probed_at < self.ttl
+
+    def clear(self) -> None:
+        """Discard the cached results."""
+        with self._lock:
+            self._cache.clear()
+        return
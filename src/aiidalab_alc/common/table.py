@@ -0,0 +1,279 @@
+"""Module providing a windowed table widget for large result sets."""
+
+from collections.abc import Callable
+from typing import Any, NamedTuple
+
+import ipywidgets as ipw
+import traitlets as tl
+
+# Monospaced rows, so the cells of each column line up
+TABLE_STYLE = """
+<style>
+.alc-table-rows select { font-family: monospace; }
+.alc-table-header button { font-family: monospace; text-align: left; }
+</style>
+"""
+
+
+class Column(NamedTuple):
+    """A column of a `WindowedTable`."""
+
+    key: str
+    title: str
+    width: int = 12
+    sortable: bool = True
+
+
+class WindowedTable(ipw.VBox, tl.HasTraits):
+    """
+    A sortable table which only holds the rows currently visible.
+
+    The rows are fetched from the owner of the table a window at a time, by
+    calling `fetch(offset, limit, sort_by, ascending)`, whenever the table is
+    scrolled or sorted. Only the visible window is ever sent to the browser,
+    so the table stays responsive however many rows it has. The sorting is
+    left to `fetch`, which should order the rows in the database.
+
+    Each row is a tuple of cells in the order of the columns, the first of
+    which is the key identifying the row. The `value` is the key of the
+    selected row, it is kept while the row is scrolled out of view.
+    """
+
+    total = tl.Int(0)
+    offset = tl.Int(0)
+    sort_by = tl.Unicode("")
+    ascending = tl.Bool(False)
+    value = tl.Any(None, allow_none=True)
+    disabled = tl.Bool(False)
+
+    def __init__(
+        self,
+        columns: list[Column],
+        fetch: Callable[[int, int, str, bool], list[tuple]],
+        nrows: int = 20,
+        sort_by: str = "",
+        ascending: bool = False,
+        **kwargs,
+    ):
+        """
+        WindowedTable constructor.
+
+        Parameters
+        ----------
+        columns : list[Column]
+            The columns of the table.
+        fetch : Callable[[int, int, str, bool], list[tuple]]
+            Returns the rows in a window, given its offset and number of rows
+            and the key of the column to sort by and whether it is ascending.
+        nrows : int
+            The number of rows visible at once.
+        sort_by : str
+            The key of the column initially sorted by, the first if not given.
+        ascending : bool
+            Whether the rows are initially in ascending order.
+        **kwargs :
+            Keyword arguments passed to the `ipywidgets.VBox.__init__()`.
+        """
+        self.columns = list(columns)
+        self.fetch = fetch
+        self.nrows = nrows
+        self.rows = []
+        self._updating = False
+
+        self.header = ipw.HBox([])
+        self.header.add_class("alc-table-header")
+        self._sort_btns = {}
+        for column in self.columns:
+            btn = ipw.Button(
+                description=column.title,
+                disabled=not column.sortable,
+                layout={"width": f"{column.width + 2}ch"},
+            )
+            btn.on_click(lambda _, key=column.key: self.sort(key))
+            self._sort_btns[column.key] = btn
+        self.header.children = list(self._sort_btns.values())
+
+        self.body = ipw.Select(options=[], rows=nrows, layout={"width": "100%"})
+        self.body.add_class("alc-table-rows")
+        self.body.observe(self._on_row_select, "value")
+
+        # Vertical sliders increase upwards, so the offset is measured down
+        # from the top of the slider. A page is only fetched once the slider
+        # is released, rather than for every row dragged past.
+        self.scrollbar = ipw.IntSlider(
+            value=0,
+            min=0,
+            max=0,
+            orientation="vertical",
+            readout=False,
+            continuous_update=False,
+            layout={"height": f"{nrows * 1.5 + 1}em"},
+        )
+        self.scrollbar.observe(self._on_scroll, "value")
+
+        self.prev_btn = ipw.Button(icon="angle-up", layout={"width": "40px"})
+        self.prev_btn.on_click(lambda _: self.scroll_to(self.offset - self.nrows))
+        self.next_btn = ipw.Button(icon="angle-down", layout={"width": "40px"})
+        self.next_btn.on_click(lambda _: self.scroll_to(self.offset + self.nrows))
+        self.info = ipw.HTML("")
+
+        super().__init__(
+            children=[
+                ipw.HTML(TABLE_STYLE),
+                self.header,
+                ipw.HBox([self.body, self.scrollbar]),
+                ipw.HBox([self.prev_btn, self.next_btn, self.info]),
+            ],
+            **kwargs,
+        )
+        self.sort_by = sort_by or self.columns[0].key
+        self.ascending = ascending
+        self._update_header()
+        self._update_controls()
+        return
+
+    def reset(self, total: int, rows: list[tuple] | None = None) -> None:
+        """
+        Show the first window of a new set of rows.
+
+        Parameters
+        ----------
+        total : int
+            The total number of rows.
+        rows : list[tuple], optional
+            The rows of the first window, fetched if not given.
+        """
+        self.total = total
+        self.offset = 0
+        if rows is None:
+            rows = self._fetch_window()
+        self._show(rows)
+        return
+
+    def refresh(self) -> None:
+        """Fetch and show the rows of the current window."""
+        self._show(self._fetch_window())
+        return
+
+    def scroll_to(self, offset: int) -> None:
+        """
+        Show the window of rows starting at an offset.
+
+        Parameters
+        ----------
+        offset : int
+            The index of the first row shown, clipped to the rows available.
+        """
+        offset = max(min(offset, self.total - self.nrows), 0)
+        if offset != self.offset:
+            self.offset = offset
+            self.refresh()
+        return
+
+    def sort(self, key: str) -> None:
+        """
+        Sort the rows by a column, reversing the order if already sorted by it.
+
+        Parameters
+        ----------
+        key : str
+            The key of the column to sort by.
+        """
+        if key == self.sort_by:
+            self.ascending = not self.ascending
+        else:
+            self.sort_by = key
+            self.ascending = False
+        self._update_header()
+        self.offset = 0
+        self.refresh()
+        return
+
+    def visible_keys(self) -> list[Any]:
+        """Return the keys of the rows currently visible."""
+        return [row[0] for row in self.rows]
+
+    @tl.observe("disabled")
+    def _on_disabled_change(self, change) -> None:
+        self.body.disabled = change["new"]
+        for column in self.columns:
+            self._sort_btns[column.key].disabled = change["new"] or not column.sortable
+        self._update_controls()
+        return
+
+    @tl.observe("value")
+    def _on_value_change(self, change) -> None:
+        if change["new"] in self.visible_keys() or change["new"] is None:
+            self._updating = True
+            try:
+                self.body.value = change["new"]
+            finally:
+                self._updating = False
+        return
+
+    def _fetch_window(self) -> list[tuple]:
+        """Fetch the rows of the current window."""
+        if self.total <= 0:
+            return []
+        return self.fetch(self.offset, self.nrows, self.sort_by, self.ascending)
+
+    def _show(self, rows: list[tuple]) -> None:
+        """Show a window of rows, keeping the selection if it is visible."""
+        self.rows = list(rows)
+        self._updating = True
+        try:
+            self.body.options = [(self._format_row(row), row[0]) for row in rows]
+            self.body.value = self.value if self.value in self.visible_keys() else None
+        finally:
+            self._updating = False
+        self._update_controls()
+        return
+
+    def _format_row(self, row: tuple) -> str:
+        """Format the cells of a row into fixed width columns."""
+        cells = []
+        for column, cell in zip(self.columns, row, strict=False):
+            text = "" if cell is None else str(cell)
+            if len(text) > column.width:
+                text = text[: column.width - 1] + "…"
+            cells.append(text.ljust(column.width))
+        # Non-breaking spaces, as browsers collapse runs of spaces in options
+        return " ".join(cells).replace(" ", "\u00a0")
+
+    def _update_header(self) -> None:
+        """Mark the sorted column and its direction."""
+        for column in self.columns:
+            arrow = ""
+            if column.key == self.sort_by:
+                arrow = " ▲" if self.ascending else " ▼"
+            self._sort_btns[column.key].description = column.title + arrow
+        return
+
+    def _update_controls(self) -> None:
+        """Update the scrollbar, buttons and row count for the current window."""
+        last = max(self.total - self.nrows, 0)
+        self._updating = True
+        try:
+            self.scrollbar.max = last
+            self.scrollbar.value = last - min(self.offset, last)
+        finally:
+            self._updating = False
+        self.scrollbar.disabled = self.disabled or last == 0
+        self.prev_btn.disabled = self.disabled or self.offset <= 0
+        self.next_btn.disabled = self.disabled or self.offset >= last
+        if self.total:
+            end = min(self.offset + self.nrows, self.total)
+            self.info.value = f"<p>Rows {self.offset + 1}-{end} of {self.total}</p>"
+        else:
+            self.info.value = "<p>No rows</p>"
+        return
+
+    def _on_scroll(self, change) -> None:
+        if not self._updating:
+            self.scroll_to(self.scrollbar.max - change["new"])
+        return
+
+    def _on_row_select(self, change) -> None:
+        if not self._updating and change["new"] is not None:
+            self.value = change["new"]
+        return
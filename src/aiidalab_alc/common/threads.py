@@ -0,0 +1,58 @@
+"""
+Helpers for handing the results of worker threads back to the kernel.
+
+Widgets may only be updated from the kernel's thread, so work done on worker
+threads schedules its widget updates on the kernel's event loop. AiiDA gives
+each thread its own storage session, so worker threads may run read-only
+queries of their own, but nodes are only stored from the kernel's thread.
+"""
+
+import asyncio
+import logging
+from collections.abc import Callable
+
+LOGGER = logging.getLogger(__name__)
+
+
+def get_kernel_loop() -> asyncio.AbstractEventLoop | None:
+    """
+    Get the event loop running on the calling thread.
+
+    Returns
+    -------
+    asyncio.AbstractEventLoop or None
+        The running event loop, or None if no loop is running, e.g. when the
+        app is used from a script rather than a notebook.
+    """
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def call_in_loop(
+    loop: asyncio.AbstractEventLoop | None, callback: Callable, *args
+) -> None:
+    """
+    Call a function on the thread of an event loop.
+
+    Parameters
+    ----------
+    loop : asyncio.AbstractEventLoop or None
+        The loop to call the function on, see `get_kernel_loop`. The function
+        is called immediately if there is no loop, or if the loop is running
+        on the calling thread.
+    callback : Callable
+        The function to call.
+    *args :
+        The arguments to call the function with.
+    """
+    if loop is None or get_kernel_loop() is loop:
+        callback(*args)
+        return
+    try:
+        loop.call_soon_threadsafe(callback, *args)
+    except RuntimeError:
+        # The kernel is shutting down, so there is nothing left to update
+        LOGGER.debug("Dropped %r as the event loop is closed", callback)
+    return
@@ -0,0 +1,343 @@
+"""
+Defines the calculation history page.
+
+The history lists the ChemShell calculations in the profile a page at a
+time. Only the columns shown are projected, and the database does the
+paging, sorting and counting, so no process nodes are loaded to list them.
+A calculation's node is only loaded once it is opened in the results view.
+"""
+
+import datetime
+from typing import NamedTuple
+
+import ipywidgets as ipw
+import traitlets as tl
+from aiida.orm import AbstractCode, CalcJobNode, Computer, QueryBuilder
+from IPython.display import display
+
+from aiidalab_alc.common.navigation import QuickAccessButtons
+from aiidalab_alc.common.profiling import profiled
+from aiidalab_alc.common.queries import count_by_input_label, count_by_projections
+from aiidalab_alc.models.results import ResultsModel
+from aiidalab_alc.results import ResultsWizardStep
+
+# Process type of the calculations run by the app
+CHEMSHELL_PROCESS_TYPE = "aiida.calculations:chemshell"
+
+# The columns the history can be sorted by, and the node fields they sort on
+SORT_FIELDS = {
+    "ctime": "ctime",
+    "state": "attributes.process_state",
+    "label": "label",
+}
+
+# Process states of calculations which have not terminated yet
+ACTIVE_STATES = ("created", "waiting", "running")
+
+
+def classify_state(state: str | None, exit_status: int | None) -> str:
+    """
+    Classify a calculation as running, finished or failed.
+
+    Parameters
+    ----------
+    state : str or None
+        The calculation's process state.
+    exit_status : int or None
+        The calculation's exit status.
+
+    Returns
+    -------
+    str
+        "running" if it has not terminated, "finished" if it finished with a
+        zero exit status and "failed" otherwise.
+    """
+    if state is None or state in ACTIVE_STATES:
+        return "running"
+    if state == "finished" and exit_status == 0:
+        return "finished"
+    return "failed"
+
+
+class HistoryRow(NamedTuple):
+    """The projected fields of a calculation shown in the history."""
+
+    pk: int
+    uuid: str
+    ctime: datetime.datetime
+    label: str
+    state: str | None
+    exit_status: int | None
+    code: str | None
+    computer: str | None
+
+    @property
+    def status(self) -> str:
+        """Whether the calculation is running, finished or failed."""
+        return classify_state(self.state, self.exit_status)
+
+
+class HistoryModel(tl.HasTraits):
+    """
+    Model for a paged, sorted history of ChemShell calculations.
+
+    Changing the page or sort order reloads the rows of the current page,
+    changing the grouping reloads the summary counts.
+    """
+
+    process_type = tl.Unicode(CHEMSHELL_PROCESS_TYPE)
+    page = tl.Int(0)
+    page_size = tl.Int(25)
+    sort_by = tl.Enum(list(SORT_FIELDS), default_value="ctime")
+    ascending = tl.Bool(False)
+    group_by = tl.Enum(["code", "computer"], default_value="code")
+    total = tl.Int(0)
+    rows = tl.List(tl.Instance(HistoryRow))
+    counts = tl.Dict()
+
+    @property
+    def npages(self) -> int:
+        """The number of pages of calculations, at least one."""
+        return max(-(-self.total // self.page_size), 1)
+
+    def refresh(self) -> None:
+        """Reload the number of calculations, the current page and the counts."""
+        self.total = self._process_query().count()
+        if self.page >= self.npages:
+            # Changing the page loads it
+            self.page = self.npages - 1
+        else:
+            self.load_page()
+        self.load_counts()
+        return
+
+    @tl.observe("page", "page_size", "sort_by", "ascending")
+    def _on_page_change(self, _) -> None:
+        self.load_page()
+        return
+
+    @tl.observe("group_by")
+    def _on_group_by_change(self, _) -> None:
+        self.load_counts()
+        return
+
+    @profiled("history.load_page")
+    def load_page(self) -> None:
+        """Load the rows of the current page in the current sort order."""
+        qbuild = self._process_query(
+            ["id", "uuid", "ctime", "label", "attributes.process_state"]
+            + ["attributes.exit_status"]
+        )
+        qbuild.append(Computer, with_node="process", outerjoin=True, project=["label"])
+        order = "asc" if self.ascending else "desc"
+        field = SORT_FIELDS[self.sort_by]
+        sort_key = {"order": order, "cast": "t"} if "." in field else order
+        qbuild.order_by({"process": [{field: sort_key}, {"id": order}]})
+        qbuild.offset(self.page * self.page_size).limit(self.page_size)
+        rows = qbuild.all()
+        codes = self._code_labels([row[0] for row in rows])
+        self.rows = [
+            HistoryRow(*row[:-1], code=codes.get(row[0]), computer=row[-1])
+            for row in rows
+        ]
+        return
+
+    @profiled("history.load_counts")
+    def load_counts(self) -> None:
+        """
+        Count the running, finished and failed calculations of each group.
+
+        The counts are aggregated by the database in a single query.
+        """
+        qbuild = self._process_query(
+            ["attributes.process_state", "attributes.exit_status"]
+        )
+        if self.group_by == "code":
+            grouped = count_by_input_label(qbuild, "process", "code")
+        else:
+            qbuild.append(
+                Computer, with_node="process", outerjoin=True, project=["label"]
+            )
+            grouped = count_by_projections(qbuild)
+        counts = {}
+        for (state, exit_status, group), count in grouped.items():
+            status = classify_state(state, exit_status)
+            group_counts = counts.setdefault(
+                group or "unknown", {"running": 0, "finished": 0, "failed": 0}
+            )
+            group_counts[status] += count
+        self.counts = counts
+        return
+
+    @staticmethod
+    def _code_labels(pks: list[int]) -> dict[int, str]:
+        """
+        Look up the labels of the codes the given calculations ran.
+
+        AiiDA filters the type of a node joined across a link in the
+        ``WHERE`` clause, so even an outer join to the code drops the
+        calculations without one. The codes are looked up separately instead.
+        """
+        if not pks:
+            return {}
+        qbuild = QueryBuilder().append(
+            CalcJobNode, filters={"id": {"in": pks}}, project=["id"], tag="process"
+        )
+        qbuild.append(AbstractCode, with_outgoing="process", project=["label"])
+        return dict(qbuild.iterall())
+
+    def _process_query(self, project: list[str] | None = None) -> QueryBuilder:
+        """Query the calculations of the model's process type."""
+        return QueryBuilder().append(
+            CalcJobNode,
+            filters={"process_type": self.process_type},
+            project=project or [],
+            tag="process",
+        )
+
+
+class HistoryApp:
+    """The calculation history page."""
+
+    def __init__(self):
+        """HistoryApp constructor."""
+        self.model = HistoryModel()
+        self.view = HistoryView(self.model)
+        display(self.view)
+        self.model.refresh()
+        return
+
+
+class HistoryView(ipw.VBox):
+    """A paged, sortable table of past calculations."""
+
+    def __init__(self, model: HistoryModel, **kwargs):
+        """
+        HistoryView constructor.
+
+        Parameters
+        ----------
+        model : HistoryModel
+            The model listing the calculations.
+        **kwargs :
+            Keyword arguments passed to the `ipywidgets.VBox.__init__()`.
+        """
+        self.model = model
+
+        header = ipw.HTML("<h2>Calculation History</h2>", layout={"margin": "auto"})
+        self.summary = ipw.HTML("")
+        self.group_by = ipw.ToggleButtons(
+            options=[("Code", "code"), ("Computer", "computer")],
+            description="Group by:",
+        )
+        ipw.link((self.model, "group_by"), (self.group_by, "value"))
+
+        self.sort_by = ipw.Dropdown(
+            options=[("Created", "ctime"), ("State", "state"), ("Label", "label")],
+            description="Sort by:",
+        )
+        ipw.link((self.model, "sort_by"), (self.sort_by, "value"))
+        self.ascending = ipw.Checkbox(description="Ascending")
+        ipw.link((self.model, "ascending"), (self.ascending, "value"))
+
+        self.prev_btn = ipw.Button(icon="chevron-left", layout={"width": "40px"})
+        self.prev_btn.on_click(lambda _: self._go_to_page(self.model.page - 1))
+        self.next_btn = ipw.Button(icon="chevron-right", layout={"width": "40px"})
+        self.next_btn.on_click(lambda _: self._go_to_page(self.model.page + 1))
+        self.page_info = ipw.HTML("")
+        self.refresh_btn = ipw.Button(
+            description="Refresh", icon="refresh", button_style="info"
+        )
+        self.refresh_btn.on_click(lambda _: self.model.refresh())
+
+        self.processes = ipw.Select(options=[], rows=12, layout={"width": "100%"})
+        self.processes.observe(self._on_process_select, "value")
+
+        self.results_model = None
+        self.results_step = None
+        self.results_box = ipw.VBox()
+
+        self.model.observe(self._update_rows, ["rows", "total"])
+        self.model.observe(self._update_summary, "counts")
+
+        super().__init__(
+            children=[
+                QuickAccessButtons(),
+                header,
+                ipw.HTML("<h3>Summary</h3>"),
+                self.group_by,
+                self.summary,
+                ipw.HTML("<h3>Calculations</h3>"),
+                ipw.HBox([self.sort_by, self.ascending, self.refresh_btn]),
+                self.processes,
+                ipw.HBox([self.prev_btn, self.page_info, self.next_btn]),
+                self.results_box,
+            ],
+            **kwargs,
+        )
+        return
+
+    def _go_to_page(self, page: int) -> None:
+        """Show the given page, if it exists."""
+        if 0 <= page < self.model.npages:
+            self.model.page = page
+        return
+
+    def _update_rows(self, _=None) -> None:
+        """List the calculations of the current page."""
+        # The placeholder is selected first, so no calculation is opened
+        self.processes.options = [
+            ("Select a calculation to view its results", None)
+        ] + [(self._format_row(row), row.uuid) for row in self.model.rows]
+        self.page_info.value = (
+            f"<p>Page {self.model.page + 1} of {self.model.npages}"
+            f" ({self.model.total} calculations)</p>"
+        )
+        self.prev_btn.disabled = self.model.page <= 0
+        self.next_btn.disabled = self.model.page >= self.model.npages - 1
+        return
+
+    @staticmethod
+    def _format_row(row: HistoryRow) -> str:
+        """Format a calculation as a selection option."""
+        option = f"PK: {row.pk}"
+        option += " | " + row.ctime.strftime("%Y-%m-%d %H:%M")
+        option += " | " + row.status
+        option += " | " + f"{row.code or 'unknown'}@{row.computer or 'unknown'}"
+        option += " | " + row.label
+        return option
+
+    def _update_summary(self, _=None) -> None:
+        """Tabulate the number of calculations in each state per group."""
+        rows = "".join(
+            f"<tr><td>{group}</td><td>{counts['running']}</td>"
+            f"<td>{counts['finished']}</td><td>{counts['failed']}</td></tr>"
+            for group, counts in sorted(self.model.counts.items())
+        )
+        self.summary.value = (
+            "<table><tr><th></th><th>Running</th><th>Finished</th>"
+            f"<th>Failed</th></tr>{rows}</table>"
+        )
+        return
+
+    def _on_process_select(self, change) -> None:
+        """Show the results of the selected calculation."""
+        if change["new"] is None:
+            return
+        if self.results_model is None:
+            # The results view is only built when a calculation is first opened
+            self.results_model = ResultsModel(blocked=False)
+            self.results_step = ResultsWizardStep(self.results_model)
+            self.results_model.process_uuid = change["new"]
+            self.results_step.render()
+            self.results_box.children = [self.results_step]
+        else:
+            self.results_model.process_uuid = change["new"]
+        return
+
+    def close(self) -> None:
+        """Close the view, stopping the monitor of any opened calculation."""
+        if self.results_step is not None:
+            self.results_step.close()
+        super().close()
+        return
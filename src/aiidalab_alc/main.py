@@ -1,19 +1,22 @@
-"""Defines the main AiiDAlab application page."""
+"""
+Defines the main AiiDAlab application page.
+
+The wizard's step modules import AiiDA and the AiiDAlab widgets, which take
+several seconds, so they are only imported once the page's header has been
+displayed.
+"""
 
 from datetime import datetime
+from typing import TYPE_CHECKING
 
-import aiidalab_widgets_base as awb
 import ipywidgets as ipw
 from IPython.display import display
 
 from aiidalab_alc.common.navigation import QuickAccessButtons
-from aiidalab_alc.process import MainAppModel
-from aiidalab_alc.resources import (
-    ComputationalResourcesWizardStep,
-)
-from aiidalab_alc.results import ResultsWizardStep
-from aiidalab_alc.structure import StructureWizardStep
-from aiidalab_alc.workflow import MethodWizardStep
+from aiidalab_alc.common.profiling import profile, profiler
+
+if TYPE_CHECKING:
+    from aiidalab_alc.process import MainAppModel
 
 
 class MainApp:
@@ -21,9 +24,15 @@ class MainApp:
 
     def __init__(self):
         """MainApp constructor."""
-        self.model = MainAppModel()
-        self.view = MainAppView(self.model)
-        display(self.view)
+        with profile("app.first_paint"):
+            self.view = MainAppView()
+            display(self.view)
+
+        with profile("app.load"):
+            from aiidalab_alc.process import MainAppModel
+
+            self.model = MainAppModel()
+            self.view.load(self.model)
 
     # def load(self) -> None:
     #     return
@@ -32,8 +41,18 @@ class MainApp:
 class MainAppView(ipw.VBox):
     """The main app view."""
 
-    def __init__(self, model: MainAppModel, **kwargs):
-        """MainAppView constructor."""
+    def __init__(self, model: "MainAppModel | None" = None, **kwargs):
+        """
+        MainAppView constructor.
+
+        Parameters
+        ----------
+        model : MainAppModel, optional
+            The application model, if not given the view shows a loading
+            message until `load` is called.
+        **kwargs :
+            Keyword arguments passed to the `ipywidgets.VBox.__init__()`.
+        """
         logo = ipw.HTML(
             """
             <div class="app-container logo" style="width: 300px;">
@@ -69,25 +88,129 @@ class MainAppView(ipw.VBox):
             layout={"align-content": "right"},
         )
 
-        self.main = WizardWidget(model)
+        self.main = ipw.HTML(
+            "<p><i class='fa fa-spinner fa-pulse'></i> Loading the app...</p>",
+            layout={"margin": "auto"},
+        )
+
+        children = [header, nav_btns, self.main, footer]
+        if profiler.enabled:
+            children.insert(3, ProfilingPanel())
 
-        super().__init__(
-            layout={}, children=[header, nav_btns, self.main, footer], **kwargs
+        super().__init__(layout={}, children=children, **kwargs)
+        if model is not None:
+            self.load(model)
+        return
+
+    def load(self, model: "MainAppModel") -> None:
+        """
+        Build the wizard for the application model in place of the loading message.
+
+        Parameters
+        ----------
+        model : MainAppModel
+            The application model.
+        """
+        children = list(self.children)
+        self.main = children[2] = WizardWidget(model)
+        self.children = children
+        return
+
+
+class ProfilingPanel(ipw.Accordion):
+    """A debug panel summarising the profiled operations of the app."""
+
+    def __init__(self, **kwargs):
+        """
+        ProfilingPanel constructor.
+
+        Parameters
+        ----------
+        **kwargs :
+            Keyword arguments passed to the `ipywidgets.Accordion.__init__()`.
+        """
+        self.table = ipw.HTML("")
+        self.status = ipw.HTML("")
+
+        refresh_btn = ipw.Button(description="Refresh", icon="refresh")
+        refresh_btn.on_click(self.refresh)
+        clear_btn = ipw.Button(description="Clear", icon="trash")
+        clear_btn.on_click(self.clear)
+        json_btn = ipw.Button(description="Export JSON", icon="download")
+        json_btn.on_click(lambda _: self.export("alc-profile.json"))
+        trace_btn = ipw.Button(description="Export Trace", icon="download")
+        trace_btn.on_click(lambda _: self.export("alc-trace.json", chrome_trace=True))
+
+        box = ipw.VBox(
+            [
+                ipw.HBox([refresh_btn, clear_btn, json_btn, trace_btn]),
+                self.status,
+                self.table,
+            ]
         )
+        super().__init__(children=[box], selected_index=None, **kwargs)
+        self.set_title(0, "Debug: Profiling")
+        self.observe(self.refresh, "selected_index")
+        return
+
+    def refresh(self, _=None) -> None:
+        """Show the profiled operations, slowest first."""
+        rows = "".join(
+            f"<tr><td>{entry['name']}</td><td>{entry['count']}</td>"
+            f"<td>{entry['total']:.3f}</td><td>{entry['max']:.3f}</td>"
+            f"<td>{entry['queries']}</td><td>{entry['nbytes']}</td></tr>"
+            for entry in profiler.summary()
+        )
+        self.table.value = (
+            "<table><tr><th>Operation</th><th>Calls</th><th>Total (s)</th>"
+            "<th>Max (s)</th><th>Queries</th><th>Bytes</th></tr>"
+            f"{rows}</table>"
+        )
+        return
+
+    def clear(self, _=None) -> None:
+        """Discard the profiled operations."""
+        profiler.clear()
+        self.refresh()
+        return
+
+    def export(self, filename: str, chrome_trace: bool = False) -> None:
+        """
+        Export the profiled operations to a file in the working directory.
+
+        Parameters
+        ----------
+        filename : str
+            The name of the file to write.
+        chrome_trace : bool
+            Write the Chrome trace event format rather than the plain spans.
+        """
+        path = profiler.export(filename, chrome_trace=chrome_trace)
+        self.status.value = f"<p>Exported to {path.resolve()}</p>"
+        return
 
 
 class WizardWidget(ipw.VBox):
     """An ipywidgets based widget to hold the main application construct wizard."""
 
-    def __init__(self, model: MainAppModel, **kwargs):
+    def __init__(self, model: "MainAppModel", **kwargs):
         """
         WizardWidget constructor.
 
         Parameters
         ----------
+        model : MainAppModel
+            The application model.
         **kwargs :
             Keyword arguments passed to the `ipywidgets.VBox.__init__()`.
         """
+        import aiidalab_widgets_base as awb
+
+        from aiidalab_alc.resources import ComputationalResourcesWizardStep
+        from aiidalab_alc.results import ResultsWizardStep
+        from aiidalab_alc.structure import StructureWizardStep
+        from aiidalab_alc.workflow import MethodWizardStep
+
         self.structureStep = StructureWizardStep(model.structure_model)
         self.workflowStep = MethodWizardStep(model.workflow_model)
         self.compResourceStep = ComputationalResourcesWizardStep(model.resource_model)
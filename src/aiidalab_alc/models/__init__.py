@@ -0,0 +1 @@
+"""Package for the models of the app, which do not depend on any widgets."""
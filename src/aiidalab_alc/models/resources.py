@@ -0,0 +1,324 @@
+"""Defines the model for the resource setup stage."""
+
+import math
+from typing import ClassVar, NamedTuple
+
+import traitlets as tl
+from aiida.common.exceptions import MultipleObjectsError, NotExistent
+from aiida.manage import get_manager
+from aiida.orm import (
+    AbstractCode,
+    AuthInfo,
+    Computer,
+    QueryBuilder,
+    User,
+    load_code,
+)
+
+from aiidalab_alc.common.scheduler import ComputerLoad
+
+# Coarse costs used to estimate the resources needed for a structure
+QM_ATOMS_PER_CORE = 4
+MM_ATOMS_PER_CORE = 10000
+QM_CORE_SECONDS_PER_ATOM_CUBED = 0.5
+MIN_WALLTIME_SECONDS = 1800
+MAX_WALLTIME_SECONDS = 48 * 3600
+
+
+class CodeEntry(NamedTuple):
+    """A code in the code registry."""
+
+    pk: int
+    label: str
+    computer: str
+    hidden: bool
+    configured: bool
+    enabled: bool
+
+    @property
+    def full_label(self) -> str:
+        """The ``label@computer`` label, which `load_code` resolves directly."""
+        return f"{self.label}@{self.computer}"
+
+    @property
+    def state(self) -> str:
+        """A description of the state of the code's computer."""
+        if not self.configured:
+            return "not configured"
+        return "enabled" if self.enabled else "disabled"
+
+
+class CodeRegistry:
+    """
+    A registry of the codes that can run ChemShell calculations.
+
+    The codes are queried once, with their computers and the current user's
+    computer configuration, and cached for the rest of the session. Each
+    lookup only checks the number of matching codes and their latest
+    modification time, and the codes are queried again if either changes.
+    """
+
+    input_plugin = "chemshell"
+
+    _registries: ClassVar[dict[str, "CodeRegistry"]] = {}
+
+    def __init__(self):
+        """CodeRegistry constructor."""
+        self._key = None
+        self._codes = []
+        return
+
+    @classmethod
+    def get_registry(cls) -> "CodeRegistry":
+        """Return the session's registry for the current profile."""
+        profile = get_manager().get_profile()
+        return cls._registries.setdefault(profile.name, cls())
+
+    def codes(self, include_hidden: bool = False) -> list[CodeEntry]:
+        """
+        Get the ChemShell codes, querying them again only if they have changed.
+
+        Parameters
+        ----------
+        include_hidden : bool
+            Whether to include codes that have been hidden.
+
+        Returns
+        -------
+        list[CodeEntry]
+            The codes, ordered by their full label.
+        """
+        key = self._cache_key()
+        if key != self._key:
+            self._codes = self._query_codes()
+            self._key = key
+        return [code for code in self._codes if include_hidden or not code.hidden]
+
+    def invalidate(self) -> None:
+        """Query the codes again on the next lookup."""
+        self._key = None
+        return
+
+    def _code_query(self) -> QueryBuilder:
+        """Return a query for the ChemShell codes."""
+        return QueryBuilder().append(
+            AbstractCode,
+            filters={"attributes.input_plugin": self.input_plugin},
+            tag="code",
+        )
+
+    def _cache_key(self) -> tuple:
+        """Return the number of codes and their latest modification time."""
+        count = self._code_query().count()
+        qbuild = self._code_query()
+        qbuild.add_projection("code", {"mtime": {"func": "max"}})
+        return count, qbuild.first()[0]
+
+    def _query_codes(self) -> list[CodeEntry]:
+        """Query the codes, with the state of their computers."""
+        qbuild = self._code_query()
+        qbuild.add_projection("code", ["id", "label", "extras.hidden"])
+        qbuild.append(Computer, with_node="code", project=["id", "label"])
+
+        user = User.collection.get_default()
+        auth = QueryBuilder().append(
+            AuthInfo,
+            filters={"aiidauser_id": user.pk},
+            project=["dbcomputer_id", "enabled"],
+        )
+        enabled = dict(auth.all())
+
+        codes = [
+            CodeEntry(
+                pk=pk,
+                label=label,
+                computer=computer,
+                hidden=bool(hidden),
+                configured=computer_pk in enabled,
+                enabled=enabled.get(computer_pk, False),
+            )
+            for pk, label, hidden, computer_pk, computer in qbuild.iterall()
+        ]
+        return sorted(codes, key=lambda code: code.full_label)
+
+
+def rank_codes(
+    codes: list[CodeEntry], loads: dict[str, ComputerLoad], num_machines: int = 1
+) -> list[tuple[CodeEntry, ComputerLoad]]:
+    """
+    Rank codes by how soon a new job on their computer is expected to start.
+
+    Parameters
+    ----------
+    codes : list[CodeEntry]
+        The codes to rank.
+    loads : dict[str, ComputerLoad]
+        The load on each computer, keyed by its label.
+    num_machines : int
+        The number of machines the job requests.
+
+    Returns
+    -------
+    list[tuple[CodeEntry, ComputerLoad]]
+        Each code with the load on its computer, from the shortest expected
+        wait to the longest. Codes on computers that were not probed are last.
+    """
+    ranked = [
+        (code, loads.get(code.computer, ComputerLoad(code.computer, error="")))
+        for code in codes
+    ]
+    return sorted(
+        ranked,
+        key=lambda item: (item[1].expected_wait(num_machines), item[1].queued),
+    )
+
+
+class ComputationalResourcesModel(tl.HasTraits):
+    """
+    Model for the resource setup stage.
+
+    The requested cores are laid out across as many machines of the selected
+    code's computer as needed, with `omp_threads` OpenMP threads per MPI
+    process. The number of cores per machine is read from the computer's
+    default number of MPI processes per machine, if it is set.
+    """
+
+    code_label = tl.Unicode("").tag(sync=True)
+    ncpus = tl.Int(1).tag(sync=True)
+    omp_threads = tl.Int(1).tag(sync=True)
+    walltime_hours = tl.Float(1.0).tag(sync=True)
+    memory_gb = tl.Float(0.0).tag(sync=True)
+    cores_per_machine = tl.Int(None, allow_none=True)
+    scheduler_type = tl.Unicode("")
+    node_layout = tl.Bool(True)
+    natoms = tl.Int(0)
+    nqm_atoms = tl.Int(0)
+    process_label = tl.Unicode("").tag(sync=True)
+    process_description = tl.Unicode("").tag(sync=True)
+    submitted = tl.Bool(False).tag(sync=True)
+    reuse_results = tl.Bool(False).tag(sync=True)
+    submission_stage = tl.Unicode("")
+    submission_progress = tl.Float(0.0)
+    submission_error = tl.Unicode(None, allow_none=True)
+    submission_reused = tl.Int(0)
+
+    default_guide = """
+        <p>
+            Configure the computational resources required to run the ChemShell
+            calculation. Additionally, you can provide a label and description for
+            the AiiDA process that will be created.
+        </p>
+    """
+
+    @tl.observe("code_label")
+    def _on_code_change(self, _) -> None:
+        """Read the properties of the selected code's computer."""
+        self.load_computer()
+        return
+
+    def load_computer(self) -> None:
+        """Read the cores per machine and scheduler of the code's computer."""
+        try:
+            computer = load_code(self.code_label).computer
+        except (NotExistent, MultipleObjectsError, ValueError, AttributeError):
+            computer = None
+        if computer is None:
+            self.cores_per_machine = None
+            self.scheduler_type = ""
+            self.node_layout = True
+            return
+        self.cores_per_machine = computer.get_default_mpiprocs_per_machine()
+        self.scheduler_type = computer.scheduler_type
+        resource_class = computer.get_scheduler().job_resource_class
+        self.node_layout = "num_machines" in resource_class.get_valid_keys()
+        return
+
+    def get_layout(self) -> tuple[int, int, int]:
+        """
+        Lay the requested cores out across the computer's machines.
+
+        The number of MPI processes is rounded up to fill the machines evenly.
+
+        Returns
+        -------
+        tuple[int, int, int]
+            The number of machines, MPI processes per machine and OpenMP
+            threads per MPI process.
+        """
+        threads = max(1, self.omp_threads)
+        nprocs = max(1, self.ncpus // threads)
+        if self.cores_per_machine:
+            procs_per_machine = max(1, self.cores_per_machine // threads)
+        else:
+            procs_per_machine = nprocs
+        num_machines = math.ceil(nprocs / procs_per_machine)
+        return num_machines, math.ceil(nprocs / num_machines), threads
+
+    def get_resources(self) -> dict:
+        """Get the job resources for the scheduler of the code's computer."""
+        num_machines, procs_per_machine, threads = self.get_layout()
+        if not self.node_layout:
+            return {"tot_num_mpiprocs": num_machines * procs_per_machine}
+        return {
+            "num_machines": num_machines,
+            "num_mpiprocs_per_machine": procs_per_machine,
+            "num_cores_per_mpiproc": threads,
+        }
+
+    def get_options(self) -> dict:
+        """
+        Get the calculation job options for the requested resources.
+
+        Returns
+        -------
+        dict
+            The `metadata.options` of the calculation job.
+        """
+        num_machines, procs_per_machine, threads = self.get_layout()
+        options = {
+            "resources": self.get_resources(),
+            "withmpi": num_machines * procs_per_machine > 1,
+            "max_wallclock_seconds": max(60, round(self.walltime_hours * 3600)),
+            "environment_variables": {"OMP_NUM_THREADS": str(threads)},
+        }
+        if self.memory_gb > 0:
+            options["max_memory_kb"] = round(self.memory_gb * 1024**2)
+        return options
+
+    def estimate(self) -> None:
+        """
+        Estimate the cores and wall time needed from the size of the system.
+
+        The cost is dominated by the QM region, which is the whole system
+        for a pure QM calculation. This is a coarse heuristic, intended as a
+        starting point for the user to adjust.
+        """
+        natoms = max(self.natoms, self.nqm_atoms)
+        nqm = self.nqm_atoms or natoms
+        if not nqm:
+            return
+        ncores = math.ceil(nqm / QM_ATOMS_PER_CORE)
+        ncores += (natoms - nqm) // MM_ATOMS_PER_CORE
+        if self.cores_per_machine and ncores > self.cores_per_machine:
+            # Fill whole machines rather than leaving part of one idle
+            ncores = self.cores_per_machine * math.ceil(ncores / self.cores_per_machine)
+        walltime = QM_CORE_SECONDS_PER_ATOM_CUBED * nqm**3 / ncores
+        walltime = min(max(walltime, MIN_WALLTIME_SECONDS), MAX_WALLTIME_SECONDS)
+        self.ncpus = ncores
+        self.walltime_hours = math.ceil(walltime / 1800) / 2
+        return
+
+    def validate(self) -> bool:
+        """
+        Validate the model's inputs.
+
+        Returns
+        -------
+        bool
+            True if all inputs are valid, False otherwise.
+        """
+        if not self.code_label:
+            self.submission_error = "No code selected."
+            return False
+        self.submission_error = None
+        return True
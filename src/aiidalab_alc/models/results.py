@@ -0,0 +1,116 @@
+"""Defines the models for viewing process progress and results."""
+
+from typing import cast
+
+import traitlets as tl
+from aiida.common.exceptions import NotExistent
+from aiida.orm import (
+    Group,
+    NodeLinksManager,
+    ProcessNode,
+    QueryBuilder,
+    load_node,
+)
+
+
+class ProcessModel(tl.HasTraits):
+    """
+    Model describing an AiiDA process.
+
+    The process node is loaded from the database the first time it is
+    accessed and cached until the process uuid changes or `refresh` is
+    called. The number of database loads performed is counted by the
+    `load_count` trait, which may be observed.
+    """
+
+    process_uuid = tl.Unicode(None, allow_none=True)
+    load_count = tl.Int(0)
+
+    def __init__(self, **kwargs):
+        """
+        ProcessModel constructor.
+
+        Parameters
+        ----------
+        **kwargs :
+            Keyword arguments passed to the parent class's constructor.
+        """
+        super().__init__(**kwargs)
+        self._process = None
+        self._process_loaded = False
+        return
+
+    @tl.observe("process_uuid")
+    def _on_process_uuid_change(self, _) -> None:
+        """Discard the cached process node of the previous uuid."""
+        self.refresh()
+        return
+
+    def refresh(self) -> None:
+        """Discard the cached process node, so it is reloaded on the next access."""
+        self._process = None
+        self._process_loaded = False
+        return
+
+    @property
+    def process(self) -> ProcessNode | None:
+        """Return the process node for the stored uuid."""
+        if not self.process_uuid:
+            return None
+        if not self._process_loaded:
+            try:
+                self._process = cast(ProcessNode, load_node(self.process_uuid))
+            except NotExistent:
+                self._process = None
+            self._process_loaded = True
+            self.load_count += 1
+        return self._process
+
+    @property
+    def has_process(self) -> bool:
+        """Return true if a valid process node is associated with the uuid."""
+        return self.process is not None
+
+    @property
+    def inputs(self) -> NodeLinksManager | list:
+        """Return the inputs for the process."""
+        process = self.process
+        return process.inputs if process is not None else []
+
+    @property
+    def outputs(self) -> NodeLinksManager | list:
+        """Return the outputs for teh process."""
+        process = self.process
+        return process.outputs if process is not None else []
+
+
+class ResultsModel(ProcessModel):
+    """MVC results step model."""
+
+    blocked = tl.Bool(True)
+    group_uuid = tl.Unicode(None, allow_none=True)
+
+    def group_processes(self) -> list[tuple[str, str]]:
+        """
+        Get the processes in the model's group, e.g. those of a parameter sweep.
+
+        Returns
+        -------
+        list[tuple[str, str]]
+            The (description, uuid) of each process in the group, in
+            order of creation.
+        """
+        if not self.group_uuid:
+            return []
+        qbuild = QueryBuilder()
+        qbuild.append(Group, filters={"uuid": self.group_uuid}, tag="group")
+        qbuild.append(
+            ProcessNode,
+            with_group="group",
+            project=["id", "uuid", "label", "attributes.process_state"],
+        )
+        qbuild.order_by({ProcessNode: {"id": "asc"}})
+        return [
+            (f"PK {pk}: {label or 'unlabelled'} ({state or 'created'})", uuid)
+            for pk, uuid, label, state in qbuild.iterall()
+        ]
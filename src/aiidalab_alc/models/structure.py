@@ -0,0 +1,61 @@
+"""Defines the model for the structure setup stage."""
+
+import traitlets as tl
+from aiida.orm import Data, SinglefileData, StructureData
+
+
+class StructureStepModel(tl.HasTraits):
+    """
+    Model for structure selection and manipulation.
+
+    A model to define and store required information from the structure
+    step in the app's configuration wizard.
+
+    Several structures may be selected at once, they are held in order by
+    `structures` and a process is submitted for each. The `structure_file`
+    is the structure currently being viewed.
+    """
+
+    structure = tl.Instance(StructureData, allow_none=True)
+    structure_file = tl.Instance(SinglefileData, allow_none=True)
+    structures = tl.List(tl.Instance(Data))
+    natoms = tl.Int(0)
+    submitted = tl.Bool(False).tag(sync=True)
+
+    @tl.observe("structures")
+    def _on_structures_change(self, change) -> None:
+        """View the first structure file if the viewed one is not selected."""
+        selected = {node.uuid for node in change["new"]}
+        if self.structure_file is None or self.structure_file.uuid not in selected:
+            self.structure_file = next(
+                (n for n in change["new"] if isinstance(n, SinglefileData)), None
+            )
+        return
+
+    @property
+    def all_structures(self) -> list[Data]:
+        """All the selected structures, or the single structure if none are."""
+        if self.structures:
+            return list(self.structures)
+        if self.has_file:
+            return [self.structure_file]
+        if self.has_structure:
+            return [self.structure]
+        return []
+
+    @property
+    def has_structure(self) -> bool:
+        """True if a StructureData object has been attached to the model."""
+        return self.structure is not None
+
+    @property
+    def has_file(self) -> bool:
+        """True if a raw structure file object has been attached to the model."""
+        return self.structure_file is not None
+
+    @property
+    def is_periodic(self) -> bool:
+        """True if the attached StructureData object is a periodic structure."""
+        if self.has_structure:
+            return any(self.structure.pbc)
+        return False
@@ -0,0 +1,23 @@
+"""Defines the model for ChemShell workflow configuration."""
+
+import traitlets as tl
+from aiida.orm import SinglefileData
+
+
+class ChemShellWorkflowModel(tl.HasTraits):
+    """The model for setting up a ChemShell workflow."""
+
+    qm_theory = tl.Unicode("NONE", allow_none=False)
+    qm_method = tl.Unicode("dft", allow_none=False)
+    functional = tl.Unicode("B3LYP", allow_none=False)
+    mm_theory = tl.Unicode("NONE", allow_none=True)
+    qm_region = tl.List([], allow_none=True)
+    basis_quality = tl.Bool(True, allow_none=False)
+    force_field = tl.Instance(SinglefileData, allow_none=True)
+    submitted = tl.Bool(False).tag(sync=True)
+    use_mm = tl.Bool(False).tag(sync=True)
+    # Either lists of values to sweep over the cartesian product of, keyed by the
+    # parameter name, or an explicit list of parameter sets. Empty for a single run.
+    sweep = tl.Union([tl.Dict(), tl.List(tl.Dict())], default_value={})
+
+    default_guide = ""
@@ -1,20 +1,55 @@
 """Module for handling AiiDA processes."""
 
+import asyncio
+import hashlib
+import itertools
+import json
+from collections.abc import Iterator, Mapping
+from datetime import datetime
+from typing import Any
+
 import traitlets as tl
+from aiida.common.hashing import make_hash
 from aiida.engine import submit
-from aiida.orm import Dict, load_code
-from ipywidgets import dlink
+from aiida.orm import (
+    AbstractCode,
+    Data,
+    Dict,
+    Group,
+    ProcessNode,
+    QueryBuilder,
+    SinglefileData,
+    load_code,
+)
+
+from aiidalab_alc.common.files import CONTENT_HASH_EXTRA, hash_file
+from aiidalab_alc.common.profiling import profiled
+from aiidalab_alc.common.queries import find_stored_duplicate
+from aiidalab_alc.models.resources import ComputationalResourcesModel
+from aiidalab_alc.models.results import ResultsModel
+from aiidalab_alc.models.structure import StructureStepModel
+from aiidalab_alc.models.workflow import ChemShellWorkflowModel
 
-from aiidalab_alc.resources import ComputationalResourcesModel
-from aiidalab_alc.results import ResultsModel
-from aiidalab_alc.structure import StructureStepModel
-from aiidalab_alc.workflow import ChemShellWorkflowModel
+# Extra used to record the fingerprint of a submitted process's inputs
+JOB_FINGERPRINT_EXTRA = "alc_job_fingerprint"
 
 
 class MainAppModel(tl.HasTraits):
-    """The main AiiDAlab application MVC model."""
+    """
+    The main AiiDAlab application MVC model.
+
+    Submission is split into short steps which are scheduled one at a time
+    on the kernel's event loop when one is running, so the notebook stays
+    interactive between them. The progress of a submission is reported by
+    the `submission_stage`, `submission_progress` and `submission_error`
+    traits, which are mirrored by the resource model for display.
+    """
 
     block_results = tl.Bool(True, allow_none=False)
+    submission_stage = tl.Unicode("")
+    submission_progress = tl.Float(0.0)
+    submission_error = tl.Unicode(None, allow_none=True)
+    submission_reused = tl.Int(0)
 
     def __init__(self):
         """MainAppModel constructor."""
@@ -25,21 +60,70 @@ class MainAppModel(tl.HasTraits):
         self.results_model = ResultsModel()
 
         self.resource_model.observe(self._submit_model, "submitted")
-        dlink((self, "block_results"), (self.results_model, "blocked"))
+        tl.dlink((self, "block_results"), (self.results_model, "blocked"))
+        tl.dlink((self.structure_model, "natoms"), (self.resource_model, "natoms"))
+        tl.dlink(
+            (self.workflow_model, "qm_region"),
+            (self.resource_model, "nqm_atoms"),
+            transform=lambda qm_region: len(qm_region or []),
+        )
+        for name in (
+            "submission_stage",
+            "submission_progress",
+            "submission_error",
+            "submission_reused",
+        ):
+            tl.dlink((self, name), (self.resource_model, name))
 
         self.process = None
+        self.submitting = False
 
         return
 
-    def _submit_model(self, _) -> None:
+    def _submit_model(self, change) -> None:
         """Handle the submission of the AiiDA process."""
-        if ChemShellProcess.validate_model(self):
-            self.process = ChemShellProcess(self)
-            self.process.submit_process()
+        if not change["new"] or self.submitting:
+            return
+        self.submitting = True
+        run_steps(self._iter_submission())
+        return
+
+    def _iter_submission(self) -> Iterator[None]:
+        """Submit the AiiDA processes, yielding between each stage."""
+        self.submission_error = None
+        self.submission_progress = 0.0
+        self.submission_reused = 0
+        self.submission_stage = "validating"
+        yield
+        try:
+            errors = ChemShellProcess.get_validation_errors(self)
+            if errors:
+                raise ValueError(" ".join(errors))
+            process = ChemShellProcess(self)
+            for stage, ndone, total in process.iter_submit(process.get_sweep()):
+                self.submission_stage = stage
+                self.submission_progress = ndone / total if total else 1.0
+                yield
+            if process.node is None:
+                raise ValueError("No processes were submitted.")
+
+            self.process = process
+            self.submission_reused = len(process.reused)
+            self.results_model.group_uuid = (
+                process.group.uuid if process.group is not None else None
+            )
             self.block_results = False
-            self.results_model.process_uuid = self.process.node.uuid
-        else:
-            print("ERROR: Input Validation Failed")
+            self.results_model.process_uuid = process.node.uuid
+        except Exception as err:
+            self.submission_error = str(err) or type(err).__name__
+            self.submission_stage = "failed"
+            self.submitting = False
+            # Allow the inputs to be corrected and submitted again
+            self.resource_model.submitted = False
+            return
+
+        self.submission_stage = "submitted"
+        self.submitting = False
         return
 
     def reset(self) -> None:
@@ -61,6 +145,10 @@ class ChemShellProcess:
         """
         self.model = model
         self.node = None
+        self.nodes = []
+        self.group = None
+        self.reused = []
+        self._dicts = {}
         return
 
     @classmethod
@@ -78,58 +166,444 @@ class ChemShellProcess:
         bool
             True if the model is valid, False otherwise.
         """
+        return not cls.get_validation_errors(model)
+
+    @classmethod
+    def get_validation_errors(cls, model: MainAppModel) -> list[str]:
+        """
+        Get the reasons the main application model is invalid.
+
+        Parameters
+        ----------
+        model : MainAppModel
+            The main application model to validate.
+
+        Returns
+        -------
+        list[str]
+            The validation error messages, empty if the model is valid.
+        """
+        errors = []
         if not model.structure_model.has_structure:
             if not model.structure_model.has_file:
-                print("No structure provided.")
-                return False
+                errors.append("No structure provided.")
         if model.workflow_model.use_mm:
             if not model.workflow_model.force_field:
-                print("No force field provided.")
-                return False
+                errors.append("No force field provided.")
             if not model.workflow_model.qm_region:
-                print("No qm_ region specified")
-                return False
+                errors.append("No QM region specified.")
+        if not model.resource_model.code_label:
+            errors.append("No code selected.")
         # Add more validation checks as needed
-        return True
+        return errors
 
-    def submit_process(self):
-        """Submit the AiiDA process."""
-        builder = load_code(self.model.resource_model.code_label).get_builder()
-        if self.model.structure_model.has_file:
-            builder.structure = self.model.structure_model.structure_file
-        else:
-            builder.structure = self.model.structure_model.structure
-        builder.qm_parameters = Dict(
+    def get_parameters(self) -> dict:
+        """
+        Get the process parameters currently set in the application model.
+
+        Returns
+        -------
+        dict
+            The parameters keyed by name, any of which may be overridden
+            for individual processes of a sweep.
+        """
+        structures = self.model.structure_model.all_structures
+        workflow_model = self.model.workflow_model
+        return {
+            "structure": structures[0] if structures else None,
+            "qm_theory": workflow_model.qm_theory,
+            "qm_method": workflow_model.qm_method,
+            "functional": workflow_model.functional,
+            "basis_quality": workflow_model.basis_quality,
+            "use_mm": workflow_model.use_mm,
+            "mm_theory": workflow_model.mm_theory,
+            "qm_region": list(workflow_model.qm_region),
+            "force_field": workflow_model.force_field,
+        }
+
+    def get_sweep(self) -> dict[str, list] | list[dict]:
+        """
+        Get the parameter sweep to submit, with a process for each structure.
+
+        Returns
+        -------
+        dict[str, list] | list[dict]
+            The workflow's parameter sweep, extended over every selected
+            structure. Empty if only a single process is to be submitted.
+        """
+        sweep = self.model.workflow_model.sweep
+        structures = self.model.structure_model.all_structures
+        if len(structures) < 2:
+            return sweep
+        if isinstance(sweep, dict):
+            return {"structure": structures, **sweep}
+        return [
+            {**parameters, "structure": structure}
+            for structure in structures
+            for parameters in sweep or [{}]
+        ]
+
+    def get_parameter_sets(
+        self, sweep: dict[str, list] | list[dict] | None = None
+    ) -> list[dict]:
+        """
+        Get the parameters of every process of a sweep.
+
+        Parameters
+        ----------
+        sweep : dict[str, list] | list[dict], optional
+            The parameter sweep, see `expand_sweep`, the current parameters
+            are used for a single process if not given.
+
+        Returns
+        -------
+        list[dict]
+            The current parameters updated by each parameter set of the sweep.
+
+        Raises
+        ------
+        ValueError
+            If the sweep contains a parameter not returned by `get_parameters`,
+            or has no parameter sets, e.g. as a parameter has no values.
+        """
+        base = self.get_parameters()
+        overrides_list = expand_sweep(sweep) if sweep else [{}]
+        if not overrides_list:
+            raise ValueError("The parameter sweep has no parameter sets.")
+        parameter_sets = []
+        for overrides in overrides_list:
+            unknown = set(overrides) - set(base)
+            if unknown:
+                raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+            parameter_sets.append({**base, **overrides})
+        return parameter_sets
+
+    def get_dict(self, content: dict) -> Dict:
+        """
+        Get a Dict node with the given contents, reusing a stored one if possible.
+
+        Parameters
+        ----------
+        content : dict
+            The contents of the node.
+
+        Returns
+        -------
+        aiida.orm.Dict
+            A stored node with identical contents if there is one, otherwise a
+            new node, which is shared by every process of this submission.
+        """
+        key = json.dumps(content, sort_keys=True)
+        if key not in self._dicts:
+            node = Dict(content)
+            self._dicts[key] = find_stored_duplicate(node) or node
+        return self._dicts[key]
+
+    def build_builder(self, parameters: dict, code=None):
+        """
+        Build the process builder for a set of parameters.
+
+        Parameters
+        ----------
+        parameters : dict
+            The process parameters, as returned by `get_parameters`.
+        code : aiida.orm.Code, optional
+            The code to run, loaded from the resource model if not given.
+
+        Returns
+        -------
+        aiida.engine.ProcessBuilder
+            The populated process builder.
+        """
+        if code is None:
+            code = load_code(self.model.resource_model.code_label)
+        builder = code.get_builder()
+        builder.structure = parameters["structure"]
+        builder.qm_parameters = self.get_dict(
             {
-                "theory": self.model.workflow_model.qm_theory,
-                "basis": "cc-pvtz"
-                if self.model.workflow_model.basis_quality
-                else "cc-pvdz",
-                "method": "dft",
-                "functional": "B3LYP",
+                "theory": parameters["qm_theory"],
+                "basis": "cc-pvtz" if parameters["basis_quality"] else "cc-pvdz",
+                "method": parameters["qm_method"],
+                "functional": parameters["functional"],
             }
         )
-        if self.model.workflow_model.use_mm:
-            builder.mm_parameters = Dict(
+        if parameters["use_mm"]:
+            builder.mm_parameters = self.get_dict(
                 {
-                    "theory": self.model.workflow_model.mm_theory,
+                    "theory": parameters["mm_theory"],
                 }
             )
-            builder.force_field_file = self.model.workflow_model.force_field
-            builder.qmmm_parameters = Dict(
+            builder.force_field_file = parameters["force_field"]
+            builder.qmmm_parameters = self.get_dict(
                 {
-                    "qm_region": self.model.workflow_model.qm_region,
+                    "qm_region": parameters["qm_region"],
                 }
             )
-        builder.calculation_parameters = Dict({"gradients": True})
-        builder.optimisation_parameters = Dict({})
-        if self.model.resource_model.ncpus > 1:
-            builder.metadata.options.withmpi = True
-        builder.metadata.options.resources = {
-            "num_mpiprocs_per_machine": self.model.resource_model.ncpus,
-            "num_cores_per_machine": self.model.resource_model.ncpus,
-            "num_machines": 1,
-            "tot_num_mpiprocs": self.model.resource_model.ncpus,
+        builder.calculation_parameters = self.get_dict({"gradients": True})
+        builder.optimisation_parameters = self.get_dict({})
+        builder.metadata.options.update(self.model.resource_model.get_options())
+        if self.model.resource_model.process_label:
+            builder.metadata.label = self.model.resource_model.process_label
+        if self.model.resource_model.process_description:
+            builder.metadata.description = self.model.resource_model.process_description
+        return builder
+
+    def submit_process(self):
+        """Submit the AiiDA process."""
+        for _ in self.iter_submit():
+            pass
+        return
+
+    def submit_sweep(
+        self,
+        sweep: dict[str, list] | list[dict],
+        group_label: str | None = None,
+    ) -> Group:
+        """
+        Submit a process for every parameter set of a sweep.
+
+        Parameters
+        ----------
+        sweep : dict[str, list] | list[dict]
+            The parameter sweep, see `expand_sweep`.
+        group_label : str, optional
+            The label of the group to create, generated from the current
+            time if not given.
+
+        Returns
+        -------
+        aiida.orm.Group
+            The group containing the submitted process nodes, the first of
+            which is also stored as `node`.
+        """
+        for _ in self.iter_submit(sweep, group_label):
+            pass
+        return self.group
+
+    def iter_submit(
+        self,
+        sweep: dict[str, list] | list[dict] | None = None,
+        group_label: str | None = None,
+    ) -> Iterator[tuple[str, int, int]]:
+        """
+        Submit the AiiDA processes one step at a time.
+
+        All process builders are built before any process is submitted, so
+        an invalid parameter set does not leave a partially submitted sweep.
+        The processes of a sweep are collected in a new group, stored as
+        `group`, each being added as soon as it is submitted. Every process
+        submitted or reused is listed by `nodes`, the first also being `node`.
+
+        Each process's inputs are fingerprinted, and if the resource model
+        allows it, a process that has already finished successfully with an
+        identical fingerprint is reused rather than submitting another. The
+        reused processes are listed by `reused`.
+
+        Parameters
+        ----------
+        sweep : dict[str, list] | list[dict], optional
+            The parameter sweep, see `expand_sweep`. A single process is
+            submitted, without a group, if not given.
+        group_label : str, optional
+            The label of the group to create, generated from the current
+            time if not given.
+
+        Yields
+        ------
+        tuple[str, int, int]
+            The stage reached, and the number of the stage's items done so far
+            and in total, after each item: each input node stored, each builder
+            built and each process submitted.
+
+        Raises
+        ------
+        ValueError
+            If the sweep contains a parameter not returned by `get_parameters`.
+        """
+        parameter_sets = self.get_parameter_sets(sweep)
+        total = len(parameter_sets)
+
+        # Input nodes shared between the processes are stored once up front, rather
+        # than by each submission.
+        inputs = {
+            node.uuid: node
+            for parameters in parameter_sets
+            for node in (parameters["structure"], parameters["force_field"])
+            if node is not None and not node.is_stored
         }
-        self.node = submit(builder)
+        yield "storing inputs", 0, len(inputs)
+        for i, node in enumerate(inputs.values()):
+            node.store()
+            yield "storing inputs", i + 1, len(inputs)
+
+        code = load_code(self.model.resource_model.code_label)
+        builders = []
+        for i, parameters in enumerate(parameter_sets):
+            builders.append(self.build_builder(parameters, code))
+            yield "building", i + 1, total
+
+        if sweep:
+            if group_label is None:
+                group_label = f"alc-sweep-{datetime.now():%Y%m%d-%H%M%S-%f}"
+            self.group = Group(label=group_label).store()
+
+        self.node = None
+        self.nodes = []
+        self.reused = []
+        for i, builder in enumerate(builders):
+            node = self._submit_or_reuse(builder)
+            self.nodes.append(node)
+            if self.group is not None:
+                self.group.add_nodes(node)
+            if self.node is None:
+                self.node = node
+            yield "submitting", i + 1, total
+        yield "submitted", total, total
         return
+
+    @profiled("process.submit")
+    def _submit_or_reuse(self, builder) -> ProcessNode:
+        """Submit a process, or reuse an identical finished one if allowed."""
+        fingerprint = job_fingerprint(builder)
+        if self.model.resource_model.reuse_results:
+            node = find_finished_process(fingerprint)
+            if node is not None:
+                self.reused.append(node)
+                return node
+        node = submit(builder)
+        node.base.extras.set(JOB_FINGERPRINT_EXTRA, fingerprint)
+        return node
+
+
+def job_fingerprint(inputs: Mapping[str, Any]) -> str:
+    """
+    Compute a fingerprint of a process's inputs.
+
+    Files are fingerprinted by their contents, so identical files uploaded
+    under different names match, codes by their uuid, and other data nodes
+    by the hash AiiDA computes from their contents. The process metadata,
+    such as the label and computational resources, is not included.
+
+    Parameters
+    ----------
+    inputs : Mapping[str, Any]
+        The process inputs, e.g. a process builder.
+
+    Returns
+    -------
+    str
+        The SHA-256 hex digest of the inputs.
+    """
+
+    def _fingerprint(value: Any) -> Any:
+        if isinstance(value, Mapping):
+            return {
+                name: _fingerprint(item)
+                for name, item in value.items()
+                if name != "metadata"
+            }
+        if isinstance(value, SinglefileData):
+            digest = value.base.extras.get(CONTENT_HASH_EXTRA, None)
+            if digest is None:
+                with value.open(mode="rb") as handle:
+                    digest = hash_file(handle)
+            return digest
+        if isinstance(value, AbstractCode):
+            return value.uuid
+        if isinstance(value, Data):
+            return value.base.caching.get_hash() or make_hash(
+                value.base.caching.get_objects_to_hash()
+            )
+        return value
+
+    content = json.dumps(_fingerprint(inputs), sort_keys=True, default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def find_finished_process(fingerprint: str) -> ProcessNode | None:
+    """
+    Find a successfully finished process with the given input fingerprint.
+
+    Parameters
+    ----------
+    fingerprint : str
+        The fingerprint of the process's inputs, see `job_fingerprint`.
+
+    Returns
+    -------
+    ProcessNode or None
+        The most recently created matching process, or None if there is none.
+    """
+    qbuild = QueryBuilder().append(
+        ProcessNode,
+        filters={
+            f"extras.{JOB_FINGERPRINT_EXTRA}": fingerprint,
+            "attributes.process_state": "finished",
+            "attributes.exit_status": 0,
+        },
+        tag="process",
+    )
+    qbuild.order_by({"process": {"ctime": "desc"}}).limit(1)
+    return qbuild.first(flat=True)
+
+
+def run_steps(steps: Iterator) -> None:
+    """
+    Run the steps of an iterator without blocking the kernel's event loop.
+
+    Each step is scheduled as a separate callback on the running event
+    loop, so that the kernel can handle widget messages between steps.
+    AiiDA gives each thread its own storage session, and the nodes held by
+    the app's models belong to the kernel thread's session, so steps that
+    store or link them are interleaved on the kernel thread. Worker threads,
+    such as the database search's, only run read-only queries in their own
+    sessions and hand their results back to the kernel's event loop, see
+    `aiidalab_alc.common.threads`. If no event loop is running the steps are
+    run immediately.
+
+    Parameters
+    ----------
+    steps : Iterator
+        The iterator to exhaust.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        for _ in steps:
+            pass
+        return
+
+    def _step() -> None:
+        try:
+            next(steps)
+        except StopIteration:
+            return
+        loop.call_soon(_step)
+
+    loop.call_soon(_step)
+    return
+
+
+def expand_sweep(sweep: dict[str, list] | list[dict]) -> list[dict]:
+    """
+    Expand a parameter sweep into the individual parameter sets.
+
+    Parameters
+    ----------
+    sweep : dict[str, list] | list[dict]
+        Either lists of values keyed by the parameter name, which are
+        expanded to their cartesian product, or an explicit list of
+        parameter sets.
+
+    Returns
+    -------
+    list[dict]
+        The parameter sets, each mapping parameter names to values.
+    """
+    if isinstance(sweep, dict):
+        names = list(sweep)
+        return [
+            dict(zip(names, values, strict=True))
+            for values in itertools.product(*(sweep[name] for name in names))
+        ]
+    return [dict(parameters) for parameters in sweep]
@@ -1,45 +1,23 @@
-"""Defines the model and view for the resource setup stage."""
+"""Defines the view for the resource setup stage."""
+
+import threading
 
 import aiidalab_widgets_base as awb
 import ipywidgets as ipw
 import traitlets as tl
-from aiida.orm import Code, QueryBuilder
+from aiida.orm import Computer
 
+from aiidalab_alc.common.scheduler import ComputerLoad, SchedulerProbe
+from aiidalab_alc.common.threads import call_in_loop, get_kernel_loop
+from aiidalab_alc.models.resources import (
+    CodeEntry,
+    CodeRegistry,
+    ComputationalResourcesModel,
+    rank_codes,
+)
 from aiidalab_alc.utils import test_aiida_chemsh_import
 
 
-class ComputationalResourcesModel(tl.HasTraits):
-    """Model for the resource setup stage."""
-
-    code_label = tl.Unicode("").tag(sync=True)
-    ncpus = tl.Int(1).tag(sync=True)
-    process_label = tl.Unicode("").tag(sync=True)
-    process_description = tl.Unicode("").tag(sync=True)
-    submitted = tl.Bool(False).tag(sync=True)
-
-    default_guide = """
-        <p>
-            Configure the computational resources required to run the ChemShell
-            calculation. Additionally, you can provide a label and description for
-            the AiiDA process that will be created.
-        </p>
-    """
-
-    def validate(self) -> bool:
-        """
-        Validate the model's inputs.
-
-        Returns
-        -------
-        bool
-            True if all inputs are valid, False otherwise.
-        """
-        if not self.code_label:
-            print("ERROR: No code selected.")
-            return False
-        return True
-
-
 class ComputationalResourcesWizardStep(ipw.VBox, awb.WizardAppWidgetStep):
     """Main view for the resource setup stage."""
 
@@ -62,7 +40,8 @@ class ComputationalResourcesWizardStep(ipw.VBox, awb.WizardAppWidgetStep):
             """,
             layout={"margin": "auto"},
         )
-        self.chemsh_installed = test_aiida_chemsh_import()
+        # Checked when rendered, as importing the plugin is slow
+        self.chemsh_installed = False
         self.chemsh_warning = ipw.HTML("", layout={"margin": "auto"})
 
         self.guide = ipw.HTML(
@@ -78,31 +57,78 @@ class ComputationalResourcesWizardStep(ipw.VBox, awb.WizardAppWidgetStep):
         )
         self.submit_btn.on_click(self._submit)
 
-        self.children = [
-            # self.header,
-            self.guide,
-            self.chemsh_warning if not self.chemsh_installed else ipw.HTML(""),
-            ResourceSetupBox(model=self.model),
-            self.submit_btn,
-        ]
+        self.submission_status = ipw.HTML("", layout={"margin": "auto"})
+        self.submission_progress = ipw.FloatProgress(
+            value=0.0,
+            min=0.0,
+            max=1.0,
+            layout={"width": "80%", "margin": "auto", "display": "none"},
+        )
+        ipw.dlink(
+            (self.model, "submission_progress"), (self.submission_progress, "value")
+        )
+        self.model.observe(
+            self._update_submission_status,
+            ["submission_stage", "submission_error", "submitted"],
+        )
+
         return
 
     def render(self):
-        """Render the wizard's contents if not already rendered."""
+        """
+        Render the wizard's contents if not already rendered.
+
+        The code list is queried from the database when the setup box is built,
+        so it is only built once the step is opened.
+        """
         if self.rendered:
             return
         self._refresh_widget()
+        self.children = [
+            # self.header,
+            self.guide,
+            self.chemsh_warning,
+            ResourceSetupBox(model=self.model),
+            self.submit_btn,
+            self.submission_progress,
+            self.submission_status,
+        ]
         self.rendered = True
         return
 
     def _submit(self, _=None) -> None:
         """Handle the submission of the AiiDA process."""
         if self.model.validate():
-            self.model.submitted = True
             self.submit_btn.disabled = True
-            self.submit_btn.description = "Submitted"
+            self.submit_btn.description = "Submitting"
+            self.model.submitted = True
+        return
+
+    def _update_submission_status(self, _=None) -> None:
+        """Display the progress of the submission."""
+        stage = self.model.submission_stage
+        error = self.model.submission_error
+        if error:
+            self.submission_status.value = f"<p style='color:red;'>ERROR: {error}</p>"
+        elif stage == "submitted" and self.model.submission_reused:
+            self.submission_status.value = (
+                f"<p>Reused the results of {self.model.submission_reused} identical"
+                " finished calculation(s).</p>"
+            )
+        elif stage and stage != "submitted":
+            self.submission_status.value = (
+                f"<p><i class='fa fa-spinner fa-pulse'></i> {stage.capitalize()}...</p>"
+            )
         else:
-            print("ERROR: Input Validation Failed")
+            self.submission_status.value = ""
+        in_progress = self.model.submitted and stage not in ("", "submitted")
+        self.submission_progress.layout.display = None if in_progress else "none"
+        if stage == "submitted":
+            self.submit_btn.description = "Submitted"
+        elif not self.model.submitted:
+            # The submission failed, so the inputs may be corrected and resubmitted
+            self.submit_btn.disabled = not self.chemsh_installed
+            self.submit_btn.description = "Submit"
         return
 
     def _refresh_widget(self) -> None:
@@ -148,10 +174,24 @@ class ResourceSetupBox(ipw.VBox):
             icon="refresh",
             layout={"width": "20%"},
         )
-        self.refresh_codes_button.on_click(self.update_codes)
+        self.refresh_codes_button.on_click(self._refresh_codes)
+        self.check_queues_button = ipw.Button(
+            description="Check Queues",
+            button_style="info",
+            tooltip="Rank the codes by the load on their computers' queues",
+            icon="tasks",
+            layout={"width": "20%"},
+        )
+        self.check_queues_button.on_click(self.check_queues)
         self.code_box = ipw.HBox(
-            layout={"width": "100%"}, children=[self.code, self.refresh_codes_button]
+            layout={"width": "100%"},
+            children=[self.code, self.refresh_codes_button, self.check_queues_button],
         )
+        self.code_info = ipw.HTML("")
+        self.queue_info = ipw.HTML("")
+        self.probe = SchedulerProbe()
+        self.codes = {}
+        self.code.observe(self._update_code_info, "value")
         self.update_codes()
 
         # tl.link((self.code, "value"), (self.model, "code"))
@@ -159,7 +199,7 @@ class ResourceSetupBox(ipw.VBox):
         self.ncpus_input = ipw.BoundedIntText(
             value=self.model.ncpus,
             min=1,
-            max=128,
+            max=2**16,
             step=1,
             description="No. CPUs:",
             disabled=False,
@@ -167,6 +207,48 @@ class ResourceSetupBox(ipw.VBox):
         )
         tl.link((self.ncpus_input, "value"), (self.model, "ncpus"))
 
+        self.omp_threads_input = ipw.BoundedIntText(
+            value=self.model.omp_threads,
+            min=1,
+            max=256,
+            description="OMP Threads:",
+            layout=ipw.Layout(width="80%"),
+        )
+        tl.link((self.omp_threads_input, "value"), (self.model, "omp_threads"))
+        self.walltime_input = ipw.BoundedFloatText(
+            value=self.model.walltime_hours,
+            min=0.1,
+            max=10000.0,
+            step=0.5,
+            description="Wall Time (h):",
+            layout=ipw.Layout(width="80%"),
+        )
+        tl.link((self.walltime_input, "value"), (self.model, "walltime_hours"))
+        self.memory_input = ipw.BoundedFloatText(
+            value=self.model.memory_gb,
+            min=0.0,
+            max=2.0**20,
+            description="Memory (GB):",
+            description_tooltip="Memory per machine, 0 for the scheduler's default",
+            layout=ipw.Layout(width="80%"),
+        )
+        tl.link((self.memory_input, "value"), (self.model, "memory_gb"))
+
+        self.estimate_btn = ipw.Button(
+            description="Estimate",
+            button_style="info",
+            tooltip="Estimate the resources from the size of the system",
+            icon="calculator",
+            layout={"width": "20%"},
+        )
+        self.estimate_btn.on_click(lambda _: self.model.estimate())
+        self.layout_info = ipw.HTML("")
+        self.model.observe(
+            self._update_layout_info,
+            ["ncpus", "omp_threads", "cores_per_machine", "scheduler_type"],
+        )
+        self._update_layout_info()
+
         self.label = ipw.Text(
             value=self.model.process_label,
             placeholder="Enter process label",
@@ -185,20 +267,131 @@ class ResourceSetupBox(ipw.VBox):
         )
         tl.link((self.description, "value"), (self.model, "process_description"))
 
+        self.reuse_results = ipw.Checkbox(
+            value=self.model.reuse_results,
+            description="Reuse the results of identical finished calculations",
+            indent=False,
+            layout=ipw.Layout(width="80%"),
+        )
+        tl.link((self.reuse_results, "value"), (self.model, "reuse_results"))
+
         self.children = [
             self.code_box,
-            self.ncpus_input,
+            self.code_info,
+            self.queue_info,
+            ipw.HBox([self.ncpus_input, self.estimate_btn]),
+            self.omp_threads_input,
+            self.walltime_input,
+            self.memory_input,
+            self.layout_info,
             self.label,
             self.description,
+            self.reuse_results,
         ]
 
+    def _update_layout_info(self, _=None) -> None:
+        """Describe how the requested cores are laid out across machines."""
+        num_machines, procs_per_machine, threads = self.model.get_layout()
+        info = (
+            f"{num_machines} machine(s) x {procs_per_machine} MPI process(es)"
+            f" x {threads} thread(s)"
+        )
+        if self.model.cores_per_machine:
+            info += f", {self.model.cores_per_machine} cores per machine"
+        if self.model.scheduler_type:
+            info += f" ({self.model.scheduler_type})"
+        self.layout_info.value = f"<p>{info}</p>"
+        return
+
     def update_codes(self, _=None) -> None:
         """Update the list of available codes."""
-        qb = QueryBuilder()
-        qb.append(Code, project=["label", "id"])
-        codes = qb.all()
-        code_labels = [f"{label}" for label, id in codes]
-        self.code.options = code_labels
-        if code_labels:
-            self.code.value = code_labels[0]
+        registry = CodeRegistry.get_registry()
+        self.codes = {code.full_label: code for code in registry.codes()}
+        self.code.options = list(self.codes)
+        if self.codes and self.code.value not in self.codes:
+            self.code.value = next(iter(self.codes))
+        self._update_code_info()
+        return
+
+    def check_queues(self, _=None) -> None:
+        """
+        Probe the computers' queues, then rank the codes by expected wait.
+
+        The computers are probed on worker threads, and the ranking is shown
+        on the kernel's event loop once they have all been probed.
+        """
+        codes = list(self.codes.values())
+        computers = {
+            code.computer: Computer.collection.get(label=code.computer)
+            for code in codes
+        }
+        if not computers:
+            return
+        self.check_queues_button.disabled = True
+        self.queue_info.value = (
+            "<p><i class='fa fa-spinner fa-pulse'></i> Checking queues...</p>"
+        )
+        num_machines = self.model.get_layout()[0]
+        loop = get_kernel_loop()
+        futures = self.probe.submit(computers.values())
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def _on_probed(_) -> None:
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            loads = {label: future.result() for label, future in futures.items()}
+            call_in_loop(
+                loop, self._show_ranking, rank_codes(codes, loads, num_machines)
+            )
+
+        for future in futures.values():
+            future.add_done_callback(_on_probed)
+        return
+
+    def _show_ranking(self, ranking: list[tuple[CodeEntry, ComputerLoad]]) -> None:
+        """Order the codes by their expected wait and describe the queues."""
+        value = self.code.value
+        self.code.options = [code.full_label for code, _ in ranking]
+        self.code.value = value
+        num_machines = self.model.get_layout()[0]
+        rows = []
+        for code, load in ranking:
+            if load.error is not None:
+                status = f"unavailable ({load.error})" if load.error else "not probed"
+            else:
+                wait = load.expected_wait(num_machines)
+                status = (
+                    f"{load.queued} queued, {load.running} running"
+                    + (f", {load.free_nodes} free nodes" if load.free_nodes else "")
+                    + (f", ~{wait / 3600:.1f} h wait" if wait else ", starts now")
+                )
+            rows.append(f"<li>{code.full_label}: {status}</li>")
+        self.queue_info.value = f"<ol>{''.join(rows)}</ol>"
+        self.check_queues_button.disabled = False
+        return
+
+    def _refresh_codes(self, _=None) -> None:
+        """Query the codes again, also picking up changes to the computers."""
+        CodeRegistry.get_registry().invalidate()
+        self.update_codes()
+        return
+
+    def _update_code_info(self, _=None) -> None:
+        """Describe the state of the selected code's computer."""
+        code = self.codes.get(self.code.value)
+        if code is None:
+            self.code_info.value = (
+                "<p style='color:red;'>No ChemShell code found.</p>"
+                if not self.codes
+                else ""
+            )
+        elif code.configured and code.enabled:
+            self.code_info.value = f"<p>Computer {code.computer}: {code.state}</p>"
+        else:
+            self.code_info.value = (
+                f"<p style='color:red;'>Computer {code.computer}: {code.state}</p>"
+            )
         return
@@ -1,49 +1,280 @@
-"""Module for defining widgets/models for viewing process progress and results."""
+"""Module for defining widgets for viewing process progress and results."""
 
-from typing import cast
+import logging
+import re
+import threading
+from collections.abc import Callable
 
 import aiidalab_widgets_base as awb
 import ipywidgets as ipw
 import traitlets as tl
-from aiida.common.exceptions import NotExistent
-from aiida.orm import NodeLinksManager, ProcessNode, load_node
+from aiida.cmdline.utils.ascii_vis import calc_info
+from aiida.common.links import LinkType
+from aiida.engine import ProcessState
+from aiida.manage import get_manager
+from aiida.orm import ProcessNode, QueryBuilder, load_node
+from aiidalab_widgets_base.nodes import AiidaProcessNodeTreeNode
 
+from aiidalab_alc.common.profiling import profiled
+from aiidalab_alc.common.threads import call_in_loop, get_kernel_loop
+from aiidalab_alc.models.results import ResultsModel
 
-class ProcessModel(tl.HasTraits):
-    """Model describing an AiiDA process."""
+LOGGER = logging.getLogger(__name__)
 
-    process_uuid = tl.Unicode(None, allow_none=True)
+# The types of the links from a process to the processes it called
+CALL_LINK_TYPES = [LinkType.CALL_CALC.value, LinkType.CALL_WORK.value]
+
+
+class ProcessStatusMonitor:
+    """
+    Monitor the processes of a provenance tree for changes.
+
+    The modification times of the root process and the processes it called
+    are polled with projected queries. The polling interval doubles, up to a
+    maximum, each time nothing has changed and is reset as soon as something
+    does. If the profile has a message broker, process state change broadcasts
+    wake the monitor immediately rather than waiting for the next poll.
+    Monitoring stops once the root process reaches a terminal state.
+
+    The callbacks are called on the monitor's thread, with the root process's
+    state as it was when they were called. If polling or a callback fails,
+    the error is logged, passed to the error callback and monitoring stops.
+    """
+
+    terminal_states = ("finished", "excepted", "killed")
+
+    def __init__(
+        self,
+        root_pk: int,
+        on_change: Callable[[set[int], str | None], None],
+        on_terminated: Callable[[str], None] | None = None,
+        on_error: Callable[[Exception], None] | None = None,
+        min_interval: float = 1.0,
+        max_interval: float = 30.0,
+    ):
+        """
+        ProcessStatusMonitor constructor.
+
+        Parameters
+        ----------
+        root_pk : int
+            The pk of the root process, monitoring stops once it terminates.
+        on_change : Callable[[set[int], str | None], None]
+            Called with the pks of the processes that have changed since the
+            previous poll, and the state of the root process.
+        on_terminated : Callable[[str], None], optional
+            Called with the terminal state of the root process once reached.
+        on_error : Callable[[Exception], None], optional
+            Called with the error if polling or a callback fails.
+        min_interval : float
+            The shortest time in seconds between polls.
+        max_interval : float
+            The longest time in seconds between polls.
+        """
+        self.root_pk = root_pk
+        self.on_change = on_change
+        self.on_terminated = on_terminated
+        self.on_error = on_error
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.process_state = None
+
+        self._mtimes = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._subscriber = None
+        return
 
     @property
-    def process(self) -> ProcessNode | None:
-        """Return the process node for the stored uuid."""
-        if not self.process_uuid:
-            return None
+    def is_running(self) -> bool:
+        """True if the monitor thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start monitoring in a background thread."""
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Stop monitoring and wait for the monitor thread to finish.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The maximum time in seconds to wait for the thread.
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        return
+
+    def poll(self) -> set[int]:
+        """
+        Check the monitored processes for changes.
+
+        Returns
+        -------
+        set[int]
+            The pks of the processes that have changed since the previous poll.
+        """
+        projections = ["id", "mtime", "attributes.process_state"]
+        qbuild = QueryBuilder().append(
+            ProcessNode, filters={"id": self.root_pk}, project=projections
+        )
+        changed = set()
+        parents = []
+        # The called processes are found one level of the call tree at a time
+        while True:
+            for pk, mtime, process_state in qbuild.iterall():
+                if self._mtimes.get(pk) != mtime:
+                    changed.add(pk)
+                    self._mtimes[pk] = mtime
+                if pk == self.root_pk:
+                    self.process_state = process_state
+                parents.append(pk)
+            if not parents:
+                break
+            qbuild = QueryBuilder().append(
+                ProcessNode, filters={"id": {"in": parents}}, tag="caller"
+            )
+            qbuild.append(
+                ProcessNode,
+                with_incoming="caller",
+                edge_filters={"type": {"in": CALL_LINK_TYPES}},
+                project=projections,
+            )
+            parents = []
+        return changed
+
+    def _run(self) -> None:
+        """Poll for changes until stopped or the root process terminates."""
+        self._subscribe()
+        interval = self.min_interval
         try:
-            return cast(ProcessNode, load_node(self.process_uuid))
-        except NotExistent:
-            return None
+            while not self._stop.is_set():
+                changed = self.poll()
+                process_state = self.process_state
+                if changed:
+                    self.on_change(changed, process_state)
+                    interval = self.min_interval
+                else:
+                    interval = min(2 * interval, self.max_interval)
 
-    @property
-    def has_process(self) -> bool:
-        """Return true if a valid process node is associated with the uuid."""
-        return self.process is not None
+                if process_state in self.terminal_states:
+                    if self.on_terminated is not None:
+                        self.on_terminated(process_state)
+                    break
 
-    @property
-    def inputs(self) -> NodeLinksManager | list:
-        """Return the inputs for the process."""
-        return self.process.inputs if self.has_process else []
+                self._wake.wait(interval)
+                self._wake.clear()
+        except Exception as err:
+            LOGGER.exception("Monitoring process %d failed", self.root_pk)
+            if self.on_error is not None:
+                self.on_error(err)
+        finally:
+            self._unsubscribe()
+        return
+
+    def _subscribe(self) -> None:
+        """Wake the monitor on process state change broadcasts, if possible."""
+        if get_manager().get_profile().process_control_backend is None:
+            return
+        try:
+            from kiwipy import BroadcastFilter
+
+            communicator = get_manager().get_communicator()
+            self._subscriber = communicator.add_broadcast_subscriber(
+                BroadcastFilter(
+                    lambda *_, **__: self._wake.set(),
+                    subject=re.compile(r"^state_changed\."),
+                )
+            )
+        except Exception:
+            # Without a reachable broker the monitor falls back to polling alone
+            self._subscriber = None
+        return
+
+    def _unsubscribe(self) -> None:
+        """Remove the broadcast subscriber, if one was added."""
+        if self._subscriber is not None:
+            try:
+                get_manager().get_communicator().remove_broadcast_subscriber(
+                    self._subscriber
+                )
+            except Exception:
+                pass
+            self._subscriber = None
+        return
 
-    @property
-    def outputs(self) -> NodeLinksManager | list:
-        """Return the outputs for teh process."""
-        return self.process.outputs if self.has_process else []
 
+class ProcessTreeWidget(awb.NodesTreeWidget):
+    """
+    A tree of the processes called by a root process and their outputs.
 
-class ResultsModel(ProcessModel):
-    """MVC results step model."""
+    Processes whose state has changed are updated in place. The whole tree is
+    only rebuilt, by the public `update`, once its structure has changed: a
+    process has called new processes, or has terminated and so has outputs.
+    """
 
-    blocked = tl.Bool(True)
+    value = tl.Unicode(allow_none=True)
+
+    @tl.observe("value")
+    def _observe_process(self, change) -> None:
+        """Show the tree of the process with the given uuid."""
+        if change["new"]:
+            process = load_node(change["new"])
+            self.nodes = [process]
+            self.find_node(process.pk).selected = True
+        else:
+            self.nodes = []
+        return
+
+    @profiled("results.update_tree")
+    def update_processes(self, pks: set[int]) -> None:
+        """
+        Update the given processes in the tree.
+
+        Parameters
+        ----------
+        pks : set[int]
+            The pks of the processes that have changed.
+        """
+        updates = []
+        for pk in pks:
+            try:
+                tree_node = self.find_node(pk)
+            except KeyError:
+                # A newly called process, which its caller's node must show
+                self.update()
+                return
+            process = load_node(pk)
+            shown = {
+                child.pk
+                for child in tree_node.nodes
+                if isinstance(child, AiidaProcessNodeTreeNode)
+            }
+            if process.is_terminated or shown != {n.pk for n in process.called}:
+                self.update()
+                return
+            updates.append((tree_node, process))
+        for tree_node, process in updates:
+            if process.process_state is None:
+                continue
+            tree_node.name = calc_info(process)
+            state = (
+                ProcessState.EXCEPTED if process.is_failed else process.process_state
+            )
+            tree_node.icon_style = self.PROCESS_STATE_STYLE.get(
+                state, self.PROCESS_STATE_STYLE_DEFAULT
+            )
+        return
 
 
 class ResultsWizardStep(ipw.VBox, awb.WizardAppWidgetStep):
@@ -62,6 +293,7 @@ class ResultsWizardStep(ipw.VBox, awb.WizardAppWidgetStep):
         """
         self.rendered = False
         self.model = model
+        self.monitor = None
 
         self.info = ipw.HTML(
             """
@@ -81,6 +313,13 @@ class ResultsWizardStep(ipw.VBox, awb.WizardAppWidgetStep):
             layout={"margin": "auto", "width": "70%"},
         )
         self.update_btn.on_click(self._refresh_info)
+        self.status = ipw.HTML("")
+        self.process_select = ipw.Dropdown(
+            options=[],
+            description="Process:",
+            layout={"width": "70%"},
+        )
+        self.process_select.observe(self._on_process_select, "value")
 
         super().__init__(**kwargs)
         return
@@ -99,7 +338,7 @@ class ResultsWizardStep(ipw.VBox, awb.WizardAppWidgetStep):
             )
             self.children = [msg]
         else:
-            self.node_tree = awb.ProcessNodesTreeWidget()
+            self.node_tree = ProcessTreeWidget()
             ipw.dlink((self.model, "process_uuid"), (self.node_tree, "value"))
             self.node_view = awb.viewers.AiidaNodeViewWidget()
             ipw.dlink(
@@ -110,14 +349,119 @@ class ResultsWizardStep(ipw.VBox, awb.WizardAppWidgetStep):
 
             self.children = [
                 self.info,
+                self.process_select,
                 self.node_tree,
                 self.node_view,
+                self.status,
                 self.update_btn,
             ]
+            self.model.observe(self._start_monitor, "process_uuid")
+            self.model.observe(self._update_process_select, "group_uuid")
+            self._update_process_select()
+            self._start_monitor()
             self.rendered = True
         return
 
+    def close(self) -> None:
+        """Close the step, stopping the process monitor."""
+        if self.monitor is not None:
+            self.monitor.stop()
+            self.monitor = None
+        super().close()
+        return
+
+    def _update_process_select(self, _=None) -> None:
+        """List the processes of the model's group, if any, for selection."""
+        options = self.model.group_processes()
+        self.process_select.layout.display = None if options else "none"
+        with self.process_select.hold_trait_notifications():
+            self.process_select.options = options
+            if self.model.process_uuid in dict(options).values():
+                self.process_select.value = self.model.process_uuid
+        return
+
+    def _on_process_select(self, change) -> None:
+        """Show the process selected from the group."""
+        if change["new"]:
+            self.model.process_uuid = change["new"]
+        return
+
+    def _start_monitor(self, _=None) -> None:
+        """
+        Monitor the model's process, replacing any previous monitor.
+
+        The monitor's callbacks are handed to the kernel's event loop, where
+        they are ignored if the monitor has since been replaced.
+        """
+        if self.monitor is not None:
+            self.monitor.stop()
+            self.monitor = None
+        if not self.model.has_process:
+            self.status.value = ""
+            return
+        loop = get_kernel_loop()
+        monitor = ProcessStatusMonitor(
+            self.model.process.pk,
+            on_change=lambda pks, state: call_in_loop(
+                loop, self._on_process_change, monitor, pks, state
+            ),
+            on_terminated=lambda state: call_in_loop(
+                loop, self._on_process_terminated, monitor, state
+            ),
+            on_error=lambda err: call_in_loop(
+                loop, self._on_monitor_error, monitor, err
+            ),
+        )
+        self.monitor = monitor
+        monitor.start()
+        return
+
+    def _on_process_change(
+        self, monitor: ProcessStatusMonitor, pks: set[int], process_state: str | None
+    ) -> None:
+        """Update the processes in the tree that have changed."""
+        if monitor is not self.monitor:
+            return
+        try:
+            self.node_tree.update_processes(pks)
+        except Exception as err:
+            LOGGER.exception("Updating the process tree failed")
+            monitor.stop()
+            self._on_monitor_error(monitor, err)
+            return
+        self.status.value = f"<p>Monitoring process (state: {process_state})...</p>"
+        return
+
+    def _on_process_terminated(
+        self, monitor: ProcessStatusMonitor, process_state: str
+    ) -> None:
+        """
+        Report the process has terminated.
+
+        The tree has already been brought up to date, as the monitor reports the
+        root process's change to its terminal state first.
+        """
+        if monitor is not self.monitor:
+            return
+        self.status.value = f"<p>Process {process_state}, monitoring stopped.</p>"
+        return
+
+    def _on_monitor_error(self, monitor: ProcessStatusMonitor, err: Exception) -> None:
+        """Report that monitoring stopped because of an error."""
+        if monitor is not self.monitor:
+            return
+        message = str(err) or type(err).__name__
+        self.status.value = f"<p style='color:red;'>Monitoring stopped: {message}</p>"
+        return
+
+    @profiled("results.rebuild_tree")
     def _refresh_info(self, _) -> None:
-        """Refresh the process information."""
+        """
+        Refresh the process information.
+
+        This is the user's explicit request to reload everything, so the whole
+        tree is rebuilt rather than only the processes the monitor saw change.
+        """
         self.node_tree.update()
+        self._update_process_select()
         return
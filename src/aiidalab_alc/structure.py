@@ -1,46 +1,22 @@
-"""Defines the model and view components for the structure setup stage."""
+"""Defines the view components for the structure setup stage."""
 
-from pathlib import Path
-from tempfile import NamedTemporaryFile
+import logging
+from typing import TYPE_CHECKING, BinaryIO
 
 import aiidalab_widgets_base as awb
-import ase
 import ipywidgets as ipw
-import traitlets as tl
-from aiida.orm import SinglefileData, StructureData
+from aiida.orm import SinglefileData
 
 from aiidalab_alc.common.database import AiiDADatabaseWidget
 from aiidalab_alc.common.file_handling import FileUploadWidget
+from aiidalab_alc.common.files import read_structure
+from aiidalab_alc.common.profiling import add_bytes, profile
+from aiidalab_alc.models.structure import StructureStepModel
 
+if TYPE_CHECKING:
+    import ase
 
-class StructureStepModel(tl.HasTraits):
-    """
-    Model for structure selection and manipulation.
-
-    A model to define and store required information from the structure
-    step in the app's configuration wizard.
-    """
-
-    structure = tl.Instance(StructureData, allow_none=True)
-    structure_file = tl.Instance(SinglefileData, allow_none=True)
-    submitted = tl.Bool(False).tag(sync=True)
-
-    @property
-    def has_structure(self) -> bool:
-        """True if a StructureData object has been attached to the model."""
-        return self.structure is not None
-
-    @property
-    def has_file(self) -> bool:
-        """True if a raw structure file object has been attached to the model."""
-        return self.structure_file is not None
-
-    @property
-    def is_periodic(self) -> bool:
-        """True if the attached StructureData object is a periodic structure."""
-        if self.has_structure:
-            return any(self.structure.pbc)
-        return False
+LOGGER = logging.getLogger(__name__)
 
 
 class StructureWizardStep(ipw.VBox, awb.WizardAppWidgetStep):
@@ -65,6 +41,18 @@ class StructureWizardStep(ipw.VBox, awb.WizardAppWidgetStep):
         super().__init__(children=[], **kwargs)
         self.rendered = False
         self.model = model
+        self.database_widget = None
+        return
+
+    def render(self):
+        """
+        Render the wizard's contents if not already rendered.
+
+        The database browser queries the AiiDA database as soon as it is built,
+        so it is only built once its tab is first opened.
+        """
+        if self.rendered:
+            return
 
         self.info = ipw.HTML(
             """
@@ -79,30 +67,45 @@ class StructureWizardStep(ipw.VBox, awb.WizardAppWidgetStep):
         # upload file
         self.tabs.set_title(0, "Upload File")
         self.file_input_widget = ipw.VBox()
-        self.file_uploader = FileUploadWidget(description="Structure file: ")
+        self.file_uploader = FileUploadWidget(
+            description="Structure file: ", multiple=True, structures=True
+        )
         self.file_input_widget.children = [
             self.file_uploader,
         ]
+        ipw.dlink((self.file_uploader, "files"), (self.model, "structures"))
         ipw.dlink((self.file_uploader, "file"), (self.model, "structure_file"))
 
         # AiiDA database
         self.tabs.set_title(1, "AiiDA Database")
-        self.database_widget = AiiDADatabaseWidget(
-            title="AiiDA Database",
-            query=[
-                SinglefileData,
-            ],
+        self.database_tab = ipw.VBox(
+            [ipw.HTML("<p><i class='fa fa-spinner fa-pulse'></i> Loading...</p>")]
         )
-        ipw.dlink((self.database_widget, "data_object"), (self.model, "structure_file"))
 
-        self.tabs.children = [self.file_input_widget, self.database_widget]
+        self.tabs.children = [self.file_input_widget, self.database_tab]
+        self.tabs.observe(self._on_tab_select, "selected_index")
 
-        self.model.observe(self._on_file_upload, "structure_file")
+        # Frames are only parsed when selected, so large trajectories are never read
+        # in full to display a single structure.
+        self.frame_selector = ipw.IntText(
+            value=0,
+            description="Frame:",
+            disabled=True,
+            layout={"width": "20%"},
+        )
+        self.frame_selector.observe(self._on_frame_select, "value")
+        self._structure_format = None
 
-    def render(self):
-        """Render the wizard's contents if not already rendered."""
-        if self.rendered:
-            return
+        # Chooses which of several selected structures is viewed
+        self.structure_selector = ipw.Dropdown(
+            options=[],
+            description="Structure:",
+            layout={"width": "50%", "display": "none"},
+        )
+        self.structure_selector.observe(self._on_structure_select, "value")
+
+        self.model.observe(self._on_file_upload, "structure_file")
+        self.model.observe(self._on_structures_change, "structures")
 
         self.submit_btn = ipw.Button(
             description="Submit Structure",
@@ -119,47 +122,165 @@ class StructureWizardStep(ipw.VBox, awb.WizardAppWidgetStep):
         self.rendered = True
         return
 
+    def _on_tab_select(self, change) -> None:
+        """Build the database browser when its tab is first opened."""
+        if change["new"] != 1 or self.database_widget is not None:
+            return
+        self.database_widget = AiiDADatabaseWidget(
+            title="AiiDA Database",
+            query=[
+                SinglefileData,
+            ],
+        )
+        ipw.dlink((self.database_widget, "data_object"), (self.model, "structure_file"))
+        ipw.dlink((self.database_widget, "data_objects"), (self.model, "structures"))
+        self.database_tab.children = [self.database_widget]
+        if self.model.submitted:
+            self.database_widget.disable(True)
+        return
+
     def _update_children(self) -> None:
         self.children = [
             self.info,
             self.tabs,
             ipw.HTML("<h2>Viewer:</h2>"),
+            self.structure_selector,
+            self.frame_selector,
             self.viewer,
             self.submit_btn,
         ]
         return
 
+    def _on_structures_change(self, _=None) -> None:
+        """List the selected structures for viewing."""
+        structures = self.model.structures
+        self.structure_selector.layout.display = None if len(structures) > 1 else "none"
+        with self.structure_selector.hold_trait_notifications():
+            self.structure_selector.options = [
+                (f"{i + 1}: {node.label or node.uuid}", i)
+                for i, node in enumerate(structures)
+            ]
+            viewed = self.model.structure_file
+            self.structure_selector.value = next(
+                (
+                    i
+                    for i, node in enumerate(structures)
+                    if viewed is not None and node.uuid == viewed.uuid
+                ),
+                0 if structures else None,
+            )
+        return
+
+    def _on_structure_select(self, change) -> None:
+        """View the chosen structure of the selection."""
+        if change["new"] is None:
+            return
+        node = self.model.structures[change["new"]]
+        if isinstance(node, SinglefileData):
+            self.model.structure_file = node
+        return
+
     def _on_file_upload(self, change=None):
         """When file upload button is pressed."""
-        if self.model.has_file:
-            structure = self._get_ase_object_from_file(
-                self.model.structure_file.filename, self.model.structure_file.content
-            )
-            if structure:
-                self.viewer = awb.viewers.StructureDataViewer(structure=structure)
-            else:
-                self.viewer = ipw.HTML(
-                    "<p>Could not visualise structure from file...</p>"
-                )
-            self._update_children()
+        self._structure_format = None
+        self.frame_selector.disabled = not self.model.has_file
+        if self.frame_selector.value != 0:
+            # Selecting the first frame updates the viewer
+            self.frame_selector.value = 0
+        else:
+            self._show_frame(0)
+        return
+
+    def _on_frame_select(self, change) -> None:
+        """Display the selected frame of the structure file."""
+        if change["new"] < 0:
+            self.frame_selector.value = 0
+            return
+        self._show_frame(change["new"])
+        return
+
+    def _show_frame(self, index: int) -> None:
+        """Display a single frame of the structure file in the viewer."""
+        if not self.model.has_file:
+            return
+        structure = self._get_ase_object_from_file(
+            self.model.structure_file.filename, index=index
+        )
+        if structure:
+            self.model.natoms = len(structure)
+            self.viewer = awb.viewers.StructureDataViewer(structure=structure)
+        elif index > 0:
+            self.viewer = ipw.HTML(f"<p>Could not read frame {index} from file...</p>")
+        else:
+            self.viewer = ipw.HTML("<p>Could not visualise structure from file...</p>")
+        self._update_children()
         return
 
-    def _get_ase_object_from_file(self, fname: str, content: bytes) -> ase.Atoms | None:
-        suffix = "".join(Path(fname).suffixes)
-        with NamedTemporaryFile(suffix=suffix) as tmpf:
-            tmpf.write(content)
-            tmpf.flush()
-            try:
-                structure = ase.io.read(tmpf.name, index=":")[0]
-            except (KeyError, ase.io.formats.UnknownFileTypeError):
-                structure = None
+    def _get_ase_object_from_file(
+        self, fname: str, index: int = 0
+    ) -> "ase.Atoms | None":
+        """
+        Read a single frame from the model's structure file.
+
+        Parameters
+        ----------
+        fname : str
+            The name of the file, used to detect its format.
+        index : int
+            The index of the frame to read, only this frame is parsed.
+
+        Returns
+        -------
+        ase.Atoms or None
+            The structure, or None if the frame could not be read.
+        """
+        from ase.io.formats import UnknownFileTypeError
+
+        try:
+            with (
+                profile("structure.parse", index=index),
+                self._open_structure_file() as handle,
+            ):
+                # The format is detected once per file and reused for each frame
+                structure, self._structure_format = read_structure(
+                    handle, fname, index=index, format=self._structure_format
+                )
+                if handle.seekable():
+                    add_bytes(handle.tell())
+        except (
+            KeyError,
+            IndexError,
+            StopIteration,
+            UnknownFileTypeError,
+        ):
+            structure = None
+        except Exception:
+            # The ASE readers raise all sorts of errors on malformed files,
+            # which should clear the viewer rather than escape the callback
+            LOGGER.warning("Could not read frame %d of %s", index, fname, exc_info=True)
+            structure = None
         return structure
 
+    def _open_structure_file(self) -> BinaryIO:
+        """
+        Open the model's structure file for reading.
+
+        Freshly uploaded files are read straight from the upload widget's buffer,
+        files from the database are streamed from the AiiDA repository, so the
+        file contents are never copied into memory to be parsed.
+        """
+        if self.model.structure_file is self.file_uploader.file:
+            handle = self.file_uploader.get_file_contents()
+            if handle is not None:
+                return handle
+        return self.model.structure_file.open(mode="rb")
+
     def submit_structure(self, _):
         """Submit the structure step."""
         if self.model.has_file or self.model.has_structure:
             self.file_uploader.disable(True)
-            self.database_widget.disable(True)
+            if self.database_widget is not None:
+                self.database_widget.disable(True)
             self.submit_btn.disabled = True
             self.submit_btn.description = "Submitted"
             self.model.submitted = True
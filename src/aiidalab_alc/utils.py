@@ -39,6 +39,27 @@ def get_app_dir() -> pathlib.Path:
     )
 
 
+def get_cache_dir() -> pathlib.Path:
+    """
+    Return the directory used to cache data between app sessions.
+
+    The directory follows the XDG base directory specification, respecting
+    the XDG_CACHE_HOME environment variable if it has been set, and is
+    created if it does not already exist.
+
+    Returns
+    -------
+    pathlib.Path
+        The path to the app's cache directory.
+    """
+    cache_dir = (
+        pathlib.Path(getenv("XDG_CACHE_HOME", pathlib.Path.home() / ".cache"))
+        / "aiidalab-alc"
+    )
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
 def get_chem_shell_params(key: str) -> tuple:
     """
     Return the ChemShell input dictionary keys defined by the aiida-chemshell plugin.
@@ -1,25 +1,10 @@
-"""Module defining the MVC for ChemShell workflow configuration."""
+"""Module defining the views for ChemShell workflow configuration."""
 
 import aiidalab_widgets_base as awb
 import ipywidgets as ipw
-import traitlets as tl
-from aiida.orm import SinglefileData
 
 from aiidalab_alc.common.file_handling import FileUploadWidget
-
-
-class ChemShellWorkflowModel(tl.HasTraits):
-    """The model for setting up a ChemShell workflow."""
-
-    qm_theory = tl.Unicode("NONE", allow_none=False)
-    mm_theory = tl.Unicode("NONE", allow_none=True)
-    qm_region = tl.List([], allow_none=True)
-    basis_quality = tl.Bool(True, allow_none=False)
-    force_field = tl.Instance(SinglefileData, allow_none=True)
-    submitted = tl.Bool(False).tag(sync=True)
-    use_mm = tl.Bool(False).tag(sync=True)
-
-    default_guide = ""
+from aiidalab_alc.models.workflow import ChemShellWorkflowModel
 
 
 class MethodWizardStep(ipw.VBox, awb.WizardAppWidgetStep):
@@ -87,6 +72,11 @@ class MethodWizardStep(ipw.VBox, awb.WizardAppWidgetStep):
             self.options_widget.qm_region_text.value = ""
         except Exception as e:
             raise e
+        try:
+            self.model.sweep = self.options_widget.get_sweep()
+        except ValueError:
+            print("ERROR: Invalid QM regions in the parameter sweep...")
+            return
         if self.model.use_mm:
             if not self.model.force_field:
                 print("ERROR: No force field file found...")
@@ -151,6 +141,34 @@ class ChemShellOptionsWidget(ipw.VBox):
         self.ff_file = FileUploadWidget(description="Force Field:")
         self.ff_file.disable(True)
 
+        # Parameter sweep, selecting more than one value submits a process for
+        # every combination of the selected values.
+        self.sweep_qm_theory = ipw.SelectMultiple(
+            options=self.qm_theory_dropdown.options,
+            description="QM Theories:",
+            layout={"width": "50%"},
+        )
+        self.sweep_basis = ipw.SelectMultiple(
+            options=["fast", "accurate"],
+            description="Basis Qualities:",
+            layout={"width": "50%"},
+        )
+        self.sweep_qm_regions = ipw.Text(
+            value="",
+            placeholder="e.g. 1,2,3; 1,2,3,4,5",
+            description="QM Regions:",
+            layout={"width": "50%"},
+        )
+        self.sweep_box = ipw.Accordion(
+            children=[
+                ipw.VBox(
+                    [self.sweep_qm_theory, self.sweep_basis, self.sweep_qm_regions]
+                )
+            ],
+            selected_index=None,
+        )
+        self.sweep_box.set_title(0, "Parameter Sweep")
+
         self.children = [
             self.qm_theory_dropdown,
             self.qm_basis_dropdown,
@@ -158,6 +176,7 @@ class ChemShellOptionsWidget(ipw.VBox):
             self.mm_theory_dropdown,
             self.qm_region_text,
             self.ff_file,
+            self.sweep_box,
         ]
 
         # self.layout = Layout(margin="auto")
@@ -199,6 +218,37 @@ class ChemShellOptionsWidget(ipw.VBox):
             self.model.basis_quality = True
         return
 
+    def get_sweep(self) -> dict[str, list]:
+        """
+        Get the parameter sweep selected in the widget.
+
+        Returns
+        -------
+        dict[str, list]
+            The values to sweep over keyed by the parameter name, only
+            parameters with values selected are included.
+
+        Raises
+        ------
+        ValueError
+            If the QM regions could not be parsed.
+        """
+        sweep = {}
+        if self.sweep_qm_theory.value:
+            sweep["qm_theory"] = list(self.sweep_qm_theory.value)
+        if self.sweep_basis.value:
+            sweep["basis_quality"] = [
+                quality == "accurate" for quality in self.sweep_basis.value
+            ]
+        qm_regions = [
+            [int(x) for x in region.split(",")]
+            for region in self.sweep_qm_regions.value.split(";")
+            if region.strip()
+        ]
+        if qm_regions:
+            sweep["qm_region"] = qm_regions
+        return sweep
+
     def render(self):
         """Render the options widget contents if not already rendered."""
         if self.rendered:
@@ -211,5 +261,7 @@ class ChemShellOptionsWidget(ipw.VBox):
         """Disable the input fields."""
         for child in self.children:
             child.disabled = val
+        for child in self.sweep_box.children[0].children:
+            child.disabled = val
         self.ff_file.disable(val)
         return
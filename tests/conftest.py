@@ -0,0 +1,25 @@
+"""Shared fixtures for the test suite."""
+
+import pytest
+
+pytest_plugins = ["aiida.tools.pytest_fixtures"]
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keep the app's cache files out of the user's home directory."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
+@pytest.fixture
+def make_file_node():
+    """Return a factory for stored ``SinglefileData`` nodes."""
+    from io import BytesIO
+
+    from aiida.orm import SinglefileData
+
+    def _make_file_node(content: bytes = b"", filename: str = "file.xyz", **kwargs):
+        return SinglefileData(BytesIO(content), filename=filename, **kwargs).store()
+
+    return _make_file_node
@@ -0,0 +1,180 @@
+"""Test the scriptable submission API."""
+
+import subprocess
+import sys
+
+import pytest
+from aiida.orm import Group, SinglefileData, WorkflowNode, load_group
+from click.testing import CliRunner
+
+from aiidalab_alc import api, process
+from aiidalab_alc.cli import cli
+from aiidalab_alc.process import ChemShellProcess
+
+WATER = "3\n\nO 0.0 0.0 0.0\nH 0.757 0.586 0.0\nH -0.757 0.586 0.0\n"
+
+
+@pytest.fixture
+def submitted(aiida_profile_clean, monkeypatch):
+    """Record the parameters and options of each submitted process."""
+    records = []
+
+    def _build_builder(self, parameters, code=None):
+        return {
+            **parameters,
+            "label": self.model.resource_model.process_label,
+            "options": self.model.resource_model.get_options(),
+        }
+
+    def _submit(builder):
+        node = WorkflowNode(label=builder["label"]).store()
+        records.append((builder, node))
+        return node
+
+    monkeypatch.setattr(process, "load_code", lambda _: None)
+    monkeypatch.setattr(process, "submit", _submit)
+    monkeypatch.setattr(ChemShellProcess, "build_builder", _build_builder)
+    return records
+
+
+@pytest.fixture
+def water_file(tmp_path):
+    """Write a water molecule structure file."""
+    path = tmp_path / "water.xyz"
+    path.write_text(WATER)
+    return path
+
+
+def test_convert_option():
+    """Test options given as text are converted to the model's types."""
+    assert api.convert_option("use_mm", "Yes") is True
+    assert api.convert_option("basis_quality", "0") is False
+    assert api.convert_option("qm_region", "1, 2 3") == [1, 2, 3]
+    assert api.convert_option("ncpus", "8") == 8
+    assert api.convert_option("qm_theory", "ORCA") == "ORCA"
+    with pytest.raises(ValueError, match="not true or false"):
+        api.convert_option("use_mm", "maybe")
+    with pytest.raises(ValueError, match="Unknown option"):
+        api.convert_option("qm_theroy", "ORCA")
+
+
+def test_submit(submitted, water_file):
+    """Test a structure file is stored once and submitted with the options."""
+    chemshell = api.submit(
+        str(water_file), "chemshell@localhost", qm_theory="ORCA", ncpus="4", label="w"
+    )
+    builder, node = submitted[0]
+    assert chemshell.node.pk == node.pk
+    assert node.label == "w"
+    assert builder["qm_theory"] == "ORCA"
+    assert builder["options"]["withmpi"]
+    structure = builder["structure"]
+    assert isinstance(structure, SinglefileData) and structure.is_stored
+    assert structure.base.extras.get("formula") == "H2O"
+
+    api.submit(
+        structure.pk, "chemshell@localhost", sweep={"qm_theory": ["ORCA", "NWChem"]}
+    )
+    assert len(submitted) == 3
+    assert api.load_input(str(water_file)).pk == structure.pk
+
+
+def test_load_input_force_field(aiida_profile_clean, tmp_path):
+    """Test structure metadata is only stored for structure files."""
+    path = tmp_path / "water.xyz"
+    path.write_text(WATER)
+    force_field = api.load_input(str(path), description="Force field")
+    assert force_field.is_stored and force_field.description == "Force field"
+    assert "formula" not in force_field.base.extras.all
+
+
+def test_submit_validation(submitted, water_file):
+    """Test the app's validation errors are raised and nothing is submitted."""
+    with pytest.raises(ValueError, match="No code selected"):
+        api.submit(water_file, "")
+    with pytest.raises(ValueError, match="No force field provided"):
+        api.submit(water_file, "chemshell@localhost", use_mm=True, qm_region=[1])
+    assert not submitted
+
+
+MANIFESTS = {
+    "jobs.csv": (
+        "structure,code,qm_theory,use_mm,group\n"
+        "{path},chemshell@localhost,ORCA,false,batch\n"
+        ",chemshell@localhost,ORCA,,\n"
+        "{path},,NWChem,no,batch\n"
+    ),
+    "jobs.yaml": (
+        "- {{structure: {path}, code: chemshell@localhost, qm_theory: ORCA,"
+        " group: batch}}\n"
+        "- {{code: chemshell@localhost, qm_theory: ORCA}}\n"
+        "---\n"
+        "{{structure: {path}, qm_theory: NWChem, use_mm: false, group: batch}}\n"
+    ),
+}
+
+
+@pytest.mark.parametrize("filename", MANIFESTS)
+def test_submit_manifest(submitted, water_file, tmp_path, filename):
+    """Test each job of a manifest is submitted, skipping failed jobs."""
+    path = tmp_path / filename
+    path.write_text(MANIFESTS[filename].format(path=water_file))
+    reported = []
+    results = api.submit_manifest(path, callback=reported.append, code="default")
+
+    assert results == reported
+    assert [result.ok for result in results] == [True, False, True]
+    assert results[1].error == "No structure provided."
+    assert [builder["qm_theory"] for builder, _ in submitted] == ["ORCA", "NWChem"]
+    assert submitted[0][0]["structure"].pk == submitted[1][0]["structure"].pk
+    group = load_group("batch")
+    assert {node.pk for node in group.nodes} == {
+        pk for result in results[::2] for pk in result.pks
+    }
+
+    results = api.submit_manifest(path, fail_fast=True)
+    assert len(results) == 2
+
+
+def test_submit_manifest_sweep(submitted, water_file, tmp_path):
+    """Test every process of a job's sweep is added to its group and reported."""
+    path = tmp_path / "jobs.yaml"
+    path.write_text(
+        f"- {{structure: {water_file}, code: chemshell@localhost, group: batch,"
+        " sweep: {qm_theory: [ORCA, NWChem]}}\n"
+    )
+    (result,) = api.submit_manifest(path)
+
+    assert result.ok
+    assert result.pks == tuple(node.pk for _, node in submitted)
+    assert len(result.pks) == 2
+    assert {node.pk for node in load_group("batch").nodes} == set(result.pks)
+
+
+def test_submit_command(submitted, water_file, tmp_path, aiida_profile_clean):
+    """Test the submit command reports each job and fails if any job does."""
+    path = tmp_path / "jobs.csv"
+    path.write_text(f"structure,label\n{water_file},a\nmissing.xyz,b\n")
+    result = CliRunner().invoke(
+        cli,
+        ["--profile", aiida_profile_clean.name, "submit", str(path)]
+        + ["--code", "chemshell@localhost", "--group", "cron"],
+    )
+    assert result.exit_code == 1
+    assert f"Job 1: submitted PK {submitted[0][1].pk}" in result.output
+    assert "Job 2: failed: No file or node found for 'missing.xyz'" in result.output
+    assert "Submitted 1 of 2 jobs" in result.output
+    assert len(Group.collection.get(label="cron").nodes) == 1
+
+
+def test_api_does_not_import_widgets():
+    """Test the API can be used without importing any widgets."""
+    code = (
+        "import sys, aiidalab_alc.api, aiidalab_alc.cli;"
+        "print(any(m.split('.')[0] in ('ipywidgets', 'aiidalab_widgets_base')"
+        " for m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "False"
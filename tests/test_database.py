@@ -0,0 +1,292 @@
+"""Test the AiiDA database search widget."""
+
+import asyncio
+import threading
+from collections import Counter
+
+import pytest
+from aiida.common.links import LinkType
+from aiida.orm import CalcJobNode, Data, QueryBuilder, SinglefileData
+
+from aiidalab_alc.common.database import AiiDADatabaseWidget
+from aiidalab_alc.common.queries import (
+    ProcessLabelIndex,
+    count_by_input_label,
+    count_by_projections,
+    exclude_nodes_with_incoming,
+    parse_elements,
+)
+
+
+@pytest.fixture
+def uploaded_nodes(aiida_profile_clean, make_file_node):
+    """Store a set of file nodes with no provenance."""
+    return [make_file_node(f"{i}".encode(), label=f"file{i}") for i in range(5)]
+
+
+@pytest.fixture
+def calculated_node(make_file_node):
+    """Store a file node created by a process."""
+    calc = CalcJobNode(label="relax")
+    calc.base.links.add_incoming(
+        make_file_node(b"input"), LinkType.INPUT_CALC, "structure"
+    )
+    calc.store()
+    output = SinglefileData.from_string("output", filename="output.xyz")
+    output.base.links.add_incoming(calc, LinkType.CREATE, "structure")
+    return output.store()
+
+
+def test_search_window(uploaded_nodes):
+    """Test that only the visible window of matches is fetched, newest first."""
+    widget = AiiDADatabaseWidget(query=[SinglefileData], page_size=2, debounce=0)
+    widget.wait()
+    assert widget.results.total == 5
+    assert (
+        widget.results.visible_keys() == [node.pk for node in uploaded_nodes[-2:]][::-1]
+    )
+    assert len(widget.results.body.options) == 2
+
+    widget.results.next_btn.click()
+    widget.results.next_btn.click()
+    assert widget.results.visible_keys() == [uploaded_nodes[1].pk, uploaded_nodes[0].pk]
+    assert widget.results.next_btn.disabled
+    assert widget.results.info.value == "<p>Rows 4-5 of 5</p>"
+
+    assert not widget.results.scrollbar.continuous_update
+    widget.results.scrollbar.value = widget.results.scrollbar.max
+    assert widget.results.offset == 0
+    assert widget.results.prev_btn.disabled
+
+
+def test_search_sorting(structure_files):
+    """Test the matches are sorted by the database on the chosen column."""
+    widget = AiiDADatabaseWidget(query=[SinglefileData], page_size=2, debounce=0)
+    # Backends differ in where they sort missing metadata, so it is excluded
+    widget.min_atoms_widget.value = 1
+    widget.wait()
+    widget.results.sort("natoms")
+    assert widget.results.visible_keys() == [
+        structure_files["cuprite"].pk,
+        structure_files["copper"].pk,
+    ]
+    widget.results.sort("natoms")
+    assert widget.results.visible_keys() == [
+        structure_files["water"].pk,
+        structure_files["copper"].pk,
+    ]
+    widget.results.sort("formula")
+    widget.results.scroll_to(1)
+    assert widget.results.visible_keys() == [
+        structure_files["cuprite"].pk,
+        structure_files["copper"].pk,
+    ]
+
+    # A new search keeps the sort order
+    widget.max_atoms_widget.value = 4
+    widget.wait()
+    assert widget.results.offset == 0
+    assert widget.results.visible_keys() == [
+        structure_files["water"].pk,
+        structure_files["copper"].pk,
+    ]
+
+
+def test_select_loads_node(uploaded_nodes):
+    """Test that the node is only loaded once a match is selected."""
+    widget = AiiDADatabaseWidget(query=[SinglefileData], debounce=0)
+    widget.wait()
+    assert widget.data_object is None
+    widget.results.value = uploaded_nodes[0].pk
+    assert widget.data_object.uuid == uploaded_nodes[0].uuid
+    assert widget.results.body.value == uploaded_nodes[0].pk
+
+
+@pytest.mark.parametrize(
+    ("mode", "expected"), [("all", 7), ("uploaded", 6), ("calculated", 1)]
+)
+def test_search_modes(uploaded_nodes, calculated_node, mode, expected):
+    """Test the number of matches found by each search mode."""
+    widget = AiiDADatabaseWidget(query=[SinglefileData], debounce=0)
+    widget.mode.value = mode
+    widget.wait()
+    assert widget.results.total == expected
+
+
+def test_uploaded_window(uploaded_nodes, calculated_node):
+    """Test that the uploaded mode anti-join can be scrolled through."""
+    widget = AiiDADatabaseWidget(query=[SinglefileData], page_size=4, debounce=0)
+    widget.mode.value = "uploaded"
+    widget.wait()
+    pks = widget.results.visible_keys()
+    widget.results.scroll_to(4)
+    pks += widget.results.visible_keys()[2:]
+    assert len(pks) == len(set(pks)) == 6
+    assert calculated_node.pk not in pks
+
+
+@pytest.mark.parametrize("mode", ["all", "uploaded"])
+def test_selection(uploaded_nodes, mode):
+    """Test nodes are added to the selection singly or for every match."""
+    widget = AiiDADatabaseWidget(query=[SinglefileData], page_size=2, debounce=0)
+    widget.mode.value = mode
+    widget.wait()
+    widget.results.value = uploaded_nodes[-1].pk
+    assert [node.pk for node in widget.data_objects] == [uploaded_nodes[-1].pk]
+
+    widget.add_selected()
+    widget.add_all()
+    pks = [node.pk for node in widget.data_objects]
+    assert pks[0] == uploaded_nodes[-1].pk
+    assert sorted(pks) == sorted(node.pk for node in uploaded_nodes)
+
+    widget.clear_selection()
+    assert [node.pk for node in widget.data_objects] == [uploaded_nodes[-1].pk]
+
+
+def test_superseded_search(uploaded_nodes):
+    """Test that rapid changes to the search settings only run the last search."""
+    widget = AiiDADatabaseWidget(query=[SinglefileData], debounce=0.2)
+    for mode in ("uploaded", "calculated", "all", "uploaded"):
+        widget.mode.value = mode
+    widget.wait()
+    assert widget._uploaded_only
+    assert widget.results.total == 5
+    assert widget.status.value == ""
+
+
+def test_search_results_shown_on_event_loop(uploaded_nodes):
+    """Test background search results are shown on the event loop's thread."""
+    threads = []
+
+    async def main():
+        widget = AiiDADatabaseWidget(query=[SinglefileData], debounce=0)
+        widget.results.observe(
+            lambda _: threads.append(threading.current_thread()), "total"
+        )
+        for _ in range(500):
+            if widget.results.total:
+                break
+            await asyncio.sleep(0.01)
+        return widget
+
+    widget = asyncio.run(main())
+    assert widget.results.total == 5
+    assert threads == [threading.current_thread()]
+
+
+def test_failed_search(uploaded_nodes, monkeypatch, caplog):
+    """Test a failed background search is logged and reported."""
+    widget = AiiDADatabaseWidget(query=[SinglefileData], debounce=0)
+    widget.wait()
+
+    def _fail(*_):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(widget, "_iter_page", _fail)
+    widget.schedule_search()
+    widget.wait()
+    assert "Search failed: database is locked" in widget.status.value
+    assert "Database search failed" in caplog.text
+    assert widget.results.total == 5
+
+
+def test_process_label_index(aiida_profile_clean, tmp_path):
+    """Test the process label index is refreshed incrementally and persisted."""
+    path = tmp_path / "labels.json"
+    CalcJobNode(label="relax").store()
+    index = ProcessLabelIndex(path)
+    assert index.refresh() == {"relax"}
+
+    latest = CalcJobNode(label="scan").store()
+    CalcJobNode(label="relax").store()
+    assert index.refresh() == {"relax", "scan"}
+    assert index.max_pk == latest.pk + 1
+
+    cached = ProcessLabelIndex(path)
+    assert cached.labels == {"relax", "scan"}
+    assert cached.max_pk == index.max_pk
+
+
+# The query helpers build on the storage backend's private query generation,
+# which is not covered by AiiDA's API, so these tests check it directly.
+
+
+def test_exclude_nodes_with_incoming(uploaded_nodes, calculated_node):
+    """Test nodes with incoming links are excluded from the generated query."""
+    qbuild = QueryBuilder().append(SinglefileData, tag="structures", project="id")
+    pks = {pk for (pk,) in exclude_nodes_with_incoming(qbuild, "structures")}
+    assert {node.pk for node in uploaded_nodes} < pks
+    assert calculated_node.pk not in pks
+    assert len(pks) == qbuild.count() - 1
+
+
+def test_count_by_projections(aiida_profile_clean):
+    """Test rows are counted by their projected values."""
+    for label in ("relax", "relax", "scan"):
+        CalcJobNode(label=label).store()
+    qbuild = QueryBuilder().append(CalcJobNode, project="label")
+    assert count_by_projections(qbuild) == Counter({("relax",): 2, ("scan",): 1})
+
+
+def test_count_by_input_label(aiida_profile_clean):
+    """Test rows are counted by the label of an input, keeping those without."""
+    code = Data(label="chemshell@localhost").store()
+    other = Data(label="water").store()
+    for source, link_label in ((code, "code"), (other, "structure"), (None, None)):
+        calc = CalcJobNode(label="relax")
+        if source is not None:
+            calc.base.links.add_incoming(source, LinkType.INPUT_CALC, link_label)
+        calc.store()
+    qbuild = QueryBuilder().append(CalcJobNode, tag="process", project="label")
+    assert count_by_input_label(qbuild, "process", "code") == Counter(
+        {("relax", "chemshell@localhost"): 1, ("relax", None): 2}
+    )
+
+
+@pytest.fixture
+def structure_files(aiida_profile_clean, make_file_node):
+    """Store structure files with their metadata extras, and one without."""
+    metadata = {
+        "water": {"formula": "H2O", "elements": ["H", "O"], "natoms": 3},
+        "copper": {"formula": "Cu4", "elements": ["Cu"], "natoms": 4},
+        "cuprite": {"formula": "Cu4O2", "elements": ["Cu", "O"], "natoms": 6},
+    }
+    nodes = {}
+    for label, extras in metadata.items():
+        node = make_file_node(label.encode(), label=label)
+        node.base.extras.set_many({"periodic": "Cu" in extras["elements"], **extras})
+        nodes[label] = node
+    nodes["notes"] = make_file_node(b"notes", label="notes")
+    return nodes
+
+
+def test_parse_elements():
+    """Test element symbols are parsed from free text."""
+    assert parse_elements("h, CU  o") == ["H", "Cu", "O"]
+    assert parse_elements(" ") == []
+
+
+@pytest.mark.parametrize(
+    ("settings", "expected"),
+    [
+        ({}, {"water", "copper", "cuprite", "notes"}),
+        ({"formula_widget": "cu4*"}, {"copper", "cuprite"}),
+        ({"formula_widget": "h2o"}, {"water"}),
+        ({"include_widget": "Cu, O"}, {"cuprite"}),
+        ({"exclude_widget": "h"}, {"copper", "cuprite"}),
+        ({"include_widget": "O", "exclude_widget": "Cu"}, {"water"}),
+        ({"min_atoms_widget": 4}, {"copper", "cuprite"}),
+        ({"min_atoms_widget": 4, "max_atoms_widget": 5}, {"copper"}),
+        ({"periodic_widget": False}, {"water"}),
+        ({"periodic_widget": True, "mode": "uploaded"}, {"copper", "cuprite"}),
+    ],
+)
+def test_metadata_filters(structure_files, settings, expected):
+    """Test the metadata filters are combined with each other and the mode."""
+    widget = AiiDADatabaseWidget(query=[SinglefileData], debounce=0)
+    for name, value in settings.items():
+        getattr(widget, name).value = value
+    widget.wait()
+    pks = set(widget.results.visible_keys())
+    assert pks == {structure_files[label].pk for label in expected}
@@ -0,0 +1,223 @@
+"""Test the file handling utilities."""
+
+import io
+import tarfile
+import zipfile
+
+import ase
+import pytest
+from aiida.orm import SinglefileData
+from ase.build import molecule
+from ase.io.formats import UnknownFileTypeError
+from click.testing import CliRunner
+
+from aiidalab_alc.cli import cli
+from aiidalab_alc.common.file_handling import FileUploadWidget
+from aiidalab_alc.common.files import (
+    CONTENT_HASH_EXTRA,
+    backfill_structure_metadata,
+    hash_file,
+    is_archive,
+    open_buffer,
+    read_structure,
+)
+from aiidalab_alc.models.structure import StructureStepModel
+from aiidalab_alc.structure import StructureWizardStep
+
+
+@pytest.fixture
+def trajectory() -> list[ase.Atoms]:
+    """Return a short trajectory of water molecules."""
+    frames = []
+    for i in range(5):
+        atoms = molecule("H2O")
+        atoms.positions[0, 2] += 0.1 * i
+        frames.append(atoms)
+    return frames
+
+
+def _write(frames: list[ase.Atoms], format: str) -> bytes:
+    buffer = io.BytesIO()
+    if format in ("traj", "cif"):
+        ase.io.write(buffer, frames, format=format)
+        return buffer.getvalue()
+    text = io.StringIO()
+    ase.io.write(text, frames, format=format)
+    return text.getvalue().encode()
+
+
+def test_buffer_reader():
+    """Test the buffer reader serves reads and seeks from a memoryview."""
+    handle = open_buffer(memoryview(b"0123456789"))
+    assert handle.read(4) == b"0123"
+    handle.seek(-2, io.SEEK_END)
+    assert handle.read() == b"89"
+    handle.seek(0)
+    assert handle.read() == b"0123456789"
+
+
+@pytest.mark.parametrize(
+    ("filename", "format"), [("traj.xyz", "extxyz"), ("traj.traj", "traj")]
+)
+def test_read_structure_frame(trajectory, filename, format):
+    """Test that a single, selected frame is read from an in-memory buffer."""
+    content = _write(trajectory, format)
+    atoms, detected = read_structure(open_buffer(content), filename, index=3)
+    assert detected == format
+    assert atoms.positions[0, 2] == pytest.approx(trajectory[3].positions[0, 2])
+
+
+def test_read_structure_unknown_format():
+    """Test that unrecognised files raise an ASE error."""
+    with pytest.raises(UnknownFileTypeError):
+        read_structure(open_buffer(b"not a structure"), "structure")
+
+
+def test_upload_reuses_identical_file(aiida_profile_clean):
+    """Test that re-uploading a stored file reuses the existing node."""
+    widget = FileUploadWidget()
+    widget.file_dict = {"metadata": {"name": "water.xyz"}, "content": b"water"}
+    node = widget.get_aiida_file_object()
+    assert not widget.reused
+    assert node.base.extras.get(CONTENT_HASH_EXTRA) == hash_file(io.BytesIO(b"water"))
+    node.store()
+
+    widget.file_dict = {"metadata": {"name": "copy.xyz"}, "content": b"water"}
+    assert widget.get_aiida_file_object().uuid == node.uuid
+    assert widget.reused
+
+    widget.file_dict = {"metadata": {"name": "ice.xyz"}, "content": b"ice"}
+    assert not widget.get_aiida_file_object().is_stored
+
+
+def test_server_file(aiida_profile_clean, tmp_path):
+    """Test that a file on the server is streamed into a file node."""
+    path = tmp_path / "water.xyz"
+    path.write_bytes(b"water" * 1000)
+    widget = FileUploadWidget()
+    widget.chunk_size = 1024
+    widget.server_path.value = str(path)
+    widget.server_file_btn.click()
+    assert widget.file.filename == "water.xyz"
+    assert widget.file.get_content(mode="rb") == path.read_bytes()
+    assert widget.progress.value == 1.0
+
+
+def _archive(filename: str, members: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    if filename.endswith(".zip"):
+        with zipfile.ZipFile(buffer, "w") as archive:
+            for name, content in members.items():
+                archive.writestr(name, content)
+    else:
+        with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+            for name, content in members.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                archive.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+def test_is_archive():
+    """Test archives are recognised by their file names."""
+    assert is_archive("structures.zip")
+    assert is_archive("structures.tar.gz")
+    assert is_archive("structures.TGZ")
+    assert not is_archive("structure.xyz.gz")
+    assert not is_archive("structure.xyz")
+
+
+@pytest.mark.parametrize("filename", ["structures.zip", "structures.tar.gz"])
+def test_upload_archive(aiida_profile_clean, make_file_node, filename):
+    """Test that uploaded archives are unpacked into a node per member."""
+    existing = make_file_node(b"water", filename="water.xyz")
+    existing.base.extras.set(CONTENT_HASH_EXTRA, hash_file(io.BytesIO(b"water")))
+    content = _archive(
+        filename,
+        {"set/a.xyz": b"water", "set/b.xyz": b"ice", ".hidden": b"", "c.xyz": b"c"},
+    )
+    widget = FileUploadWidget(multiple=True)
+    widget.file_dicts = [
+        {"metadata": {"name": filename}, "content": content},
+        {"metadata": {"name": "d.xyz"}, "content": b"d"},
+    ]
+    widget._update_file()
+    assert [node.filename for node in widget.files] == [
+        "water.xyz",
+        "b.xyz",
+        "c.xyz",
+        "d.xyz",
+    ]
+    assert widget.files[0].uuid == existing.uuid
+    assert widget.files[1].get_content(mode="rb") == b"ice"
+    assert widget.file is widget.files[0]
+    assert widget.get_file_contents() is None
+    assert "4 files (1 reused)" in widget.status.value
+
+
+def test_upload_metadata(aiida_profile_clean):
+    """Test that the metadata of an uploaded structure is stored as extras."""
+    widget = FileUploadWidget(structures=True)
+    widget.file_dict = {
+        "metadata": {"name": "water.xyz"},
+        "content": _write([molecule("H2O")], "xyz"),
+    }
+    extras = widget.get_aiida_file_object().base.extras.all
+    assert extras["formula"] == "H2O"
+    assert extras["natoms"] == 3
+    assert extras["elements"] == ["H", "O"]
+    assert not extras["periodic"]
+    assert extras["volume"] is None
+    assert extras["format"] in ("xyz", "extxyz")
+
+    bulk = ase.build.bulk("Cu", cubic=True)
+    widget.file_dict = {
+        "metadata": {"name": "cu.cif"},
+        "content": _write([bulk], "cif"),
+    }
+    extras = widget.get_aiida_file_object().base.extras.all
+    assert extras["formula"] == "Cu4"
+    assert extras["periodic"]
+    assert extras["volume"] == pytest.approx(bulk.get_volume())
+
+    widget.file_dict = {"metadata": {"name": "notes.txt"}, "content": b"notes"}
+    assert widget.get_aiida_file_object().base.extras.get("format") is None
+
+    force_field = FileUploadWidget(description="Force Field:")
+    force_field.file_dict = widget.file_dict
+    extras = force_field.get_aiida_file_object().base.extras.all
+    assert list(extras) == [CONTENT_HASH_EXTRA]
+
+
+def test_backfill_metadata(aiida_profile_clean, make_file_node):
+    """Test the metadata of files stored without it is backfilled once."""
+    water = make_file_node(_write([molecule("H2O")], "xyz"), filename="water.xyz")
+    notes = make_file_node(b"notes", filename="notes.txt")
+    progress = []
+    nfiles = backfill_structure_metadata(
+        batch_size=1, callback=lambda ndone, total: progress.append((ndone, total))
+    )
+    assert nfiles == 2
+    assert progress == [(1, 2), (2, 2)]
+    assert water.base.extras.get("formula") == "H2O"
+    assert notes.base.extras.get("format", "missing") is None
+    assert backfill_structure_metadata() == 0
+
+    make_file_node(_write([molecule("CH4")], "xyz"), filename="methane.xyz")
+    result = CliRunner().invoke(
+        cli, ["--profile", aiida_profile_clean.name, "backfill-metadata"]
+    )
+    assert result.exit_code == 0, result.output
+    assert "Stored the metadata of 1 files" in result.output
+
+
+@pytest.mark.parametrize(
+    "content", [b"3\n\nO 0 0 x\nH 0 0 0\nH 1 0 0\n", b"2\n\nO 0 0 0\n"]
+)
+def test_unreadable_structure_clears_viewer(aiida_profile, content, caplog):
+    """Test a malformed structure file clears the viewer instead of raising."""
+    step = StructureWizardStep(StructureStepModel())
+    step.render()
+    step.model.structure_file = SinglefileData(io.BytesIO(content), filename="s.xyz")
+    assert "Could not visualise" in step.viewer.value
+    assert "Could not read frame 0 of s.xyz" in caplog.text
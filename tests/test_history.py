@@ -0,0 +1,125 @@
+"""Test the calculation history page."""
+
+import pytest
+from aiida.common.links import LinkType
+from aiida.orm import CalcJobNode, InstalledCode
+
+from aiidalab_alc.history import (
+    CHEMSHELL_PROCESS_TYPE,
+    HistoryModel,
+    HistoryView,
+    classify_state,
+)
+
+# (label, process state, exit status) of the stored calculations
+CALCULATIONS = [
+    ("opt-a", "finished", 0),
+    ("opt-b", "finished", 1),
+    ("opt-c", "excepted", None),
+    ("opt-d", "running", None),
+    ("opt-e", "finished", 0),
+]
+
+
+@pytest.fixture
+def calculations(aiida_profile_clean, aiida_localhost):
+    """Store ChemShell calculations on two codes and another calculation."""
+    codes = [
+        InstalledCode(
+            label=label, computer=aiida_localhost, filepath_executable="/bin/true"
+        ).store()
+        for label in ("chemsh-a", "chemsh-b")
+    ]
+    nodes = []
+    for i, (label, state, exit_status) in enumerate(CALCULATIONS):
+        calc = CalcJobNode(
+            label=label, computer=aiida_localhost, process_type=CHEMSHELL_PROCESS_TYPE
+        )
+        calc.set_process_state(state)
+        if exit_status is not None:
+            calc.set_exit_status(exit_status)
+        calc.base.links.add_incoming(codes[i % 2], LinkType.INPUT_CALC, "code")
+        nodes.append(calc.store())
+    other = CalcJobNode(computer=aiida_localhost, process_type="aiida.calculations:x")
+    other.base.links.add_incoming(codes[0], LinkType.INPUT_CALC, "code")
+    other.store()
+    return nodes
+
+
+def test_classify_state():
+    """Test calculations are classified by their state and exit status."""
+    assert classify_state("waiting", None) == "running"
+    assert classify_state("finished", 0) == "finished"
+    assert classify_state("finished", 300) == "failed"
+    assert classify_state("killed", None) == "failed"
+
+
+def test_paging_and_sorting(calculations):
+    """Test a page of calculations is projected in the chosen order."""
+    model = HistoryModel(page_size=2)
+    model.refresh()
+    assert model.total == 5
+    assert model.npages == 3
+    assert [row.label for row in model.rows] == ["opt-e", "opt-d"]
+    assert model.rows[0].code == "chemsh-a"
+    assert model.rows[0].computer == "localhost"
+
+    model.page = 2
+    assert [row.label for row in model.rows] == ["opt-a"]
+
+    with model.hold_trait_notifications():
+        model.page = 0
+        model.sort_by = "label"
+        model.ascending = True
+    assert [row.label for row in model.rows] == ["opt-a", "opt-b"]
+
+    model.sort_by = "state"
+    assert [row.state for row in model.rows] == ["excepted", "finished"]
+
+
+def test_counts(calculations):
+    """Test the calculations are counted by state per code and computer."""
+    model = HistoryModel()
+    model.refresh()
+    assert model.counts == {
+        "chemsh-a": {"running": 0, "finished": 2, "failed": 1},
+        "chemsh-b": {"running": 1, "finished": 0, "failed": 1},
+    }
+    model.group_by = "computer"
+    assert model.counts == {"localhost": {"running": 1, "finished": 2, "failed": 2}}
+
+
+def test_open_results(calculations):
+    """Test the results are only loaded once a calculation is opened."""
+    model = HistoryModel()
+    view = HistoryView(model)
+    model.refresh()
+    assert len(view.processes.options) == 6
+    assert view.results_model is None
+
+    view.processes.value = calculations[0].uuid
+    assert view.results_model.process_uuid == calculations[0].uuid
+    assert view.results_model.process.pk == calculations[0].pk
+    view.processes.value = calculations[1].uuid
+    assert view.results_model.process.pk == calculations[1].pk
+
+    monitor = view.results_step.monitor
+    view.close()
+    assert view.results_step.monitor is None
+    assert not monitor.is_running
+
+
+def test_calculation_without_code(calculations, aiida_localhost):
+    """Test a calculation without a code is still listed and counted."""
+    calc = CalcJobNode(
+        label="opt-f", computer=aiida_localhost, process_type=CHEMSHELL_PROCESS_TYPE
+    )
+    calc.set_process_state("finished")
+    calc.set_exit_status(0)
+    calc.store()
+    model = HistoryModel()
+    model.refresh()
+    assert model.total == 6
+    assert model.rows[0].label == "opt-f"
+    assert model.rows[0].code is None
+    assert model.counts["unknown"] == {"running": 0, "finished": 1, "failed": 0}
@@ -0,0 +1,289 @@
+"""Test the submission of ChemShell processes."""
+
+import asyncio
+from io import BytesIO
+
+import pytest
+from aiida.common import AttributeDict
+from aiida.orm import Dict, SinglefileData, WorkflowNode
+from plumpy import ProcessState
+
+from aiidalab_alc import process
+from aiidalab_alc.models.results import ResultsModel
+from aiidalab_alc.models.workflow import ChemShellWorkflowModel
+from aiidalab_alc.process import (
+    ChemShellProcess,
+    MainAppModel,
+    expand_sweep,
+    job_fingerprint,
+    run_steps,
+)
+from aiidalab_alc.workflow import ChemShellOptionsWidget
+
+
+def test_expand_sweep():
+    """Test sweeps expand to the cartesian product or the explicit sets."""
+    sweep = {"qm_theory": ["NWChem", "ORCA"], "basis_quality": [True, False]}
+    assert expand_sweep(sweep) == [
+        {"qm_theory": "NWChem", "basis_quality": True},
+        {"qm_theory": "NWChem", "basis_quality": False},
+        {"qm_theory": "ORCA", "basis_quality": True},
+        {"qm_theory": "ORCA", "basis_quality": False},
+    ]
+    explicit = [{"qm_theory": "NWChem"}, {"qm_theory": "ORCA", "use_mm": True}]
+    assert expand_sweep(explicit) == explicit
+    assert expand_sweep({}) == [{}]
+
+
+@pytest.fixture
+def sweep_process(aiida_profile, monkeypatch):
+    """Return a process whose builders and submissions are recorded."""
+    submitted = []
+
+    def _submit(parameters):
+        node = WorkflowNode(label=parameters["qm_theory"]).store()
+        submitted.append((parameters, node))
+        return node
+
+    monkeypatch.setattr(process, "load_code", lambda _: None)
+    monkeypatch.setattr(process, "submit", _submit)
+    monkeypatch.setattr(
+        ChemShellProcess, "build_builder", lambda self, params, code=None: params
+    )
+    model = MainAppModel()
+    model.structure_model.structure_file = SinglefileData(
+        BytesIO(b"1\n\nH 0 0 0\n"), filename="h.xyz"
+    )
+    chemshell = ChemShellProcess(model)
+    chemshell.submitted = submitted
+    return chemshell
+
+
+def test_submit_sweep(sweep_process):
+    """Test a sweep submits every parameter set into a new group."""
+    sweep = {"qm_theory": ["NWChem", "ORCA", "GAMESS-UK"], "basis_quality": [True]}
+    group = sweep_process.submit_sweep(sweep, group_label="sweep")
+
+    assert group.label == "sweep"
+    assert len(sweep_process.submitted) == 3
+    assert {node.pk for node in group.nodes} == {
+        node.pk for _, node in sweep_process.submitted
+    }
+    structures = {id(params["structure"]) for params, _ in sweep_process.submitted}
+    assert len(structures) == 1
+    assert sweep_process.model.structure_model.structure_file.is_stored
+    assert sweep_process.node is not None
+
+    results = ResultsModel(group_uuid=group.uuid)
+    labels = [label for label, _ in results.group_processes()]
+    assert len(labels) == 3
+    assert all(
+        "NWChem" in label or "ORCA" in label or "GAMESS" in label for label in labels
+    )
+
+
+def test_submit_sweep_unknown_parameter(sweep_process):
+    """Test a sweep over an unknown parameter submits nothing."""
+    with pytest.raises(ValueError, match="Unknown sweep parameters"):
+        sweep_process.submit_sweep({"qm_theroy": ["NWChem"]})
+    assert not sweep_process.submitted
+
+
+def test_submit_empty_sweep(sweep_process):
+    """Test a sweep with no parameter sets submits nothing."""
+    with pytest.raises(ValueError, match="no parameter sets"):
+        sweep_process.submit_sweep({"qm_region": []})
+    assert not sweep_process.submitted
+
+
+@pytest.mark.parametrize("regions", [";", " ; ", ""])
+def test_options_sweep_without_regions(aiida_profile, regions):
+    """Test QM regions with no values are left out of the widget's sweep."""
+    widget = ChemShellOptionsWidget(ChemShellWorkflowModel())
+    widget.sweep_qm_regions.value = regions
+    assert widget.get_sweep() == {}
+    widget.sweep_qm_regions.value = "1,2; 3"
+    assert widget.get_sweep() == {"qm_region": [[1, 2], [3]]}
+
+
+def test_sweep_over_structures(sweep_process, make_file_node):
+    """Test a process is submitted for each selected structure."""
+    structures = [make_file_node(f"{i}".encode()) for i in range(3)]
+    model = sweep_process.model
+    model.structure_model.structures = structures
+    assert model.structure_model.structure_file.uuid == structures[0].uuid
+
+    model.workflow_model.sweep = {"qm_theory": ["NWChem", "ORCA"]}
+    group = sweep_process.submit_sweep(sweep_process.get_sweep())
+    assert len(group.nodes) == 6
+    submitted = [params["structure"].uuid for params, _ in sweep_process.submitted]
+    assert set(submitted) == {node.uuid for node in structures}
+
+    model.workflow_model.sweep = {}
+    assert sweep_process.get_sweep() == {"structure": structures}
+    model.structure_model.structures = structures[:1]
+    assert sweep_process.get_sweep() == {}
+
+
+def test_submission_stages(sweep_process):
+    """Test submission reports its stages and hands the process to the results."""
+    model = sweep_process.model
+    stages = []
+    model.observe(lambda change: stages.append(change["new"]), "submission_stage")
+    model.resource_model.code_label = "chemshell@localhost"
+    model.resource_model.submitted = True
+
+    assert stages == [
+        "validating",
+        "storing inputs",
+        "building",
+        "submitting",
+        "submitted",
+    ]
+    assert model.submission_error is None
+    assert model.submission_progress == 1.0
+    assert model.resource_model.submission_stage == "submitted"
+    assert not model.block_results
+    assert model.results_model.process_uuid == model.process.node.uuid
+    assert model.results_model.group_uuid is None
+
+
+def test_iter_submit_steps(sweep_process):
+    """Test submission yields after each input stored and each process."""
+    steps = list(sweep_process.iter_submit({"qm_theory": ["NWChem", "ORCA"]}))
+    assert steps == [
+        ("storing inputs", 0, 1),
+        ("storing inputs", 1, 1),
+        ("building", 1, 2),
+        ("building", 2, 2),
+        ("submitting", 1, 2),
+        ("submitting", 2, 2),
+        ("submitted", 2, 2),
+    ]
+
+
+def test_submission_failure(sweep_process):
+    """Test a failed submission is reported and may be resubmitted."""
+    model = sweep_process.model
+    model.resource_model.submitted = True
+    assert model.submission_stage == "failed"
+    assert model.resource_model.submission_error == "No code selected."
+    assert not model.resource_model.submitted
+    assert not sweep_process.submitted
+
+
+def test_submission_without_processes(sweep_process, monkeypatch):
+    """Test a submission that submits nothing is reported as a failure."""
+    monkeypatch.setattr(
+        ChemShellProcess, "iter_submit", lambda *_: iter([("submitted", 0, 0)])
+    )
+    model = sweep_process.model
+    model.resource_model.code_label = "chemshell@localhost"
+    model.resource_model.submitted = True
+    assert model.submission_stage == "failed"
+    assert model.submission_error == "No processes were submitted."
+    assert not model.resource_model.submitted
+    assert not model.submitting
+    assert model.block_results
+
+
+def test_run_steps_yields_to_event_loop():
+    """Test steps are interleaved with other callbacks on a running loop."""
+    events = []
+
+    def steps():
+        for i in range(3):
+            events.append(f"step {i}")
+            yield
+
+    async def main():
+        run_steps(steps())
+        events.append("scheduled")
+        await asyncio.sleep(0)
+        events.append("other")
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert events[0] == "scheduled"
+    assert events.index("other") < events.index("step 2")
+    assert events.count("step 2") == 1
+
+
+def test_job_fingerprint(aiida_profile, make_file_node):
+    """Test fingerprints depend on the input contents rather than the nodes."""
+    first = {
+        "structure": make_file_node(b"water", filename="a.xyz"),
+        "parameters": Dict({"theory": "NWChem"}),
+        "metadata": {"label": "first"},
+    }
+    second = {
+        "structure": SinglefileData(BytesIO(b"water"), filename="b.xyz"),
+        "parameters": Dict({"theory": "NWChem"}).store(),
+        "metadata": {"label": "second"},
+    }
+    assert job_fingerprint(first) == job_fingerprint(second)
+    second["parameters"] = Dict({"theory": "ORCA"})
+    assert job_fingerprint(first) != job_fingerprint(second)
+
+
+def test_reuse_finished_process(sweep_process):
+    """Test identical finished processes are reused instead of resubmitted."""
+    sweep_process.model.resource_model.reuse_results = True
+    sweep_process.submit_sweep({"qm_theory": ["NWChem", "ORCA"]})
+    assert not sweep_process.reused
+    finished = sweep_process.submitted[0][1]
+    finished.set_process_state(ProcessState.FINISHED)
+    finished.set_exit_status(0)
+
+    group = sweep_process.submit_sweep({"qm_theory": ["NWChem", "ORCA"]})
+    assert [node.uuid for node in sweep_process.reused] == [finished.uuid]
+    assert len(sweep_process.submitted) == 3
+    assert finished.uuid in {node.uuid for node in group.nodes}
+
+    sweep_process.model.resource_model.reuse_results = False
+    sweep_process.submit_sweep({"qm_theory": ["NWChem"]})
+    assert not sweep_process.reused
+
+
+def test_reuse_is_off_by_default(sweep_process):
+    """Test identical finished processes are resubmitted unless reuse is chosen."""
+    assert not sweep_process.model.resource_model.reuse_results
+    sweep_process.submit_sweep({"qm_theory": ["NWChem"]})
+    finished = sweep_process.submitted[0][1]
+    finished.set_process_state(ProcessState.FINISHED)
+    finished.set_exit_status(0)
+
+    sweep_process.submit_sweep({"qm_theory": ["NWChem"]})
+    assert not sweep_process.reused
+    assert len(sweep_process.submitted) == 2
+    assert sweep_process.node.uuid != finished.uuid
+
+
+def test_get_dict_reuses_stored_node(sweep_process):
+    """Test identical parameter nodes are shared and stored ones reused."""
+    stored = Dict({"gradients": True}).store()
+    assert sweep_process.get_dict({"gradients": True}).uuid == stored.uuid
+    new = sweep_process.get_dict({"gradients": False})
+    assert not new.is_stored
+    assert sweep_process.get_dict({"gradients": False}) is new
+
+
+def test_build_builder_label(aiida_profile):
+    """Test the process label and description are set on the builder."""
+
+    class _Code:
+        def get_builder(self):
+            return AttributeDict({"metadata": AttributeDict({"options": {}})})
+
+    model = MainAppModel()
+    chemshell = ChemShellProcess(model)
+    parameters = chemshell.get_parameters()
+    builder = chemshell.build_builder(parameters, code=_Code())
+    assert "label" not in builder.metadata
+
+    model.resource_model.process_label = "water"
+    model.resource_model.process_description = "Water in a box"
+    builder = chemshell.build_builder(parameters, code=_Code())
+    assert builder.metadata.label == "water"
+    assert builder.metadata.description == "Water in a box"
+    assert builder.metadata.options["max_wallclock_seconds"] == 3600
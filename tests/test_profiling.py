@@ -0,0 +1,81 @@
+"""Test the profiling instrumentation."""
+
+import json
+
+import pytest
+from aiida.orm import QueryBuilder, SinglefileData
+
+from aiidalab_alc.common import profiling
+from aiidalab_alc.common.profiling import PROFILE_ENV_VAR, Profiler, profiled
+
+
+@pytest.fixture
+def app_profiler(monkeypatch):
+    """Switch on a fresh app wide profiler."""
+    profiler = Profiler(enabled=True)
+    monkeypatch.setattr(profiling, "profiler", profiler)
+    return profiler
+
+
+@pytest.mark.parametrize(("value", "enabled"), [("", False), ("0", False), ("1", True)])
+def test_enabled_from_environment(monkeypatch, value, enabled):
+    """Test profiling is only switched on by the environment variable."""
+    monkeypatch.setenv(PROFILE_ENV_VAR, value)
+    assert Profiler().enabled is enabled
+
+
+def test_disabled_records_nothing():
+    """Test no spans are recorded while profiling is off."""
+    profiler = Profiler(enabled=False)
+    with profiler.span("outer"):
+        profiler.add_bytes(10)
+    assert profiler.spans == []
+
+
+def test_nested_spans(app_profiler):
+    """Test nested spans record their own bytes and add them to their parent."""
+
+    @profiled("inner")
+    def inner():
+        profiling.add_bytes(5)
+
+    with profiling.profile("outer", step=1):
+        profiling.add_bytes(10)
+        inner()
+        inner()
+
+    spans = {span.name: span for span in app_profiler.spans}
+    assert spans["inner"].nbytes == 5
+    assert spans["inner"].depth == 1
+    assert spans["outer"].nbytes == 20
+    assert spans["outer"].depth == 0
+    assert spans["outer"].metadata == {"step": 1}
+    assert spans["outer"].duration >= spans["inner"].duration
+    summary = {entry["name"]: entry for entry in app_profiler.summary()}
+    assert summary["inner"]["count"] == 2
+    assert summary["inner"]["nbytes"] == 10
+
+
+def test_query_count(aiida_profile, app_profiler):
+    """Test the database queries run in a span are counted."""
+    with app_profiler.span("query"):
+        QueryBuilder().append(SinglefileData).count()
+        QueryBuilder().append(SinglefileData).first()
+    (span,) = app_profiler.spans
+    assert span.queries == 2
+
+
+def test_export(tmp_path, app_profiler):
+    """Test the spans are exported as JSON and as a Chrome trace."""
+    with app_profiler.span("op", path=tmp_path):
+        pass
+
+    data = json.loads(app_profiler.export(tmp_path / "profile.json").read_text())
+    assert data["spans"][0]["name"] == "op"
+    assert data["summary"][0]["count"] == 1
+
+    path = app_profiler.export(tmp_path / "trace.json", chrome_trace=True)
+    (event,) = json.loads(path.read_text())["traceEvents"]
+    assert event["name"] == "op"
+    assert event["ph"] == "X"
+    assert event["args"]["path"] == str(tmp_path)
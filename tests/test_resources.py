@@ -0,0 +1,95 @@
+"""Test the computational resources model."""
+
+import uuid
+
+import pytest
+from aiida.orm import InstalledCode, load_code
+
+from aiidalab_alc.models.resources import CodeRegistry, ComputationalResourcesModel
+
+
+@pytest.fixture
+def code(aiida_localhost):
+    """Store a code on a computer with 32 cores per machine."""
+    aiida_localhost.set_default_mpiprocs_per_machine(32)
+    return InstalledCode(
+        label=f"chemsh-{uuid.uuid4().hex[:8]}",
+        computer=aiida_localhost,
+        filepath_executable="/bin/true",
+    ).store()
+
+
+def test_layout_without_computer():
+    """Test all cores are placed on one machine if the computer is unknown."""
+    model = ComputationalResourcesModel(ncpus=200)
+    assert model.get_layout() == (1, 200, 1)
+    assert model.get_options()["resources"]["num_mpiprocs_per_machine"] == 200
+
+
+def test_layout_across_machines(code):
+    """Test cores are laid out across the machines of the code's computer."""
+    model = ComputationalResourcesModel(ncpus=100, omp_threads=2)
+    model.code_label = code.full_label
+    assert model.cores_per_machine == 32
+    assert model.scheduler_type == "core.direct"
+    assert model.get_layout() == (4, 13, 2)
+
+    model.memory_gb = 2.0
+    model.walltime_hours = 1.5
+    options = model.get_options()
+    assert options["resources"] == {
+        "num_machines": 4,
+        "num_mpiprocs_per_machine": 13,
+        "num_cores_per_mpiproc": 2,
+    }
+    assert options["withmpi"]
+    assert options["max_wallclock_seconds"] == 5400
+    assert options["max_memory_kb"] == 2 * 1024**2
+    assert options["environment_variables"] == {"OMP_NUM_THREADS": "2"}
+    code.computer.get_scheduler().validate_resources(**options["resources"])
+
+
+def test_estimate(code):
+    """Test resources are estimated from the size of the QM region."""
+    model = ComputationalResourcesModel(code_label=code.full_label)
+    model.natoms = 12
+    model.estimate()
+    assert model.ncpus == 3
+    assert model.walltime_hours == 0.5
+
+    model.natoms = 5000
+    model.nqm_atoms = 200
+    model.estimate()
+    assert model.ncpus == 64
+    assert model.walltime_hours == 17.5
+
+
+def test_code_registry(aiida_profile_clean, aiida_localhost):
+    """Test the registry lists ChemShell codes and is cached until they change."""
+    registry = CodeRegistry()
+    assert registry.codes() == []
+
+    chemsh = InstalledCode(
+        label="chemsh",
+        computer=aiida_localhost,
+        filepath_executable="/bin/true",
+        default_calc_job_plugin="chemshell",
+    ).store()
+    InstalledCode(
+        label="other",
+        computer=aiida_localhost,
+        filepath_executable="/bin/true",
+        default_calc_job_plugin="core.arithmetic.add",
+    ).store()
+    (code,) = registry.codes()
+    assert code.full_label == "chemsh@localhost"
+    assert load_code(code.full_label).uuid == chemsh.uuid
+    assert code.configured and code.enabled
+    assert code.state == "enabled"
+
+    # Cached until a matching code is added or modified
+    cached = registry._codes
+    assert registry.codes() and registry._codes is cached
+    chemsh.is_hidden = True
+    assert registry.codes() == []
+    assert len(registry.codes(include_hidden=True)) == 1
@@ -0,0 +1,158 @@
+"""Test the process and results models."""
+
+import asyncio
+import threading
+
+from aiida.common.links import LinkType
+from aiida.orm import CalcJobNode, WorkChainNode, WorkflowNode
+from plumpy import ProcessState
+
+from aiidalab_alc.models.results import ProcessModel, ResultsModel
+from aiidalab_alc.results import (
+    ProcessStatusMonitor,
+    ProcessTreeWidget,
+    ResultsWizardStep,
+)
+
+
+def test_process_model_caches_node(aiida_profile):
+    """Test the process node is only loaded once per uuid."""
+    first = WorkflowNode().store()
+    second = WorkflowNode().store()
+    model = ProcessModel()
+    assert model.process is None
+    assert model.load_count == 0
+
+    model.process_uuid = first.uuid
+    assert model.has_process
+    assert model.inputs is not None
+    assert model.outputs is not None
+    assert model.process.uuid == first.uuid
+    assert model.load_count == 1
+
+    model.process_uuid = second.uuid
+    assert model.process.uuid == second.uuid
+    assert model.load_count == 2
+
+    model.refresh()
+    assert model.has_process
+    assert model.load_count == 3
+
+
+def test_process_model_missing_node(aiida_profile):
+    """Test a uuid with no matching node is treated as no process."""
+    model = ProcessModel(process_uuid="00000000-0000-0000-0000-000000000000")
+    assert not model.has_process
+    assert model.inputs == []
+    assert model.load_count == 1
+
+
+def test_process_status_monitor(aiida_profile):
+    """Test the monitor reports changed processes until the root terminates."""
+    root = WorkflowNode()
+    root.set_process_state(ProcessState.RUNNING)
+    root.store()
+    child = WorkflowNode()
+    child.base.links.add_incoming(root, LinkType.CALL_WORK, "child")
+    child.store()
+
+    changes = []
+    terminated = []
+    monitor = ProcessStatusMonitor(
+        root.pk,
+        on_change=lambda pks, state: changes.append((pks, state)),
+        on_terminated=terminated.append,
+        min_interval=0.01,
+        max_interval=0.05,
+    )
+    assert monitor.poll() == {root.pk, child.pk}
+    assert monitor.poll() == set()
+    assert monitor.process_state == "running"
+
+    monitor.start()
+    root.set_process_state(ProcessState.FINISHED)
+    monitor._thread.join(timeout=10)
+    assert not monitor.is_running
+    assert terminated == ["finished"]
+    assert changes[-1] == ({root.pk}, "finished")
+
+
+def test_results_monitor_updates_on_event_loop(aiida_profile):
+    """Test the results step applies the monitor's updates on the event loop."""
+    root = WorkflowNode()
+    root.set_process_state(ProcessState.RUNNING)
+    root.store()
+    step = ResultsWizardStep(ResultsModel(process_uuid=root.uuid, blocked=False))
+    threads = []
+    step.status.observe(lambda _: threads.append(threading.current_thread()), "value")
+
+    async def main():
+        step.render()
+        first = step.monitor
+        root.set_process_state(ProcessState.FINISHED)
+        first._wake.set()
+        for _ in range(500):
+            if "monitoring stopped" in step.status.value:
+                break
+            await asyncio.sleep(0.01)
+        return first
+
+    first = asyncio.run(main())
+    assert step.status.value == "<p>Process finished, monitoring stopped.</p>"
+    assert set(threads) == {threading.current_thread()}
+
+    # Updates from a monitor that has since been replaced are ignored
+    step.model.process_uuid = None
+    step._on_process_terminated(first, "killed")
+    assert step.status.value == ""
+
+
+def test_process_tree_updates_changed_processes(aiida_profile):
+    """Test changed processes are updated in place unless the tree has grown."""
+    root = WorkChainNode(process_type="aiida.workflows:core.arithmetic.add_multiply")
+    root.set_process_state(ProcessState.RUNNING)
+    root.store()
+
+    def _call(state):
+        child = CalcJobNode(process_type="aiida.calculations:core.arithmetic.add")
+        child.set_process_state(state)
+        child.base.links.add_incoming(root, LinkType.CALL_CALC, "child")
+        return child.store()
+
+    child = _call(ProcessState.CREATED)
+    tree = ProcessTreeWidget()
+    tree.value = root.uuid
+    assert tree.find_node(child.pk).icon_style == "default"
+    rebuilds = []
+    tree.update = lambda _=None: rebuilds.append(True)
+
+    child.set_process_state(ProcessState.RUNNING)
+    tree.update_processes({child.pk})
+    assert not rebuilds
+    assert tree.find_node(child.pk).icon_style == "info"
+    assert "Running" in tree.find_node(child.pk).name
+
+    _call(ProcessState.CREATED)
+    tree.update_processes({root.pk})
+    assert rebuilds
+
+
+def test_failed_monitor_reports_error(aiida_profile, monkeypatch, caplog):
+    """Test a failing poll is logged and reported, and stops the monitor."""
+    root = WorkflowNode()
+    root.set_process_state(ProcessState.RUNNING)
+    root.store()
+    step = ResultsWizardStep(ResultsModel(process_uuid=root.uuid, blocked=False))
+
+    def _fail(self):
+        raise RuntimeError("node deleted")
+
+    monkeypatch.setattr(ProcessStatusMonitor, "poll", _fail)
+    step.render()
+    step.monitor._thread.join(timeout=10)
+    assert not step.monitor.is_running
+    assert (
+        step.status.value
+        == "<p style='color:red;'>Monitoring stopped: node deleted</p>"
+    )
+    assert "Monitoring process" in caplog.text
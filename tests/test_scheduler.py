@@ -0,0 +1,89 @@
+"""Test probing the load on the computers' schedulers."""
+
+from aiida.schedulers.datastructures import JobInfo, JobState
+from aiida.transports.plugins.local import LocalTransport
+
+from aiidalab_alc.common import scheduler
+from aiidalab_alc.common.scheduler import ComputerLoad, SchedulerProbe, probe_load
+from aiidalab_alc.models.resources import CodeEntry, rank_codes
+
+
+class StubScheduler:
+    """A scheduler reporting a fixed list of jobs."""
+
+    def __init__(self, states: list[JobState]):
+        self.jobs = []
+        for i, state in enumerate(states):
+            job = JobInfo()
+            job.job_id = str(i)
+            job.job_state = state
+            self.jobs.append(job)
+        self.transport = None
+
+    def set_transport(self, transport):
+        """Use the transport to query the jobs."""
+        self.transport = transport
+
+    def get_jobs(self):
+        """Return the jobs, which requires an open transport."""
+        assert self.transport.is_open
+        return self.jobs
+
+
+def test_probe_load(monkeypatch):
+    """Test the queue depth and free nodes are read through the transport."""
+    monkeypatch.setitem(
+        scheduler.FREE_NODES_COMMANDS,
+        "stub",
+        ("printf '4 idle\\n2 mix\\n3 idle\\n'", scheduler._count_slurm_idle_nodes),
+    )
+    states = [JobState.QUEUED, JobState.QUEUED_HELD, JobState.RUNNING, JobState.DONE]
+    load = probe_load("stub", LocalTransport(), StubScheduler(states), "stub")
+    assert load.error is None
+    assert (load.queued, load.running, load.free_nodes) == (2, 1, 7)
+    assert load.expected_wait(num_machines=7) == 0.0
+    assert load.expected_wait(num_machines=8) == 3 * scheduler.SECONDS_PER_QUEUED_JOB
+
+
+def test_probe_load_error():
+    """Test a failing probe is reported rather than raised."""
+
+    class FailingScheduler(StubScheduler):
+        def get_jobs(self):
+            """Fail to connect."""
+            raise OSError("connection refused")
+
+    load = probe_load("stub", LocalTransport(), FailingScheduler([]))
+    assert load.error == "connection refused"
+    assert load.expected_wait() == float("inf")
+
+
+def test_scheduler_probe_cache(aiida_localhost):
+    """Test computers are probed through their transport and cached."""
+    probe = SchedulerProbe(ttl=60)
+    (load,) = probe.probe([aiida_localhost], timeout=30).values()
+    assert load.computer == aiida_localhost.label
+    assert load.error is None
+    cached = probe.submit([aiida_localhost])[aiida_localhost.label]
+    assert cached.result() is load
+
+    probe.ttl = 0
+    assert probe.probe([aiida_localhost], timeout=30)[load.computer] is not load
+
+
+def test_rank_codes():
+    """Test codes are ranked by the expected wait on their computers."""
+
+    def code(computer):
+        return CodeEntry(1, "chemsh", computer, False, True, True)
+
+    loads = {
+        "busy": ComputerLoad("busy", queued=50, running=10),
+        "idle": ComputerLoad("idle", running=10, free_nodes=2),
+        "quiet": ComputerLoad("quiet", queued=1, running=10),
+        "down": ComputerLoad("down", error="Timed out"),
+    }
+    codes = [code(name) for name in ("down", "busy", "unknown", "quiet", "idle")]
+    ranking = [code.computer for code, _ in rank_codes(codes, loads)]
+    assert ranking[:3] == ["idle", "quiet", "busy"]
+    assert set(ranking[3:]) == {"down", "unknown"}